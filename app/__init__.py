@@ -1,50 +1,73 @@
-# third-party imports
-from flask import Flask, render_template
-from flask_bootstrap import Bootstrap
-from flask_login import LoginManager
-from flask_migrate import Migrate
-from flask_sqlalchemy import SQLAlchemy
-
-# local imports
-from config import app_config
-
-db = SQLAlchemy()
-login_manager = LoginManager()
-
-
-def create_app(config_name):
-    app = Flask(__name__, instance_relative_config=True)
-    app.config.from_object(app_config[config_name])
-    app.config.from_pyfile('config.py')
-
-    Bootstrap(app)
-    db.init_app(app)
-    login_manager.init_app(app)
-    login_manager.login_message = "You must be logged in to access this page."
-    login_manager.login_view = "auth.login"
-    migrate = Migrate(app, db)
-
-    from app import models
-
-    from .admin import admin as admin_blueprint
-    app.register_blueprint(admin_blueprint, url_prefix='/admin')
-
-    from .auth import auth as auth_blueprint
-    app.register_blueprint(auth_blueprint)
-
-    from .home import home as home_blueprint
-    app.register_blueprint(home_blueprint)
-
-    @app.errorhandler(403)
-    def forbidden(error):
-        return render_template('errors/403.html', title='Forbidden'), 403
-
-    @app.errorhandler(404)
-    def page_not_found(error):
-        return render_template('errors/404.html', title='Page Not Found'), 404
-
-    @app.errorhandler(500)
-    def internal_server_error(error):
-        return render_template('errors/500.html', title='Server Error'), 500
-
+# third-party imports
+from flask import Flask, render_template
+from flask_bootstrap import Bootstrap
+from flask_login import LoginManager
+from flask_migrate import Migrate
+
+# local imports
+from config import app_config
+from .assets import static_assets
+from .cache import page_cache
+from .compression import compression
+from .database import Database
+from .instrumentation import instrumentation
+from .passwords import password_hasher
+from .templating import init_bytecode_cache
+
+db = Database()
+login_manager = LoginManager()
+
+
+def create_app(config_name):
+    app = Flask(__name__, instance_relative_config=True)
+    app.config.from_object(app_config[config_name])
+    app.config.from_pyfile('config.py')
+
+    Bootstrap(app)
+    init_bytecode_cache(app)
+    db.init_app(app)
+    login_manager.init_app(app)
+    login_manager.login_message = "You must be logged in to access this page."
+    login_manager.login_view = "auth.login"
+    page_cache.init_app(app)
+    password_hasher.init_app(app)
+    instrumentation.init_app(app)
+    compression.init_app(app)
+    migrate = Migrate(app, db)
+
+    from app import models
+    from app import changes  # noqa: F401, registers the change log listener
+    models.identity_cache.max_entries = app.config.get('IDENTITY_CACHE_SIZE', 4096)
+    models.identity_cache.ttl = app.config.get('IDENTITY_CACHE_TTL', 60)
+
+    from .admin import admin as admin_blueprint
+    app.register_blueprint(admin_blueprint, url_prefix='/admin')
+
+    from .auth import auth as auth_blueprint
+    app.register_blueprint(auth_blueprint)
+
+    from .home import home as home_blueprint
+    app.register_blueprint(home_blueprint)
+
+    from .api import api as api_blueprint
+    app.register_blueprint(api_blueprint, url_prefix='/api/v1')
+
+    from .commands import register_commands
+    register_commands(app)
+
+    # after the blueprints, so their static endpoints are served too
+    static_assets.init_app(app)
+
+    @app.errorhandler(403)
+    def forbidden(error):
+        return render_template('errors/403.html', title='Forbidden'), 403
+
+    @app.errorhandler(404)
+    def page_not_found(error):
+        return render_template('errors/404.html', title='Page Not Found'), 404
+
+    @app.errorhandler(500)
+    def internal_server_error(error):
+        return render_template('errors/500.html', title='Server Error'), 500
+
     return app
\ No newline at end of file
@@ -1,5 +1,5 @@
-from flask import Blueprint
-
-admin = Blueprint('admin', __name__)
-
+from flask import Blueprint
+
+admin = Blueprint('admin', __name__)
+
 from . import views
\ No newline at end of file
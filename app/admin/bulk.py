@@ -0,0 +1,127 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import select
+
+from .. import changes, db, facets, related, search, summaries
+from ..database import chunked
+from ..models import Project, User, project_category, project_individual, project_organization
+
+# Set-based versions of the single-row admin mutations. Each one only
+# counts the rows it would change when `dry_run` is set, otherwise it
+# applies the change inside the current transaction; the caller commits.
+
+
+def _existing(model, ids):
+    ids = list(dict.fromkeys(ids))
+    found = set()
+    for chunk in chunked(ids):
+        found.update(row[0] for row in db.session.execute(select(model.id).where(model.id.in_(chunk))))
+    return [id for id in ids if id in found]
+
+
+def delete_projects(ids, dry_run=False):
+    """
+    Delete projects with their links, returns the ids deleted and the ids
+    of the other projects whose related list changed
+    """
+    ids = _existing(Project, ids)
+    if dry_run or not ids:
+        return ids, set()
+
+    facets.remove_projects(ids)
+    affected = related.remove_projects(ids)
+    now = datetime.utcnow()
+    changes.write([changes.entry('project', id, changes.DELETE, now=now) for id in ids])
+    table = Project.__table__
+    for chunk in chunked(ids):
+        search.remove_projects(chunk)
+        summaries.remove(chunk)
+        for link_table in (project_category, project_individual, project_organization):
+            db.session.execute(link_table.delete().where(link_table.c.project_id.in_(chunk)))
+        db.session.execute(table.delete().where(table.c.id.in_(chunk)))
+    return ids, affected
+
+
+def link_projects(ids, facet, value, dry_run=False):
+    """
+    Link projects to a category ('category') or an investor ('investor'),
+    returns the ids of the projects that were not linked yet. The related
+    projects index picks the new links up on its next rebuild.
+    """
+    _, _, relation, link_table, column = facets.linked(facet)
+    column = link_table.c[column]
+    ids = _existing(Project, ids)
+    linked = set()
+    for chunk in chunked(ids):
+        linked.update(row[0] for row in db.session.execute(
+            select(link_table.c.project_id).where(column == value).where(link_table.c.project_id.in_(chunk))))
+    ids = [id for id in ids if id not in linked]
+    if dry_run or not ids:
+        return ids
+
+    now = datetime.utcnow()
+    db.session.execute(link_table.insert(), [{'project_id': id, column.name: value} for id in ids])
+    for chunk in chunked(ids):
+        _log_links(chunk, relation, column, now)
+        search.index_projects(chunk)
+        if facet == 'category':
+            summaries.refresh(chunk)
+    facets.apply(Counter({(facet, str(value)): len(ids)}))
+    return ids
+
+
+def unlink_projects(facet, value):
+    """
+    Log an update of every project linked to a category ('category'),
+    individual ('team') or investor ('investor') that is about to be
+    deleted, with the links the project keeps. Call it before the delete,
+    the caller reindexes the projects. Returns their ids.
+    """
+    _, _, relation, link_table, column = facets.linked(facet)
+    column = link_table.c[column]
+    ids = [row[0] for row in db.session.execute(select(link_table.c.project_id).where(column == value))]
+    now = datetime.utcnow()
+    for chunk in chunked(ids):
+        _log_links(chunk, relation, column, now, excluded=value)
+    return ids
+
+
+def _log_links(ids, relation, column, now, excluded=None):
+    """
+    Bump the version of projects whose links of one relation changed and
+    log the ids they now have, leaving out `excluded`
+    """
+    table, link_table = Project.__table__, column.table
+    db.session.execute(table.update().where(table.c.id.in_(ids)).values(version=table.c.version + 1, updated_at=now))
+    links = {id: [] for id in ids}
+    for project_id, linked_id in db.session.execute(select(link_table.c.project_id, column)
+                                                    .where(link_table.c.project_id.in_(ids))
+                                                    .order_by(column)):
+        if linked_id != excluded:
+            links[project_id].append(linked_id)
+    changes.write([changes.entry('project', id, changes.UPDATE, {relation: links[id]}, now) for id in ids])
+
+
+def assign_role(ids, role, dry_run=False):
+    """
+    Give users a role, or take it away when `role` is None, returns the ids
+    of the users changed. Admins cannot hold a role and are skipped.
+    """
+    table = User.__table__
+    role_id = role.id if role is not None else None
+    changed = []
+    for chunk in chunked(dict.fromkeys(ids)):
+        statement = select(table.c.id).where(table.c.id.in_(chunk)) \
+            .where((table.c.is_admin.is_(None)) | (table.c.is_admin == False))  # noqa: E712
+        if role_id is None:
+            statement = statement.where(table.c.role_id.isnot(None))
+        else:
+            statement = statement.where((table.c.role_id.is_(None)) | (table.c.role_id != role_id))
+        changed.extend(row[0] for row in db.session.execute(statement))
+    if dry_run or not changed:
+        return changed
+
+    for chunk in chunked(changed):
+        db.session.execute(table.update().where(table.c.id.in_(chunk)).values(role_id=role_id))
+    return changed
@@ -0,0 +1,117 @@
+from flask import url_for
+from sqlalchemy import or_
+from wtforms import ValidationError, widgets
+from wtforms.fields import Field, SelectFieldBase
+
+
+def prefix_lookup(model, prefix, limit=20):
+    """
+    Rows whose name starts with `prefix`, found with range seeks on the name
+    index. Names are compared case-sensitively, so the common capitalizations
+    of the prefix are tried as well.
+    """
+    prefix = prefix.strip()
+    if not prefix:
+        return model.query.order_by(model.name).limit(limit).all()
+    variants = {prefix, prefix.lower(), prefix.capitalize(), prefix.upper()}
+    return model.query.filter(or_(*[model.name.between(variant, variant + u'\U0010ffff') for variant in variants])) \
+        .order_by(model.name).limit(limit).all()
+
+
+class LookupSelect(widgets.Select):
+    """
+    Select that only renders the current choices, the lookup script adds
+    more from the lookup endpoint as the admin types
+    """
+
+    def __call__(self, field, **kwargs):
+        css = kwargs.pop('class', '') or kwargs.pop('class_', '')
+        kwargs['class'] = (css + ' lookup-select').strip()
+        kwargs.setdefault('data-lookup', url_for('admin.lookup', kind=field.lookup))
+        return super(LookupSelect, self).__call__(field, **kwargs)
+
+
+class ModelSelectMultipleField(SelectFieldBase):
+    """
+    Multiple select over a model that never loads the whole table: only the
+    selected rows are rendered, and on submit only the posted ids are loaded
+    """
+
+    widget = LookupSelect(multiple=True)
+
+    def __init__(self, label=None, validators=None, model=None, lookup=None, get_label='name', **kwargs):
+        super(ModelSelectMultipleField, self).__init__(label, validators, **kwargs)
+        self.model = model
+        self.lookup = lookup
+        self.get_label = get_label
+        self._invalid = False
+
+    def _resolve(self, values):
+        try:
+            ids = list(dict.fromkeys(int(value) for value in values if value not in ('', '__None')))
+        except ValueError:
+            raise ValueError(self.gettext('Invalid choice(s): one or more data inputs could not be coerced'))
+        rows = {row.id: row for row in self.model.query.filter(self.model.id.in_(ids))} if ids else {}
+        self._invalid = len(rows) != len(ids)
+        return [rows[id] for id in ids if id in rows]
+
+    def process_data(self, value):
+        self.data = list(value) if value else []
+
+    def process_formdata(self, valuelist):
+        self.data = self._resolve(valuelist)
+
+    def pre_validate(self, form):
+        if self._invalid:
+            raise ValidationError(self.gettext('Not a valid choice'))
+
+    def iter_choices(self):
+        for item in self.data or ():
+            yield (item.id, getattr(item, self.get_label), True)
+
+
+class ModelSelectField(ModelSelectMultipleField):
+    """
+    Single-valued version of ModelSelectMultipleField
+    """
+
+    widget = LookupSelect()
+
+    def __init__(self, label=None, validators=None, allow_blank=False, blank_text=u'', **kwargs):
+        super(ModelSelectField, self).__init__(label, validators, **kwargs)
+        self.allow_blank = allow_blank
+        self.blank_text = blank_text
+
+    def process_data(self, value):
+        self.data = value
+
+    def process_formdata(self, valuelist):
+        rows = self._resolve(valuelist[:1])
+        self.data = rows[0] if rows else None
+
+    def pre_validate(self, form):
+        super(ModelSelectField, self).pre_validate(form)
+        if self.data is None and not self.allow_blank:
+            raise ValidationError(self.gettext('Not a valid choice'))
+
+    def iter_choices(self):
+        if self.allow_blank:
+            yield (u'__None', self.blank_text, self.data is None)
+        if self.data is not None:
+            yield (self.data.id, getattr(self.data, self.get_label), True)
+
+
+class IdListField(Field):
+    """
+    Row ids posted by the checkboxes of an admin list, rendered by the list
+    template itself
+    """
+
+    def process_data(self, value):
+        self.data = list(value) if value else []
+
+    def process_formdata(self, valuelist):
+        try:
+            self.data = list(dict.fromkeys(int(value) for value in valuelist))
+        except ValueError:
+            raise ValueError(self.gettext('Not a valid integer value'))
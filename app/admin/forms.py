@@ -1,98 +1,132 @@
-from flask_wtf import FlaskForm
-from wtforms import PasswordField, StringField, BooleanField, SubmitField, SelectMultipleField, ValidationError
-from wtforms.validators import DataRequired, Email, EqualTo
-from wtforms.ext.sqlalchemy.fields import QuerySelectField, QuerySelectMultipleField
-
-from ..models import Role, User, Category, Individual, Organization
-
-
-class RoleForm(FlaskForm):
-    """
-    Form for admin to add or edit a role
-    """
-    name = StringField('Name', validators=[DataRequired()])
-    description = StringField('Description', validators=[DataRequired()])
-    submit = SubmitField('Submit')
-
-
-class UserAssignForm(FlaskForm):
-    """
-    Form for admin to assign roles to users
-    """
-    role = QuerySelectField(query_factory=lambda: Role.query.all(), get_label="name")
-    submit = SubmitField('Submit')
-
-
-class UserAddForm(FlaskForm):
-    """
-    Form for users to create new account
-    """
-    email = StringField('Email', validators=[DataRequired(), Email()])
-    username = StringField('Username', validators=[DataRequired()])
-    password = PasswordField('Password', validators=[DataRequired(), EqualTo('confirm_password')])
-    confirm_password = PasswordField('Confirm Password')
-    role = QuerySelectField(query_factory=lambda: Role.query.all(), get_label="name", allow_blank=True, default=None)
-    is_admin = BooleanField('Admin')
-    submit = SubmitField('Submit')
-
-    def validate_email(self, field):
-        if User.query.filter_by(email=field.data).first():
-            raise ValidationError('Email is already in use.')
-
-    def validate_username(self, field):
-        if User.query.filter_by(username=field.data).first():
-            raise ValidationError('Username is already in use.')
-
-
-class UserEditForm(FlaskForm):
-    """
-    Form for editing a user
-    """
-    email = StringField('Email', validators=[Email()])
-    username = StringField('Username', validators=[DataRequired()])
-    password = PasswordField('Password', validators=[EqualTo('confirm_password')])
-    confirm_password = PasswordField('Confirm Password')
-    role = QuerySelectField(query_factory=lambda: Role.query.all(), get_label="name", allow_blank=True, default=None)
-    is_admin = BooleanField('Admin')
-    submit = SubmitField('Submit')
-
-
-class CategoryForm(FlaskForm):
-    """
-    Form for admin to add or edit a category
-    """
-    name = StringField('Name', validators=[DataRequired()])
-    description = StringField('Description', validators=[DataRequired()])
-    submit = SubmitField('Submit')
-
-
-class ProjectForm(FlaskForm):
-    """
-    Form for admin to add or edit a project
-    """
-    name = StringField('Name', validators=[DataRequired()])
-    description = StringField('Description', validators=[DataRequired()])
-    location = StringField('Location')
-    url = StringField('URL')
-    categories = QuerySelectMultipleField('Category', query_factory=lambda: Category.query.all(), get_label="name")
-    individuals = QuerySelectMultipleField('Team', query_factory=lambda: Individual.query.all(), get_label="name")
-    organizations = QuerySelectMultipleField('Investors', query_factory=lambda: Organization.query.all(), get_label="name")
-    submit = SubmitField('Submit')
-
-
-class IndividualForm(FlaskForm):
-    """
-    Form for admin to add or edit an individual
-    """
-    name = StringField('Name', validators=[DataRequired()])
-    description = StringField('Description', validators=[DataRequired()])
-    submit = SubmitField('Submit')
-
-
-class OrganizationForm(FlaskForm):
-    """
-    Form for admin to add or edit an organization
-    """
-    name = StringField('Name', validators=[DataRequired()])
-    description = StringField('Description', validators=[DataRequired()])
-    submit = SubmitField('Submit')
\ No newline at end of file
+from flask_wtf import FlaskForm
+from wtforms import PasswordField, StringField, BooleanField, SubmitField, SelectField, SelectMultipleField, \
+    ValidationError
+from wtforms.validators import DataRequired, Email, EqualTo
+
+from .fields import IdListField, ModelSelectField, ModelSelectMultipleField
+from ..models import Role, User, Category, Individual, Organization
+
+
+class RoleForm(FlaskForm):
+    """
+    Form for admin to add or edit a role
+    """
+    name = StringField('Name', validators=[DataRequired()])
+    description = StringField('Description', validators=[DataRequired()])
+    submit = SubmitField('Submit')
+
+
+class UserAssignForm(FlaskForm):
+    """
+    Form for admin to assign roles to users
+    """
+    role = ModelSelectField(model=Role, lookup='roles', get_label="name")
+    submit = SubmitField('Submit')
+
+
+class UserAddForm(FlaskForm):
+    """
+    Form for users to create new account
+    """
+    email = StringField('Email', validators=[DataRequired(), Email()])
+    username = StringField('Username', validators=[DataRequired()])
+    password = PasswordField('Password', validators=[DataRequired(), EqualTo('confirm_password')])
+    confirm_password = PasswordField('Confirm Password')
+    role = ModelSelectField(model=Role, lookup='roles', get_label="name", allow_blank=True, default=None)
+    is_admin = BooleanField('Admin')
+    submit = SubmitField('Submit')
+
+    def validate_email(self, field):
+        if User.query.filter_by(email=field.data).first():
+            raise ValidationError('Email is already in use.')
+
+    def validate_username(self, field):
+        if User.query.filter_by(username=field.data).first():
+            raise ValidationError('Username is already in use.')
+
+
+class UserEditForm(FlaskForm):
+    """
+    Form for editing a user
+    """
+    email = StringField('Email', validators=[Email()])
+    username = StringField('Username', validators=[DataRequired()])
+    password = PasswordField('Password', validators=[EqualTo('confirm_password')])
+    confirm_password = PasswordField('Confirm Password')
+    role = ModelSelectField(model=Role, lookup='roles', get_label="name", allow_blank=True, default=None)
+    is_admin = BooleanField('Admin')
+    submit = SubmitField('Submit')
+
+
+class CategoryForm(FlaskForm):
+    """
+    Form for admin to add or edit a category
+    """
+    name = StringField('Name', validators=[DataRequired()])
+    description = StringField('Description', validators=[DataRequired()])
+    submit = SubmitField('Submit')
+
+
+class ProjectForm(FlaskForm):
+    """
+    Form for admin to add or edit a project
+    """
+    name = StringField('Name', validators=[DataRequired()])
+    description = StringField('Description', validators=[DataRequired()])
+    location = StringField('Location')
+    url = StringField('URL')
+    categories = ModelSelectMultipleField('Category', model=Category, lookup='categories', get_label="name")
+    individuals = ModelSelectMultipleField('Team', model=Individual, lookup='individuals', get_label="name")
+    organizations = ModelSelectMultipleField('Investors', model=Organization, lookup='organizations', get_label="name")
+    submit = SubmitField('Submit')
+
+
+class IndividualForm(FlaskForm):
+    """
+    Form for admin to add or edit an individual
+    """
+    name = StringField('Name', validators=[DataRequired()])
+    description = StringField('Description', validators=[DataRequired()])
+    submit = SubmitField('Submit')
+
+
+class OrganizationForm(FlaskForm):
+    """
+    Form for admin to add or edit an organization
+    """
+    name = StringField('Name', validators=[DataRequired()])
+    description = StringField('Description', validators=[DataRequired()])
+    submit = SubmitField('Submit')
+
+
+class ProjectBulkForm(FlaskForm):
+    """
+    Form for admin to apply one action to the selected projects
+    """
+    ids = IdListField(validators=[DataRequired('Select at least one project.')])
+    action = SelectField('Action', choices=[('delete', 'Delete'), ('category', 'Assign category'),
+                                            ('investor', 'Attach investor')])
+    category = ModelSelectField('Category', model=Category, lookup='categories', get_label="name", allow_blank=True)
+    organization = ModelSelectField('Investor', model=Organization, lookup='organizations', get_label="name",
+                                    allow_blank=True)
+    preview = SubmitField('Preview')
+    submit = SubmitField('Apply')
+
+    def validate_category(self, field):
+        if self.action.data == 'category' and field.data is None:
+            raise ValidationError('Choose the category to assign.')
+
+    def validate_organization(self, field):
+        if self.action.data == 'investor' and field.data is None:
+            raise ValidationError('Choose the investor to attach.')
+
+
+class UserBulkForm(FlaskForm):
+    """
+    Form for admin to assign one role to the selected users
+    """
+    ids = IdListField(validators=[DataRequired('Select at least one user.')])
+    role = ModelSelectField('Role', model=Role, lookup='roles', get_label="name", allow_blank=True,
+                            blank_text='No role')
+    preview = SubmitField('Preview')
+    submit = SubmitField('Apply')
@@ -1,590 +1,814 @@
-from flask import abort, flash, redirect, render_template, url_for
-from flask_login import current_user, login_required
-
-from . import admin
-from .forms import RoleForm, UserAddForm, UserEditForm, UserAssignForm, CategoryForm, ProjectForm, IndividualForm, \
-    OrganizationForm
-from .. import db
-from ..models import Role, User, Category, Project, Individual, Organization
-
-
-def check_admin():
-    """
-    Prevent non-admins from accessing the page
-    """
-    if not current_user.is_admin:
-        abort(403)
-
-
-# Role Views
-
-@admin.route('/roles')
-@login_required
-def list_roles():
-    check_admin()
-    """
-    List all roles
-    """
-    roles = Role.query.all()
-    return render_template('admin/roles/roles.html',
-                           roles=roles, title='Roles')
-
-
-@admin.route('/roles/add', methods=['GET', 'POST'])
-@login_required
-def add_role():
-    """
-    Add a role to the database
-    """
-    check_admin()
-
-    add_role = True
-
-    form = RoleForm()
-    if form.validate_on_submit():
-        role = Role(name=form.name.data,
-                    description=form.description.data)
-
-        try:
-            # add role to the database
-            db.session.add(role)
-            db.session.commit()
-            flash('You have successfully added a new role.')
-        except:
-            # in case role name already exists
-            flash('Error: role name already exists.')
-
-        # redirect to the roles page
-        return redirect(url_for('admin.list_roles'))
-
-    # load role template
-    return render_template('admin/roles/role.html', add_role=add_role,
-                           form=form, title='Add Role')
-
-
-@admin.route('/roles/edit/<int:id>', methods=['GET', 'POST'])
-@login_required
-def edit_role(id):
-    """
-    Edit a role
-    """
-    check_admin()
-
-    add_role = False
-
-    role = Role.query.get_or_404(id)
-    form = RoleForm(obj=role)
-    if form.validate_on_submit():
-        role.name = form.name.data
-        role.description = form.description.data
-        db.session.add(role)
-        db.session.commit()
-        flash('You have successfully edited the role.')
-
-        # redirect to the roles page
-        return redirect(url_for('admin.list_roles'))
-
-    form.description.data = role.description
-    form.name.data = role.name
-    return render_template('admin/roles/role.html', add_role=add_role,
-                           form=form, title="Edit Role")
-
-
-@admin.route('/roles/delete/<int:id>', methods=['GET', 'POST'])
-@login_required
-def delete_role(id):
-    """
-    Delete a role from the database
-    """
-    check_admin()
-
-    role = Role.query.get_or_404(id)
-    db.session.delete(role)
-    db.session.commit()
-    flash('You have successfully deleted the role.')
-
-    # redirect to the roles page
-    return redirect(url_for('admin.list_roles'))
-
-    return render_template(title="Delete Role")
-
-
-# User Views
-
-@admin.route('/users')
-@login_required
-def list_users():
-    """
-    List all users
-    """
-    check_admin()
-
-    users = User.query.all()
-    return render_template('admin/users/users.html',
-                           users=users, title='Users')
-
-
-@admin.route('/users/assign/<int:id>', methods=['GET', 'POST'])
-@login_required
-def assign_user(id):
-    """
-    Assign a role to an user
-    """
-    check_admin()
-
-    user = User.query.get_or_404(id)
-
-    # prevent admin from being assigned a role
-    if user.is_admin:
-        abort(403)
-
-    form = UserAssignForm(obj=user)
-    if form.validate_on_submit():
-        user.role = form.role.data
-        db.session.add(user)
-        db.session.commit()
-        flash('You have successfully assigned a role.')
-
-        # redirect to the users page
-        return redirect(url_for('admin.list_users'))
-
-    return render_template('admin/users/assign.html',
-                           user=user, form=form,
-                           title='Assign User')
-
-
-@admin.route('/users/add', methods=['GET', 'POST'])
-@login_required
-def add_user():
-    """
-    Handle requests to the /ysers/add route
-    Add a user to the database through the registration form
-    """
-    check_admin()
-
-    add_user = True
-
-    form = UserAddForm()
-    if form.validate_on_submit():
-        user = User(email=form.email.data,
-                    username=form.username.data,
-                    password=form.password.data, is_admin=form.is_admin.data, role_id=form.role.data)
-
-        # add user to the database
-        db.session.add(user)
-        db.session.commit()
-        flash('You have successfully added the user!')
-
-        # redirect to the users page
-        return redirect(url_for('admin.list_users'))
-
-    # load registration template
-    return render_template('admin/users/user.html', add_user=add_user, form=form, title='Add User')
-
-
-@admin.route('/users/edit/<int:id>', methods=['GET', 'POST'])
-@login_required
-def edit_user(id):
-    """
-    Edit a user
-    """
-    check_admin()
-
-    add_user = False
-
-    user = User.query.get_or_404(id)
-
-    # prevent admin from being edited
-    # if user.is_admin:
-    #     abort(403)
-
-    form = UserEditForm(obj=user)
-    if form.validate_on_submit():
-        user.email = form.email.data
-        user.username = form.username.data
-        user.password = form.password.data
-        user.role = form.role.data
-        db.session.add(user)
-        db.session.commit()
-        flash('You have successfully edited the user.')
-
-        # redirect to the users page
-        return redirect(url_for('admin.list_users'))
-
-    return render_template('admin/users/user.html', user=user, form=form, add_user=add_user,
-                           title='Edit User')
-
-
-# Category Views
-
-@admin.route('/categories')
-@login_required
-def list_categories():
-    check_admin()
-    """
-    List all categories
-    """
-    categories = Category.query.all()
-    return render_template('admin/categories/categories.html',
-                           categories=categories, title='Categories')
-
-
-@admin.route('/categories/add', methods=['GET', 'POST'])
-@login_required
-def add_category():
-    """
-    Add a category to the database
-    """
-    check_admin()
-
-    add_category = True
-
-    form = CategoryForm()
-    if form.validate_on_submit():
-        category = Category(name=form.name.data, description=form.description.data)
-
-        try:
-            # add category to the database
-            db.session.add(category)
-            db.session.commit()
-            flash('You have successfully added a new category.')
-        except:
-            # in case category name already exists
-            flash('Error: category name already exists.')
-
-        # redirect to the category page
-        return redirect(url_for('admin.list_categories'))
-
-    # load category template
-    return render_template('admin/categories/category.html', add_category=add_category,
-                           form=form, title='Add Category')
-
-
-@admin.route('/categories/edit/<int:id>', methods=['GET', 'POST'])
-@login_required
-def edit_category(id):
-    """
-    Edit a category
-    """
-    check_admin()
-
-    add_category = False
-
-    category = Category.query.get_or_404(id)
-    form = CategoryForm(obj=category)
-    if form.validate_on_submit():
-        category.name = form.name.data
-        category.description = form.description.data
-        db.session.add(category)
-        db.session.commit()
-        flash('You have successfully edited the category.')
-
-        # redirect to the categories page
-        return redirect(url_for('admin.list_categories'))
-
-    form.description.data = category.description
-    form.name.data = category.name
-    return render_template('admin/categories/category.html', add_category=add_category,
-                           form=form, title="Edit Category")
-
-
-@admin.route('/categories/delete/<int:id>', methods=['GET', 'POST'])
-@login_required
-def delete_category(id):
-    """
-    Delete a category from the database
-    """
-    check_admin()
-
-    category = Category.query.get_or_404(id)
-    db.session.delete(category)
-    db.session.commit()
-    flash('You have successfully deleted the category.')
-
-    # redirect to the categories page
-    return redirect(url_for('admin.list_categories'))
-
-    return render_template(title="Delete Category")
-
-
-# Project Views
-
-@admin.route('/projects')
-@login_required
-def list_projects():
-    check_admin()
-    """
-    List all projects
-    """
-    projects = Project.query.all()
-    return render_template('admin/projects/projects.html',
-                           projects=projects, title='Projects')
-
-
-@admin.route('/projects/add', methods=['GET', 'POST'])
-@login_required
-def add_project():
-    """
-    Add a project to the database
-    """
-    check_admin()
-
-    add_project = True
-
-    form = ProjectForm()
-    if form.validate_on_submit():
-        project = Project(name=form.name.data, description=form.description.data, location=form.location.data,
-                          url=form.url.data, categories=form.categories.data, individuals=form.individuals.data,
-                          organizations=form.organizations.data)
-
-        try:
-            # add project to the database
-            db.session.add(project)
-            db.session.commit()
-            flash('You have successfully added a new project.')
-        except:
-            # in case project name already exists
-            flash('Error: project name already exists.')
-
-        # redirect to the project page
-        return redirect(url_for('admin.list_projects'))
-
-    # load project template
-    return render_template('admin/projects/project.html', add_project=add_project,
-                           form=form, title='Add Project')
-
-
-@admin.route('/projects/edit/<int:id>', methods=['GET', 'POST'])
-@login_required
-def edit_project(id):
-    """
-    Edit a project
-    """
-    check_admin()
-
-    add_project = False
-
-    project = Project.query.get_or_404(id)
-    form = ProjectForm(obj=project)
-    if form.validate_on_submit():
-        project.name = form.name.data
-        project.description = form.description.data
-        project.location = form.location.data
-        project.url = form.url.data
-        project.categories = form.categories.data
-        project.individuals = form.individuals.data
-        project.organizations = form.organizations.data
-        db.session.add(project)
-        db.session.commit()
-        flash('You have successfully edited the project.')
-
-        # redirect to the projects page
-        return redirect(url_for('admin.list_projects'))
-
-    form.description.data = project.description
-    form.name.data = project.name
-    return render_template('admin/projects/project.html', add_project=add_project,
-                           form=form, title="Edit Project")
-
-
-@admin.route('/projects/delete/<int:id>', methods=['GET', 'POST'])
-@login_required
-def delete_project(id):
-    """
-    Delete a project from the database
-    """
-    check_admin()
-
-    project = Project.query.get_or_404(id)
-    db.session.delete(project)
-    db.session.commit()
-    flash('You have successfully deleted the project.')
-
-    # redirect to the projects page
-    return redirect(url_for('admin.list_projects'))
-
-    return render_template(title="Delete Project")
-
-
-# Individual Views
-
-@admin.route('/individuals')
-@login_required
-def list_individuals():
-    check_admin()
-    """
-    List all individuals
-    """
-    individuals = Individual.query.all()
-    return render_template('admin/individuals/individuals.html',
-                           individuals=individuals, title='Individuals')
-
-
-@admin.route('/individuals/add', methods=['GET', 'POST'])
-@login_required
-def add_individual():
-    """
-    Add a individual to the database
-    """
-    check_admin()
-
-    add_individual = True
-
-    form = IndividualForm()
-    if form.validate_on_submit():
-        individual = Individual(name=form.name.data, description=form.description.data)
-
-        try:
-            # add individual to the database
-            db.session.add(individual)
-            db.session.commit()
-            flash('You have successfully added a new individual.')
-        except:
-            # in case individual name already exists
-            flash('Error: individual name already exists.')
-
-        # redirect to the individual page
-        return redirect(url_for('admin.list_individuals'))
-
-    # load individual template
-    return render_template('admin/individuals/individual.html', add_individual=add_individual,
-                           form=form, title='Add Individual')
-
-
-@admin.route('/individuals/edit/<int:id>', methods=['GET', 'POST'])
-@login_required
-def edit_individual(id):
-    """
-    Edit a individual
-    """
-    check_admin()
-
-    add_individual = False
-
-    individual = Individual.query.get_or_404(id)
-    form = IndividualForm(obj=individual)
-    if form.validate_on_submit():
-        individual.name = form.name.data
-        individual.description = form.description.data
-        db.session.add(individual)
-        db.session.commit()
-        flash('You have successfully edited the individual.')
-
-        # redirect to the individuals page
-        return redirect(url_for('admin.list_individuals'))
-
-    form.description.data = individual.description
-    form.name.data = individual.name
-    return render_template('admin/individuals/individual.html', add_individual=add_individual,
-                           form=form, title="Edit Individual")
-
-
-@admin.route('/individuals/delete/<int:id>', methods=['GET', 'POST'])
-@login_required
-def delete_individual(id):
-    """
-    Delete an individual from the database
-    """
-    check_admin()
-
-    individual = Individual.query.get_or_404(id)
-    db.session.delete(individual)
-    db.session.commit()
-    flash('You have successfully deleted the individual.')
-
-    # redirect to the individuals page
-    return redirect(url_for('admin.list_individuals'))
-
-    return render_template(title="Delete Individual")
-
-
-# Organization Views
-
-@admin.route('/organizations')
-@login_required
-def list_organizations():
-    check_admin()
-    """
-    List all organizations
-    """
-    organizations = Organization.query.all()
-    return render_template('admin/organizations/organizations.html',
-                           organizations=organizations, title='Organizations')
-
-
-@admin.route('/organizations/add', methods=['GET', 'POST'])
-@login_required
-def add_organization():
-    """
-    Add an organization to the database
-    """
-    check_admin()
-
-    add_organization = True
-
-    form = OrganizationForm()
-    if form.validate_on_submit():
-        organization = Organization(name=form.name.data, description=form.description.data)
-
-        try:
-            # add organization to the database
-            db.session.add(organization)
-            db.session.commit()
-            flash('You have successfully added a new organization.')
-        except:
-            # in case organization name already exists
-            flash('Error: organization name already exists.')
-
-        # redirect to the organizations page
-        return redirect(url_for('admin.list_organizations'))
-
-    # load organization template
-    return render_template('admin/organizations/organization.html', add_organization=add_organization,
-                           form=form, title='Add Organization')
-
-
-@admin.route('/organizations/edit/<int:id>', methods=['GET', 'POST'])
-@login_required
-def edit_organization(id):
-    """
-    Edit an organization
-    """
-    check_admin()
-
-    add_organization = False
-
-    organization = Organization.query.get_or_404(id)
-    form = OrganizationForm(obj=organization)
-    if form.validate_on_submit():
-        organization.name = form.name.data
-        organization.description = form.description.data
-        db.session.add(organization)
-        db.session.commit()
-        flash('You have successfully edited the organization.')
-
-        # redirect to the organizations page
-        return redirect(url_for('admin.list_organizations'))
-
-    form.description.data = organization.description
-    form.name.data = organization.name
-    return render_template('admin/organizations/organization.html', add_organization=add_organization,
-                           form=form, title="Edit Organization")
-
-
-@admin.route('/organizations/delete/<int:id>', methods=['GET', 'POST'])
-@login_required
-def delete_organization(id):
-    """
-    Delete an organization from the database
-    """
-    check_admin()
-
-    organization = Organization.query.get_or_404(id)
-    db.session.delete(organization)
-    db.session.commit()
-    flash('You have successfully deleted the organization.')
-
-    # redirect to the organizations page
-    return redirect(url_for('admin.list_organizations'))
-
-    return render_template(title="Delete Organization")
\ No newline at end of file
+from flask import Response, abort, flash, jsonify, redirect, render_template, request, stream_with_context, url_for
+from flask_login import current_user, login_required
+from sqlalchemy.exc import IntegrityError
+
+from . import admin, bulk
+from .fields import prefix_lookup
+from .forms import RoleForm, UserAddForm, UserEditForm, UserAssignForm, CategoryForm, ProjectForm, IndividualForm, \
+    OrganizationForm, ProjectBulkForm, UserBulkForm
+from .. import db, export, facets, related, search, summaries
+from ..cache import PROJECT_LIST_TAG, page_cache, project_tag, project_tags
+from ..database import read_only
+from ..instrumentation import BUCKETS, instrumentation
+from ..models import Role, User, Category, Project, ProjectSummary, Individual, Organization, identity_cache, \
+    role_tag, user_key
+from ..pagination import paginate_request
+
+
+def check_admin():
+    """
+    Prevent non-admins from accessing the page
+    """
+    if not current_user.is_admin:
+        abort(403)
+
+
+def _flash_errors(form):
+    """
+    Flash the first validation error of every invalid field
+    """
+    for errors in form.errors.values():
+        flash('Error: {}'.format(errors[0]))
+
+
+# Models offered by the lookup endpoint of the typeahead pickers
+LOOKUPS = {
+    'categories': Category,
+    'individuals': Individual,
+    'organizations': Organization,
+    'roles': Role,
+}
+
+
+@admin.route('/lookup/<kind>')
+@login_required
+@read_only
+def lookup(kind):
+    """
+    Return the ids and names starting with ?q= for the typeahead pickers
+    """
+    check_admin()
+
+    if kind not in LOOKUPS:
+        abort(404)
+    limit = min(request.args.get('limit', 20, type=int), 50)
+    items = prefix_lookup(LOOKUPS[kind], request.args.get('q', ''), limit)
+    return jsonify([{'id': item.id, 'name': item.name} for item in items])
+
+
+# Role Views
+
+@admin.route('/roles')
+@login_required
+@read_only
+def list_roles():
+    check_admin()
+    """
+    List all roles
+    """
+    page = paginate_request(Role.query, Role)
+    return render_template('admin/roles/roles.html',
+                           roles=page.items, page=page, title='Roles')
+
+
+@admin.route('/roles/add', methods=['GET', 'POST'])
+@login_required
+def add_role():
+    """
+    Add a role to the database
+    """
+    check_admin()
+
+    add_role = True
+
+    form = RoleForm()
+    if form.validate_on_submit():
+        role = Role(name=form.name.data,
+                    description=form.description.data)
+
+        try:
+            # add role to the database
+            db.session.add(role)
+            db.session.commit()
+            flash('You have successfully added a new role.')
+        except:
+            # in case role name already exists
+            flash('Error: role name already exists.')
+
+        # redirect to the roles page
+        return redirect(url_for('admin.list_roles'))
+
+    # load role template
+    return render_template('admin/roles/role.html', add_role=add_role,
+                           form=form, title='Add Role')
+
+
+@admin.route('/roles/edit/<int:id>', methods=['GET', 'POST'])
+@login_required
+def edit_role(id):
+    """
+    Edit a role
+    """
+    check_admin()
+
+    add_role = False
+
+    role = Role.query.get_or_404(id)
+    form = RoleForm(obj=role)
+    if form.validate_on_submit():
+        role.name = form.name.data
+        role.description = form.description.data
+        db.session.add(role)
+        db.session.commit()
+        identity_cache.invalidate(role_tag(id))
+        flash('You have successfully edited the role.')
+
+        # redirect to the roles page
+        return redirect(url_for('admin.list_roles'))
+
+    form.description.data = role.description
+    form.name.data = role.name
+    return render_template('admin/roles/role.html', add_role=add_role,
+                           form=form, title="Edit Role")
+
+
+@admin.route('/roles/delete/<int:id>', methods=['GET', 'POST'])
+@login_required
+def delete_role(id):
+    """
+    Delete a role from the database
+    """
+    check_admin()
+
+    role = Role.query.get_or_404(id)
+    db.session.delete(role)
+    db.session.commit()
+    identity_cache.invalidate(role_tag(id))
+    flash('You have successfully deleted the role.')
+
+    # redirect to the roles page
+    return redirect(url_for('admin.list_roles'))
+
+    return render_template(title="Delete Role")
+
+
+# User Views
+
+@admin.route('/users')
+@login_required
+@read_only
+def list_users():
+    """
+    List all users
+    """
+    check_admin()
+
+    page = paginate_request(User.query, User)
+    return render_template('admin/users/users.html',
+                           users=page.items, page=page, bulk_form=UserBulkForm(), title='Users')
+
+
+@admin.route('/users/assign/<int:id>', methods=['GET', 'POST'])
+@login_required
+def assign_user(id):
+    """
+    Assign a role to an user
+    """
+    check_admin()
+
+    user = User.query.get_or_404(id)
+
+    # prevent admin from being assigned a role
+    if user.is_admin:
+        abort(403)
+
+    form = UserAssignForm(obj=user)
+    if form.validate_on_submit():
+        user.role = form.role.data
+        db.session.add(user)
+        db.session.commit()
+        identity_cache.delete(user_key(id))
+        flash('You have successfully assigned a role.')
+
+        # redirect to the users page
+        return redirect(url_for('admin.list_users'))
+
+    return render_template('admin/users/assign.html',
+                           user=user, form=form,
+                           title='Assign User')
+
+
+@admin.route('/users/add', methods=['GET', 'POST'])
+@login_required
+def add_user():
+    """
+    Handle requests to the /ysers/add route
+    Add a user to the database through the registration form
+    """
+    check_admin()
+
+    add_user = True
+
+    form = UserAddForm()
+    if form.validate_on_submit():
+        user = User(email=form.email.data,
+                    username=form.username.data,
+                    password=form.password.data, is_admin=form.is_admin.data, role=form.role.data)
+
+        # add user to the database
+        db.session.add(user)
+        db.session.commit()
+        flash('You have successfully added the user!')
+
+        # redirect to the users page
+        return redirect(url_for('admin.list_users'))
+
+    # load registration template
+    return render_template('admin/users/user.html', add_user=add_user, form=form, title='Add User')
+
+
+@admin.route('/users/edit/<int:id>', methods=['GET', 'POST'])
+@login_required
+def edit_user(id):
+    """
+    Edit a user
+    """
+    check_admin()
+
+    add_user = False
+
+    user = User.query.get_or_404(id)
+
+    # prevent admin from being edited
+    # if user.is_admin:
+    #     abort(403)
+
+    form = UserEditForm(obj=user)
+    if form.validate_on_submit():
+        user.email = form.email.data
+        user.username = form.username.data
+        user.password = form.password.data
+        user.role = form.role.data
+        db.session.add(user)
+        db.session.commit()
+        identity_cache.delete(user_key(id))
+        flash('You have successfully edited the user.')
+
+        # redirect to the users page
+        return redirect(url_for('admin.list_users'))
+
+    return render_template('admin/users/user.html', user=user, form=form, add_user=add_user,
+                           title='Edit User')
+
+
+@admin.route('/users/bulk', methods=['POST'])
+@login_required
+def bulk_users():
+    """
+    Assign a role to the selected users in one transaction, or preview how
+    many users would change
+    """
+    check_admin()
+
+    form = UserBulkForm()
+    if not form.validate_on_submit():
+        _flash_errors(form)
+        return redirect(url_for('admin.list_users'))
+
+    role = form.role.data
+    ids = bulk.assign_role(form.ids.data, role, dry_run=not form.submit.data)
+    summary = '{} {} of the {} selected users'.format(
+        'assign the role {} to'.format(role.name) if role else 'remove the role from', len(ids), len(form.ids.data))
+    if not form.submit.data:
+        db.session.rollback()
+        return render_template('admin/bulk.html', form=form, summary=summary,
+                               hidden=[('role', role.id if role else '__None')],
+                               action=url_for('admin.bulk_users'), cancel=url_for('admin.list_users'),
+                               title='Bulk Action')
+
+    db.session.commit()
+    for id in ids:
+        identity_cache.delete(user_key(id))
+    flash('You have successfully updated {} users.'.format(len(ids)))
+
+    # redirect to the users page
+    return redirect(url_for('admin.list_users'))
+
+
+# Category Views
+
+@admin.route('/categories')
+@login_required
+@read_only
+def list_categories():
+    check_admin()
+    """
+    List all categories
+    """
+    page = paginate_request(Category.query, Category)
+    return render_template('admin/categories/categories.html',
+                           categories=page.items, page=page,
+                           counts=facets.project_counts('category', [item.id for item in page.items]),
+                           title='Categories')
+
+
+@admin.route('/categories/add', methods=['GET', 'POST'])
+@login_required
+def add_category():
+    """
+    Add a category to the database
+    """
+    check_admin()
+
+    add_category = True
+
+    form = CategoryForm()
+    if form.validate_on_submit():
+        category = Category(name=form.name.data, description=form.description.data)
+
+        try:
+            # add category to the database
+            db.session.add(category)
+            db.session.commit()
+            flash('You have successfully added a new category.')
+        except:
+            # in case category name already exists
+            flash('Error: category name already exists.')
+
+        # redirect to the category page
+        return redirect(url_for('admin.list_categories'))
+
+    # load category template
+    return render_template('admin/categories/category.html', add_category=add_category,
+                           form=form, title='Add Category')
+
+
+@admin.route('/categories/edit/<int:id>', methods=['GET', 'POST'])
+@login_required
+def edit_category(id):
+    """
+    Edit a category
+    """
+    check_admin()
+
+    add_category = False
+
+    category = Category.query.get_or_404(id)
+    form = CategoryForm(obj=category)
+    if form.validate_on_submit():
+        category.name = form.name.data
+        category.description = form.description.data
+        db.session.add(category)
+        project_ids = search.linked_project_ids(Category, category.id)
+        search.index_projects(project_ids)
+        summaries.refresh(project_ids)
+        db.session.commit()
+        page_cache.invalidate(PROJECT_LIST_TAG, *project_tags(project_ids))
+        flash('You have successfully edited the category.')
+
+        # redirect to the categories page
+        return redirect(url_for('admin.list_categories'))
+
+    form.description.data = category.description
+    form.name.data = category.name
+    return render_template('admin/categories/category.html', add_category=add_category,
+                           form=form, title="Edit Category")
+
+
+@admin.route('/categories/delete/<int:id>', methods=['GET', 'POST'])
+@login_required
+def delete_category(id):
+    """
+    Delete a category from the database
+    """
+    check_admin()
+
+    category = Category.query.get_or_404(id)
+    project_ids = bulk.unlink_projects('category', id)
+    db.session.delete(category)
+    search.index_projects(project_ids)
+    summaries.refresh(project_ids)
+    facets.remove_value('category', id)
+    db.session.commit()
+    page_cache.invalidate(PROJECT_LIST_TAG, *project_tags(project_ids))
+    flash('You have successfully deleted the category.')
+
+    # redirect to the categories page
+    return redirect(url_for('admin.list_categories'))
+
+    return render_template(title="Delete Category")
+
+
+# Project Views
+
+@admin.route('/projects')
+@login_required
+@read_only
+def list_projects():
+    check_admin()
+    """
+    List all projects
+    """
+    page = paginate_request(ProjectSummary.query, ProjectSummary)
+    return render_template('admin/projects/projects.html',
+                           projects=page.items, page=page, bulk_form=ProjectBulkForm(), title='Projects')
+
+
+@admin.route('/projects/export.<format>')
+@login_required
+def export_projects(format):
+    """
+    Stream the whole catalog as CSV or NDJSON
+    """
+    check_admin()
+
+    if format not in export.FORMATS:
+        abort(404)
+    encode, mimetype = export.FORMATS[format]
+    return Response(stream_with_context(encode(export.iter_projects())), mimetype=mimetype,
+                    headers={'Content-Disposition': 'attachment; filename=projects.{}'.format(format)})
+
+
+@admin.route('/projects/add', methods=['GET', 'POST'])
+@login_required
+def add_project():
+    """
+    Add a project to the database
+    """
+    check_admin()
+
+    add_project = True
+
+    form = ProjectForm()
+    if form.validate_on_submit():
+        project = Project(name=form.name.data, description=form.description.data, location=form.location.data,
+                          url=form.url.data, categories=form.categories.data, individuals=form.individuals.data,
+                          organizations=form.organizations.data)
+
+        try:
+            # add project to the database
+            db.session.add(project)
+            db.session.flush()
+        except IntegrityError:
+            # in case project name already exists
+            db.session.rollback()
+            flash('Error: project name already exists.')
+        else:
+            search.index_projects([project.id])
+            summaries.refresh([project.id])
+            facets.adjust(set(), facets.project_values(project))
+            affected = related.refresh(project.id)
+            db.session.commit()
+            page_cache.invalidate(PROJECT_LIST_TAG, *project_tags(affected))
+            flash('You have successfully added a new project.')
+
+        # redirect to the project page
+        return redirect(url_for('admin.list_projects'))
+
+    # load project template
+    return render_template('admin/projects/project.html', add_project=add_project,
+                           form=form, title='Add Project')
+
+
+@admin.route('/projects/edit/<int:id>', methods=['GET', 'POST'])
+@login_required
+def edit_project(id):
+    """
+    Edit a project
+    """
+    check_admin()
+
+    add_project = False
+
+    project = Project.query.get_or_404(id)
+    form = ProjectForm(obj=project)
+    if form.validate_on_submit():
+        before = facets.project_values(project)
+        project.name = form.name.data
+        project.description = form.description.data
+        project.location = form.location.data
+        project.url = form.url.data
+        project.categories = form.categories.data
+        project.individuals = form.individuals.data
+        project.organizations = form.organizations.data
+        db.session.add(project)
+        search.index_projects([project.id])
+        summaries.refresh([project.id])
+        facets.adjust(before, facets.project_values(project))
+        affected = related.refresh(project.id)
+        db.session.commit()
+        page_cache.invalidate(PROJECT_LIST_TAG, project_tag(id), *project_tags(affected))
+        flash('You have successfully edited the project.')
+
+        # redirect to the projects page
+        return redirect(url_for('admin.list_projects'))
+
+    form.description.data = project.description
+    form.name.data = project.name
+    return render_template('admin/projects/project.html', add_project=add_project,
+                           form=form, title="Edit Project")
+
+
+@admin.route('/projects/delete/<int:id>', methods=['GET', 'POST'])
+@login_required
+def delete_project(id):
+    """
+    Delete a project from the database
+    """
+    check_admin()
+
+    project = Project.query.get_or_404(id)
+    facets.adjust(facets.project_values(project), set())
+    affected = related.remove(project.id)
+    summaries.remove([project.id])
+    db.session.delete(project)
+    search.remove_projects([project.id])
+    db.session.commit()
+    page_cache.invalidate(PROJECT_LIST_TAG, project_tag(id), *project_tags(affected))
+    flash('You have successfully deleted the project.')
+
+    # redirect to the projects page
+    return redirect(url_for('admin.list_projects'))
+
+    return render_template(title="Delete Project")
+
+
+@admin.route('/projects/bulk', methods=['POST'])
+@login_required
+def bulk_projects():
+    """
+    Delete, categorize or attach an investor to the selected projects in
+    one transaction, or preview how many projects would change
+    """
+    check_admin()
+
+    form = ProjectBulkForm()
+    if not form.validate_on_submit():
+        _flash_errors(form)
+        return redirect(url_for('admin.list_projects'))
+
+    action = form.action.data
+    dry_run = not form.submit.data
+    affected = set()
+    if action == 'delete':
+        ids, affected = bulk.delete_projects(form.ids.data, dry_run=dry_run)
+        summary = 'delete {} of the {} selected projects'
+        hidden = [('action', action)]
+        message = 'You have successfully deleted {} projects.'
+    elif action == 'category':
+        category = form.category.data
+        ids = bulk.link_projects(form.ids.data, 'category', category.id, dry_run=dry_run)
+        summary = 'assign the category {} to {{}} of the {{}} selected projects'.format(category.name)
+        hidden = [('action', action), ('category', category.id)]
+        message = 'You have successfully categorized {} projects.'
+    else:
+        organization = form.organization.data
+        ids = bulk.link_projects(form.ids.data, 'investor', organization.id, dry_run=dry_run)
+        summary = 'attach the investor {} to {{}} of the {{}} selected projects'.format(organization.name)
+        hidden = [('action', action), ('organization', organization.id)]
+        message = 'You have successfully attached the investor to {} projects.'
+    summary = summary.format(len(ids), len(form.ids.data))
+
+    if dry_run:
+        db.session.rollback()
+        return render_template('admin/bulk.html', form=form, summary=summary, hidden=hidden,
+                               action=url_for('admin.bulk_projects'), cancel=url_for('admin.list_projects'),
+                               title='Bulk Action')
+
+    db.session.commit()
+    page_cache.invalidate(PROJECT_LIST_TAG, *project_tags(set(ids) | affected))
+    flash(message.format(len(ids)))
+
+    # redirect to the projects page
+    return redirect(url_for('admin.list_projects'))
+
+
+# Individual Views
+
+@admin.route('/individuals')
+@login_required
+@read_only
+def list_individuals():
+    check_admin()
+    """
+    List all individuals
+    """
+    page = paginate_request(Individual.query, Individual)
+    return render_template('admin/individuals/individuals.html',
+                           individuals=page.items, page=page,
+                           counts=facets.project_counts('team', [item.id for item in page.items]),
+                           title='Individuals')
+
+
+@admin.route('/individuals/add', methods=['GET', 'POST'])
+@login_required
+def add_individual():
+    """
+    Add a individual to the database
+    """
+    check_admin()
+
+    add_individual = True
+
+    form = IndividualForm()
+    if form.validate_on_submit():
+        individual = Individual(name=form.name.data, description=form.description.data)
+
+        try:
+            # add individual to the database
+            db.session.add(individual)
+            db.session.commit()
+            flash('You have successfully added a new individual.')
+        except:
+            # in case individual name already exists
+            flash('Error: individual name already exists.')
+
+        # redirect to the individual page
+        return redirect(url_for('admin.list_individuals'))
+
+    # load individual template
+    return render_template('admin/individuals/individual.html', add_individual=add_individual,
+                           form=form, title='Add Individual')
+
+
+@admin.route('/individuals/edit/<int:id>', methods=['GET', 'POST'])
+@login_required
+def edit_individual(id):
+    """
+    Edit a individual
+    """
+    check_admin()
+
+    add_individual = False
+
+    individual = Individual.query.get_or_404(id)
+    form = IndividualForm(obj=individual)
+    if form.validate_on_submit():
+        individual.name = form.name.data
+        individual.description = form.description.data
+        db.session.add(individual)
+        project_ids = search.linked_project_ids(Individual, individual.id)
+        search.index_projects(project_ids)
+        db.session.commit()
+        page_cache.invalidate(PROJECT_LIST_TAG, *project_tags(project_ids))
+        flash('You have successfully edited the individual.')
+
+        # redirect to the individuals page
+        return redirect(url_for('admin.list_individuals'))
+
+    form.description.data = individual.description
+    form.name.data = individual.name
+    return render_template('admin/individuals/individual.html', add_individual=add_individual,
+                           form=form, title="Edit Individual")
+
+
+@admin.route('/individuals/delete/<int:id>', methods=['GET', 'POST'])
+@login_required
+def delete_individual(id):
+    """
+    Delete an individual from the database
+    """
+    check_admin()
+
+    individual = Individual.query.get_or_404(id)
+    project_ids = bulk.unlink_projects('team', id)
+    db.session.delete(individual)
+    search.index_projects(project_ids)
+    facets.remove_value('team', id)
+    db.session.commit()
+    page_cache.invalidate(PROJECT_LIST_TAG, *project_tags(project_ids))
+    flash('You have successfully deleted the individual.')
+
+    # redirect to the individuals page
+    return redirect(url_for('admin.list_individuals'))
+
+    return render_template(title="Delete Individual")
+
+
+# Organization Views
+
+@admin.route('/organizations')
+@login_required
+@read_only
+def list_organizations():
+    check_admin()
+    """
+    List all organizations
+    """
+    page = paginate_request(Organization.query, Organization)
+    return render_template('admin/organizations/organizations.html',
+                           organizations=page.items, page=page,
+                           counts=facets.project_counts('investor', [item.id for item in page.items]),
+                           title='Organizations')
+
+
+@admin.route('/organizations/add', methods=['GET', 'POST'])
+@login_required
+def add_organization():
+    """
+    Add an organization to the database
+    """
+    check_admin()
+
+    add_organization = True
+
+    form = OrganizationForm()
+    if form.validate_on_submit():
+        organization = Organization(name=form.name.data, description=form.description.data)
+
+        try:
+            # add organization to the database
+            db.session.add(organization)
+            db.session.commit()
+            flash('You have successfully added a new organization.')
+        except:
+            # in case organization name already exists
+            flash('Error: organization name already exists.')
+
+        # redirect to the organizations page
+        return redirect(url_for('admin.list_organizations'))
+
+    # load organization template
+    return render_template('admin/organizations/organization.html', add_organization=add_organization,
+                           form=form, title='Add Organization')
+
+
+@admin.route('/organizations/edit/<int:id>', methods=['GET', 'POST'])
+@login_required
+def edit_organization(id):
+    """
+    Edit an organization
+    """
+    check_admin()
+
+    add_organization = False
+
+    organization = Organization.query.get_or_404(id)
+    form = OrganizationForm(obj=organization)
+    if form.validate_on_submit():
+        organization.name = form.name.data
+        organization.description = form.description.data
+        db.session.add(organization)
+        project_ids = search.linked_project_ids(Organization, organization.id)
+        search.index_projects(project_ids)
+        db.session.commit()
+        page_cache.invalidate(PROJECT_LIST_TAG, *project_tags(project_ids))
+        flash('You have successfully edited the organization.')
+
+        # redirect to the organizations page
+        return redirect(url_for('admin.list_organizations'))
+
+    form.description.data = organization.description
+    form.name.data = organization.name
+    return render_template('admin/organizations/organization.html', add_organization=add_organization,
+                           form=form, title="Edit Organization")
+
+
+@admin.route('/organizations/delete/<int:id>', methods=['GET', 'POST'])
+@login_required
+def delete_organization(id):
+    """
+    Delete an organization from the database
+    """
+    check_admin()
+
+    organization = Organization.query.get_or_404(id)
+    project_ids = bulk.unlink_projects('investor', id)
+    db.session.delete(organization)
+    search.index_projects(project_ids)
+    facets.remove_value('investor', id)
+    db.session.commit()
+    page_cache.invalidate(PROJECT_LIST_TAG, *project_tags(project_ids))
+    flash('You have successfully deleted the organization.')
+
+    # redirect to the organizations page
+    return redirect(url_for('admin.list_organizations'))
+
+    return render_template(title="Delete Organization")
+
+
+# Cache Views
+
+@admin.route('/cache')
+@login_required
+def cache_stats():
+    """
+    Show the hit rate and size of the rendered-page cache
+    """
+    check_admin()
+
+    return render_template('admin/cache.html', stats=page_cache.stats(), title='Page Cache')
+
+
+# Metrics Views
+
+@admin.route('/metrics')
+@login_required
+def metrics():
+    """
+    Show per-endpoint response time histograms, SQL and render timings
+    """
+    check_admin()
+
+    return render_template('admin/metrics.html', endpoints=instrumentation.snapshot(), buckets=BUCKETS,
+                           title='Metrics')
\ No newline at end of file
@@ -0,0 +1,264 @@
+import hashlib
+import json
+from datetime import timezone
+
+from flask import Response, abort, current_app, jsonify, request, stream_with_context, url_for
+from sqlalchemy import literal, select, union_all
+
+from . import api
+from .. import changes, db
+from ..models import Project, Category, Individual, Organization, project_category, project_individual, \
+    project_organization
+from ..pagination import paginate_request
+
+# Association table and column linking each related model to projects
+LINKS = {
+    Category: (project_category, project_category.c.category_id),
+    Individual: (project_individual, project_individual.c.individual_id),
+    Organization: (project_organization, project_organization.c.organization_id),
+}
+
+
+def _validators(rows, *extra):
+    """
+    Build a strong ETag and a Last-Modified date from (version, timestamp) rows
+    """
+    rows = list(rows)
+    digest = hashlib.sha1(repr((rows,) + extra).encode('utf-8')).hexdigest()
+    dates = [row[-1] for row in rows if row[-1] is not None]
+    last_modified = max(dates).replace(tzinfo=timezone.utc, microsecond=0) if dates else None
+    return digest, last_modified
+
+
+def _not_modified(etag, last_modified):
+    """
+    Check the request's conditional headers, If-None-Match takes precedence
+    and is compared weakly as compressed responses carry a weak ETag
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    if since is not None and last_modified is not None:
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified <= since
+    return False
+
+
+def conditional(validator_rows, build, *extra):
+    """
+    Answer with 304 Not Modified when the client's copy is current, otherwise
+    serialize the payload returned by `build`. Validators are computed from
+    row versions and `extra` only, so a repeat poll never loads the ORM graph.
+    """
+    etag, last_modified = _validators(validator_rows, request.full_path, *extra)
+    if _not_modified(etag, last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
+def _page_versions(model, *related):
+    """
+    Versions of the rows on the requested page and of the rows linked to
+    them, and the page's cursors: the same keyset query as the page but
+    over the id, version and timestamp only, so a poll costs a page worth
+    of rows whatever the size of the table
+    """
+    page = paginate_request(db.session.query(model.id, model.version, model.updated_at), model)
+    rows = [(model.__tablename__,) + tuple(row) for row in page.items]
+    ids = [row.id for row in page.items]
+    for other in related:
+        table, column = LINKS[other]
+        if ids:
+            rows.extend(sorted(db.session.execute(
+                select(literal(other.__tablename__), table.c.project_id, other.id, other.version, other.updated_at)
+                .join(table, column == other.id).where(table.c.project_id.in_(ids))),
+                key=lambda row: (row[1], row[2])))
+    return rows, (page.next_cursor, page.prev_cursor)
+
+
+def _entity_versions(model, id, *related):
+    """
+    Versions of one row and of every row linked to it, sorted for a stable ETag
+    """
+    queries = [select(literal(model.__tablename__), model.id, model.version, model.updated_at)
+               .where(model.id == id)]
+    for other in related:
+        if model is Project:
+            table, column = LINKS[other]
+            queries.append(select(literal(other.__tablename__), other.id, other.version, other.updated_at)
+                           .join(table, column == other.id).where(table.c.project_id == id))
+        else:
+            table, column = LINKS[model]
+            queries.append(select(literal(other.__tablename__), other.id, other.version, other.updated_at)
+                           .join(table, table.c.project_id == other.id).where(column == id))
+    rows = sorted(db.session.execute(union_all(*queries)), key=lambda row: (row[0], row[1]))
+    if not any(row[0] == model.__tablename__ for row in rows):
+        abort(404)
+    return rows
+
+
+def _reference(item):
+    return {'id': item.id, 'name': item.name}
+
+
+def _project(project, detail=False):
+    data = {
+        'id': project.id,
+        'name': project.name,
+        'description': project.description,
+        'location': project.location,
+        'url': project.url,
+        'version': project.version,
+        'updated_at': project.updated_at.isoformat() + 'Z' if project.updated_at else None,
+        'categories': [_reference(item) for item in project.categories],
+    }
+    if detail:
+        data['individuals'] = [_reference(item) for item in project.individuals]
+        data['organizations'] = [_reference(item) for item in project.organizations]
+    return data
+
+
+def _item(item):
+    return {
+        'id': item.id,
+        'name': item.name,
+        'description': item.description,
+        'version': item.version,
+        'updated_at': item.updated_at.isoformat() + 'Z' if item.updated_at else None,
+    }
+
+
+def _page(page, endpoint, serialize):
+    limit = request.args.get('limit', type=int)
+    return {
+        'items': [serialize(item) for item in page.items],
+        'next': url_for(endpoint, after=page.next_cursor, limit=limit) if page.has_next else None,
+        'prev': url_for(endpoint, before=page.prev_cursor, limit=limit) if page.has_prev else None,
+    }
+
+
+def _linked_projects(model, id):
+    table, column = LINKS[model]
+    return [_reference(project) for project in
+            Project.query.join(table, table.c.project_id == Project.id).filter(column == id)
+            .order_by(Project.name)]
+
+
+@api.route('/projects')
+def list_projects():
+    """
+    List projects with their categories
+    """
+    rows, cursors = _page_versions(Project, Category)
+    return conditional(rows, lambda: _page(paginate_request(Project.with_relations('categories'), Project),
+                                           'api.list_projects', _project), cursors)
+
+
+@api.route('/projects/<int:id>')
+def get_project(id):
+    """
+    A project with its categories, team and investors
+    """
+    return conditional(_entity_versions(Project, id, Category, Individual, Organization),
+                       lambda: _project(Project.with_relations().get_or_404(id), detail=True))
+
+
+def _list(model, endpoint):
+    rows, cursors = _page_versions(model)
+    return conditional(rows, lambda: _page(paginate_request(model.query, model), endpoint, _item), cursors)
+
+
+def _get(model, id):
+    def build():
+        data = _item(model.query.get_or_404(id))
+        data['projects'] = _linked_projects(model, id)
+        return data
+
+    return conditional(_entity_versions(model, id, Project), build)
+
+
+@api.route('/categories')
+def list_categories():
+    """
+    List categories
+    """
+    return _list(Category, 'api.list_categories')
+
+
+@api.route('/categories/<int:id>')
+def get_category(id):
+    """
+    A category with its projects
+    """
+    return _get(Category, id)
+
+
+@api.route('/individuals')
+def list_individuals():
+    """
+    List individuals
+    """
+    return _list(Individual, 'api.list_individuals')
+
+
+@api.route('/individuals/<int:id>')
+def get_individual(id):
+    """
+    An individual with the projects they work on
+    """
+    return _get(Individual, id)
+
+
+@api.route('/organizations')
+def list_organizations():
+    """
+    List organizations
+    """
+    return _list(Organization, 'api.list_organizations')
+
+
+@api.route('/organizations/<int:id>')
+def get_organization(id):
+    """
+    An organization with the projects it invested in
+    """
+    return _get(Organization, id)
+
+
+@api.route('/changes')
+def list_changes():
+    """
+    Catalog changes made after the ?since= sequence number, oldest first,
+    streamed in batches. Answers 410 Gone when some of them were dropped by
+    compaction, the client must then copy the catalog again and continue
+    from the `latest` sequence number.
+    """
+    since = request.args.get('since', 0, type=int)
+    limit = request.args.get('limit', type=int) or current_app.config.get('CHANGES_PAGE_SIZE', 1000)
+    limit = max(1, min(limit, current_app.config.get('CHANGES_MAX_PAGE_SIZE', 10000)))
+    horizon = changes.horizon()
+    if since < horizon:
+        response = jsonify({'error': 'Changes up to {} were compacted away, resync the catalog.'.format(horizon),
+                            'horizon': horizon, 'latest': changes.latest()})
+        response.status_code = 410
+        return response
+
+    def generate():
+        last, count = since, 0
+        yield '{"changes": ['
+        for row in changes.since(since, limit):
+            yield (',\n' if count else '\n') + json.dumps(changes.serialize(row))
+            last, count = row.seq, count + 1
+        more = count == limit and changes.latest() > last
+        yield '\n], "since": {}, "next": {}, "more": {}}}\n'.format(since, last, json.dumps(more))
+
+    response = Response(stream_with_context(generate()), mimetype='application/json')
+    response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,255 @@
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from werkzeug.exceptions import HTTPException
+
+from app import db
+from .database import _pragma_setter
+from .instrumentation import instrumentation
+
+# Async drivers of the databases the app supports, requirements.txt pins
+# aiosqlite, the others are installed with their database
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+
+def async_url(url):
+    """
+    The URL of the same database with its async driver
+    """
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError('No async driver known for {} databases.'.format(backend))
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def create_async_engine(app):
+    """
+    Async engine for the read-only views, on the read replica when one is
+    configured, with the pool and pragma settings of the sync engine
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = app.config.get('ASYNC_DATABASE_URI')
+    if url is None:
+        replica = app.config.get('DATABASE_READ_REPLICA')
+        url = async_url(app.config['SQLALCHEMY_BINDS'][replica] if replica
+                        else app.config['SQLALCHEMY_DATABASE_URI'])
+    options = {'pool_size': app.config.get('DATABASE_POOL_SIZE', 10),
+               'max_overflow': app.config.get('DATABASE_MAX_OVERFLOW', 20)}
+    if make_url(url).get_backend_name() == 'sqlite':
+        # keep connections open, aiosqlite starts a thread for each one
+        options['poolclass'] = AsyncAdaptedQueuePool
+    else:
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = app.config.get('DATABASE_POOL_RECYCLE', 1800)
+    engine = create_async_engine(url, **options)
+    if engine.dialect.name == 'sqlite' and app.config.get('DATABASE_PROFILE') == 'production':
+        pragmas = dict(app.config.get('SQLITE_PRAGMAS') or {})
+        pragmas.setdefault('busy_timeout', app.config.get('SQLITE_BUSY_TIMEOUT', 5000))
+        event.listen(engine.sync_engine, 'connect', _pragma_setter(pragmas))
+    instrumentation.instrument(engine.sync_engine)
+    return engine
+
+
+def _environ(scope, body=b''):
+    """
+    WSGI environ of an ASGI HTTP request
+    """
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else 'HTTP_' + name
+        value = value.decode('latin-1')
+        environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+
+def _start_message(status, headers):
+    return {
+        'type': 'http.response.start',
+        'status': int(status.split(' ', 1)[0]),
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+    }
+
+
+async def _read_body(receive):
+    body = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(body)
+
+
+class ASGIApp(object):
+    """
+    Serves the application over ASGI. GET and HEAD requests to the
+    ASYNC_ENDPOINTS views run on the event loop with their queries sent
+    through an async engine, so waiting on the database or on a slow client
+    does not hold a thread. Every other request, including all the admin
+    views, goes to the WSGI application in a pool of ASGI_THREADS threads.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.endpoints = frozenset(app.config.get('ASYNC_ENDPOINTS', ()))
+        self.engine = None
+        self.sessions = None
+        self.executor = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] != 'http':
+            raise ValueError('Unsupported ASGI scope type {}.'.format(scope['type']))
+        elif scope['method'] in ('GET', 'HEAD') and self.is_async(scope):
+            await self.handle(scope, send)
+        else:
+            await self.handle_wsgi(scope, receive, send)
+
+    async def startup(self):
+        from sqlalchemy.ext.asyncio import AsyncSession
+        from sqlalchemy.orm import sessionmaker
+
+        self.executor = ThreadPoolExecutor(self.app.config.get('ASGI_THREADS', 8), thread_name_prefix='wsgi')
+        if self.endpoints:
+            self.engine = create_async_engine(self.app)
+            self.sessions = sessionmaker(self.engine, class_=AsyncSession)
+        if self.app.config.get('WARMUP_ON_START'):
+            from .templating import warmup
+            await asyncio.get_running_loop().run_in_executor(self.executor, warmup, self.app)
+
+    async def shutdown(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.startup()
+                except Exception as error:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(error)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def is_async(self, scope):
+        if not self.endpoints:
+            return False
+        adapter = self.app.url_map.bind('localhost', script_name=scope.get('root_path') or None)
+        try:
+            endpoint, _ = adapter.match(scope['path'], method='GET')
+        except HTTPException:
+            return False
+        return endpoint in self.endpoints
+
+    async def handle(self, scope, send):
+        """
+        Dispatch a request on the event loop. The view code is unchanged: it
+        runs in a greenlet whose db.session is the async session, and every
+        query suspends the request until the database answers.
+        """
+        if self.sessions is None:
+            await self.startup()
+        environ = _environ(scope)
+        async with self.sessions() as session:
+            start, body = await session.run_sync(self._dispatch, environ)
+        await send(start)
+        await send({'type': 'http.response.body', 'body': body})
+
+    def _dispatch(self, session, environ):
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started.append(_start_message(status, headers))
+
+        # db.session is keyed on the application context (see
+        # session_scope), a context of its own makes the async session the
+        # one of this request only, and its teardown removes it again
+        app_context = self.app.app_context()
+        context = self.app.request_context(environ)
+        error = None
+        app_context.push()
+        try:
+            db.session.registry.set(session)
+            context.push()
+            try:
+                try:
+                    response = self.app.full_dispatch_request()
+                except Exception as e:
+                    error = e
+                    response = self.app.handle_exception(e)
+                body = b''.join(response(environ, start_response))
+            finally:
+                context.auto_pop(error)
+        finally:
+            app_context.pop(error)
+        return started[0], body
+
+    async def handle_wsgi(self, scope, receive, send):
+        """
+        Run the WSGI application in the thread pool, streamed bodies are
+        sent chunk by chunk as the thread produces them
+        """
+        if self.executor is None:
+            await self.startup()
+        loop = asyncio.get_running_loop()
+        environ = _environ(scope, await _read_body(receive))
+        started = []
+
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def start_response(status, headers, exc_info=None):
+            started.append(_start_message(status, headers))
+
+        def run():
+            iterable = self.app(environ, start_response)
+            try:
+                emit(started[-1])
+                for chunk in iterable:
+                    if chunk:
+                        emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                emit({'type': 'http.response.body', 'body': b''})
+            finally:
+                if hasattr(iterable, 'close'):
+                    iterable.close()
+
+        await loop.run_in_executor(self.executor, run)
@@ -0,0 +1,192 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import current_app, request, send_from_directory
+from werkzeug.security import safe_join
+
+# Files worth compressing ahead of time, fonts and images are compressed already
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.eot', '.ttf')
+
+# Hashed files never change, so browsers may keep them for a year without revalidating
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+MANIFEST = 'manifest.json'
+
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def _static_folders(app):
+    """
+    (endpoint, folder) of the application and blueprint static folders
+    """
+    folders = []
+    if app.static_folder:
+        folders.append(('static', app.static_folder))
+    for name, blueprint in sorted(app.blueprints.items()):
+        if blueprint.has_static_folder:
+            folders.append(('{}.static'.format(name), blueprint.static_folder))
+    return folders
+
+
+def _hashed_name(path, content):
+    root, extension = posixpath.splitext(path)
+    return '{}.{}{}'.format(root, hashlib.sha256(content).hexdigest()[:12], extension)
+
+
+def _rewrite_css(path, content, names):
+    """
+    Point the relative url()s of a stylesheet at the hashed files
+    """
+
+    def replace(match):
+        quote, target = match.groups()
+        if re.match(r'^([a-z]+:|/|#)', target):
+            return match.group(0)
+        reference = re.split(r'[?#]', target, 1)[0]
+        suffix = target[len(reference):]
+        resolved = posixpath.normpath(posixpath.join(posixpath.dirname(path), reference))
+        if resolved not in names:
+            return match.group(0)
+        hashed = posixpath.join(posixpath.dirname(reference), posixpath.basename(names[resolved]))
+        return 'url({0}{1}{2}{0})'.format(quote, hashed, suffix)
+
+    return CSS_URL.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as output:
+        output.write(content)
+
+
+def _compress(path, content):
+    """
+    Write .gz and, when the brotli package is installed, .br variants that
+    are smaller than the original
+    """
+    written = 0
+    compressed = gzip.compress(content, compresslevel=9, mtime=0)
+    if len(compressed) < len(content):
+        _write(path + '.gz', compressed)
+        written += 1
+    try:
+        import brotli
+    except ImportError:
+        return written
+    compressed = brotli.compress(content, quality=11)
+    if len(compressed) < len(content):
+        _write(path + '.br', compressed)
+        written += 1
+    return written
+
+
+def build(app):
+    """
+    Copy every static file to the build folder under a content-hashed name,
+    precompress the text ones and write the manifest. Files of earlier
+    builds are kept so pages rendered before a deploy still find them.
+    Returns the number of files and of compressed variants written.
+    """
+    folder = app.config['ASSETS_BUILD_FOLDER']
+    manifest = {}
+    files = variants = 0
+    for endpoint, static_folder in _static_folders(app):
+        paths = []
+        for directory, _, filenames in os.walk(static_folder):
+            for filename in filenames:
+                full = os.path.join(directory, filename)
+                paths.append(os.path.relpath(full, static_folder).replace(os.sep, '/'))
+
+        # stylesheets last, so the files they reference already have their hashed names
+        names = manifest[endpoint] = {}
+        for path in sorted(paths, key=lambda path: (path.endswith('.css'), path)):
+            with open(os.path.join(static_folder, path), 'rb') as source:
+                content = source.read()
+            if path.endswith('.css'):
+                content = _rewrite_css(path, content, names)
+            names[path] = _hashed_name(path, content)
+            target = os.path.join(folder, endpoint, names[path])
+            _write(target, content)
+            files += 1
+            if path.endswith(COMPRESSIBLE):
+                variants += _compress(target, content)
+
+    _write(os.path.join(folder, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return files, variants
+
+
+class Assets(object):
+    """
+    Serves the fingerprinted build of the static files. url_for('static', ...)
+    and url_for('bootstrap.static', ...) emit the hashed file names, which
+    are sent precompressed when the client accepts it and cached for a year.
+    The original file names keep working with the default caching.
+    """
+
+    def __init__(self, app=None):
+        self.names = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_BUILD_FOLDER', os.path.join(app.instance_path, 'assets'))
+        app.extensions['assets'] = self
+        if not app.config.get('ASSETS_FINGERPRINT', True):
+            return
+        manifest = os.path.join(app.config['ASSETS_BUILD_FOLDER'], MANIFEST)
+        if not os.path.exists(manifest):
+            return
+        with open(manifest) as source:
+            self.names = json.load(source)
+
+        app.url_defaults(self._hashed_url)
+        # needs the blueprints registered, so initialize after them
+        for endpoint in self.names:
+            view = app.view_functions.get(endpoint)
+            if view is not None:
+                app.view_functions[endpoint] = self._view(endpoint, view)
+
+    def _hashed_url(self, endpoint, values):
+        names = self.names.get(endpoint)
+        if names is not None and values.get('filename') in names:
+            values['filename'] = names[values['filename']]
+
+    def _view(self, endpoint, view):
+        def send_asset(filename):
+            # hashed names of earlier builds are still in the build folder
+            folder = os.path.join(current_app.config['ASSETS_BUILD_FOLDER'], endpoint)
+            path = safe_join(folder, filename)
+            if path is None or not os.path.isfile(path):
+                return view(filename=filename)
+            return self.send(endpoint, filename)
+
+        return send_asset
+
+    def send(self, endpoint, filename):
+        """
+        Send a hashed file, choosing the smallest encoding the client accepts
+        """
+        folder = os.path.join(current_app.config['ASSETS_BUILD_FOLDER'], endpoint)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        accepted = request.accept_encodings
+        path, encoding = filename, None
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if accepted[candidate] and os.path.isfile(os.path.join(folder, filename + suffix)):
+                path, encoding = filename + suffix, candidate
+                break
+
+        response = send_from_directory(folder, path, mimetype=mimetype, max_age=31536000)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        if filename.endswith(COMPRESSIBLE):
+            response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = IMMUTABLE
+        return response
+
+
+static_assets = Assets()
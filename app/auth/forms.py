@@ -1,36 +1,36 @@
-from flask_wtf import FlaskForm
-from wtforms import PasswordField, StringField, BooleanField, SubmitField, ValidationError
-from wtforms.validators import DataRequired, Email, EqualTo
-
-from ..models import User
-
-
-class RegistrationForm(FlaskForm):
-    """
-    Form for users to create new account
-    """
-    email = StringField('Email', validators=[DataRequired(), Email()])
-    username = StringField('Username', validators=[DataRequired()])
-    password = PasswordField('Password', validators=[
-                                        DataRequired(),
-                                        EqualTo('confirm_password')
-                                        ])
-    confirm_password = PasswordField('Confirm Password')
-    submit = SubmitField('Register')
-
-    def validate_email(self, field):
-        if User.query.filter_by(email=field.data).first():
-            raise ValidationError('Email is already in use.')
-
-    def validate_username(self, field):
-        if User.query.filter_by(username=field.data).first():
-            raise ValidationError('Username is already in use.')
-
-
-class LoginForm(FlaskForm):
-    """
-    Form for users to login
-    """
-    email = StringField('Email', validators=[DataRequired(), Email()])
-    password = PasswordField('Password', validators=[DataRequired()])
+from flask_wtf import FlaskForm
+from wtforms import PasswordField, StringField, BooleanField, SubmitField, ValidationError
+from wtforms.validators import DataRequired, Email, EqualTo
+
+from ..models import User
+
+
+class RegistrationForm(FlaskForm):
+    """
+    Form for users to create new account
+    """
+    email = StringField('Email', validators=[DataRequired(), Email()])
+    username = StringField('Username', validators=[DataRequired()])
+    password = PasswordField('Password', validators=[
+                                        DataRequired(),
+                                        EqualTo('confirm_password')
+                                        ])
+    confirm_password = PasswordField('Confirm Password')
+    submit = SubmitField('Register')
+
+    def validate_email(self, field):
+        if User.query.filter_by(email=field.data).first():
+            raise ValidationError('Email is already in use.')
+
+    def validate_username(self, field):
+        if User.query.filter_by(username=field.data).first():
+            raise ValidationError('Username is already in use.')
+
+
+class LoginForm(FlaskForm):
+    """
+    Form for users to login
+    """
+    email = StringField('Email', validators=[DataRequired(), Email()])
+    password = PasswordField('Password', validators=[DataRequired()])
     submit = SubmitField('Login')
\ No newline at end of file
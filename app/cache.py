@@ -0,0 +1,237 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request, session
+from flask_login import current_user
+from werkzeug.utils import import_string
+
+# Tag shared by every page of the public project listing
+PROJECT_LIST_TAG = 'projects'
+
+
+def project_tag(id):
+    """
+    Tag of every cached page that shows the project with the given id
+    """
+    return 'project:{}'.format(id)
+
+
+def project_tags(ids):
+    """
+    Tags of the pages showing any of the given projects
+    """
+    return [project_tag(id) for id in ids]
+
+
+class MemoryCache(object):
+    """
+    In-process LRU cache with a per-entry TTL and tag-based invalidation
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._discard(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, tags=(), ttl=None):
+        expires = time.monotonic() + (ttl or self.ttl)
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (value, expires, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries),
+                    'max_entries': self.max_entries}
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisCache(object):
+    """
+    Cache shared by every worker, backed by Redis. Each tag is a Redis set
+    holding the keys of the entries it covers.
+    """
+
+    def __init__(self, url, ttl=300, prefix='pages:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        self.client.incr(self.prefix + ('_hits' if value is not None else '_misses'))
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, tags=(), ttl=None):
+        ttl = ttl or self.ttl
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, pickle.dumps(value), ex=ttl)
+        for tag in tags:
+            pipe.sadd(self.prefix + '_tag:' + tag, key)
+            pipe.expire(self.prefix + '_tag:' + tag, ttl)
+        pipe.execute()
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            tag_key = self.prefix + '_tag:' + tag
+            keys = self.client.smembers(tag_key)
+            pipe = self.client.pipeline()
+            for key in keys:
+                pipe.delete(self.prefix + key.decode())
+            pipe.delete(tag_key)
+            pipe.execute()
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+    def stats(self):
+        hits, misses = self.client.mget(self.prefix + '_hits', self.prefix + '_misses')
+        size = sum(1 for key in self.client.scan_iter(match=self.prefix + '*')
+                   if not key.decode()[len(self.prefix):].startswith('_'))
+        return {'hits': int(hits or 0), 'misses': int(misses or 0), 'size': size}
+
+
+class NullCache(object):
+    """
+    Cache that stores nothing, used when page caching is disabled
+    """
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, tags=(), ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def invalidate(self, *tags):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {'hits': 0, 'misses': 0, 'size': 0}
+
+
+class PageCache(object):
+    """
+    Server-side cache of rendered pages served to anonymous visitors
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('PAGE_CACHE_TYPE', 'memory')
+        ttl = app.config.get('PAGE_CACHE_TTL', 300)
+        if backend == 'memory':
+            self.backend = MemoryCache(app.config.get('PAGE_CACHE_SIZE', 1024), ttl)
+        elif backend == 'redis':
+            self.backend = RedisCache(app.config['PAGE_CACHE_REDIS_URL'], ttl)
+        elif backend in (None, 'null'):
+            self.backend = NullCache()
+        else:
+            # any other value is the import path of a custom backend class
+            self.backend = import_string(backend)(app)
+        app.extensions['page_cache'] = self
+
+    def invalidate(self, *tags):
+        self.backend.invalidate(*tags)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        stats = self.backend.stats()
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = float(stats['hits']) / lookups if lookups else 0.0
+        return stats
+
+    def cached(self, tags):
+        """
+        Cache the decorated view for anonymous GET requests. `tags` is called
+        with the view arguments and returns the tags the page depends on.
+        """
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                if request.method != 'GET' or current_user.is_authenticated or session.get('_flashes'):
+                    return view(**kwargs)
+
+                key = '{}?{}'.format(request.path, '&'.join(sorted(request.query_string.decode().split('&'))))
+                entry = self.backend.get(key)
+                if entry is not None:
+                    body, mimetype = entry
+                    return current_app.response_class(body, mimetype=mimetype, headers={'X-Cache': 'HIT'})
+
+                response = current_app.make_response(view(**kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self.backend.set(key, (response.get_data(), response.mimetype), tags(**kwargs))
+                response.headers['X-Cache'] = 'MISS'
+                return response
+
+            return wrapper
+
+        return decorator
+
+
+page_cache = PageCache()
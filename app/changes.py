@@ -0,0 +1,207 @@
+import json
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import DDL, event, func, inspect, select
+
+from app import db
+from .database import chunked
+from .models import Change, ChangeLogHorizon, Project, Category, Individual, Organization
+
+CREATE, UPDATE, DELETE = 'create', 'update', 'delete'
+
+# Entity name, logged columns and logged relationships (as lists of ids) of
+# the catalog models. Users and roles are not part of the public catalog.
+ENTITIES = {
+    Project: ('project', ('name', 'description', 'location', 'url'), ('categories', 'individuals', 'organizations')),
+    Category: ('category', ('name', 'description'), ()),
+    Individual: ('individual', ('name', 'description'), ()),
+    Organization: ('organization', ('name', 'description'), ()),
+}
+
+
+def entry(entity, entity_id, operation, fields=None, now=None):
+    """
+    A change log row, for write()
+    """
+    return {
+        'entity': entity,
+        'entity_id': entity_id,
+        'operation': operation,
+        'fields': json.dumps(fields, sort_keys=True) if fields is not None else None,
+        'changed_at': now or datetime.utcnow(),
+    }
+
+
+# The horizon row exists from the start, _serialize() locks it
+event.listen(ChangeLogHorizon.__table__, 'after_create',
+             DDL('INSERT INTO change_log_horizon (id, seq) VALUES (1, 0)'))
+
+
+def _serialize(session):
+    """
+    Hold the horizon row until the transaction ends, before it logs
+    changes. Sequence numbers are then handed out in commit order, so a
+    mirror that has seen one has seen every lower one: on PostgreSQL or
+    MySQL two overlapping transactions could otherwise commit their numbers
+    out of order. SQLite already lets a single writer in at a time.
+    """
+    if session.get_bind(Change.__mapper__).dialect.name == 'sqlite':
+        return
+    table = ChangeLogHorizon.__table__
+    if session.execute(select(table.c.id).where(table.c.id == 1).with_for_update()).first() is None:
+        # a database created before the row was
+        session.execute(table.insert().values(id=1, seq=0))
+
+
+def write(entries):
+    """
+    Append rows made with entry() to the log inside the current transaction,
+    for changes made with Core statements that the session does not see
+    """
+    if entries:
+        _serialize(db.session)
+        db.session.execute(Change.__table__.insert(), entries)
+
+
+def _fields(instance, changed_only):
+    state = inspect(instance)
+    _, columns, relations = ENTITIES[type(instance)]
+    fields = {}
+    for name in columns:
+        if not changed_only or state.attrs[name].history.has_changes():
+            fields[name] = getattr(instance, name)
+    for name in relations:
+        if not changed_only or state.attrs[name].history.has_changes():
+            fields[name] = sorted(item.id for item in getattr(instance, name))
+    return fields
+
+
+@event.listens_for(db.session, 'after_flush')
+def log_changes(session, flush_context):
+    """
+    Log the catalog rows the flush created, changed or deleted, with the
+    new values of the changed fields
+    """
+    now = datetime.utcnow()
+    entries = []
+    for instance in session.new:
+        if type(instance) in ENTITIES:
+            entries.append(entry(ENTITIES[type(instance)][0], instance.id, CREATE, _fields(instance, False), now))
+    for instance in session.dirty:
+        if type(instance) in ENTITIES and session.is_modified(instance):
+            fields = _fields(instance, True)
+            if fields:
+                entries.append(entry(ENTITIES[type(instance)][0], instance.id, UPDATE, fields, now))
+    for instance in session.deleted:
+        if type(instance) in ENTITIES:
+            entries.append(entry(ENTITIES[type(instance)][0], instance.id, DELETE, now=now))
+    if entries:
+        _serialize(session)
+        session.execute(Change.__table__.insert(), entries)
+
+
+def horizon():
+    """
+    Highest sequence number dropped by compact(), 0 if none was
+    """
+    return db.session.execute(select(ChangeLogHorizon.seq).where(ChangeLogHorizon.id == 1)).scalar() or 0
+
+
+def latest():
+    """
+    Sequence number of the newest change, a new mirror syncs from there
+    after copying the catalog
+    """
+    return db.session.execute(select(func.max(Change.seq))).scalar() or horizon()
+
+
+def since(seq, limit, batch_size=500):
+    """
+    Yield up to `limit` changes made after `seq` in order, fetched
+    `batch_size` at a time with a seek on the primary key
+    """
+    table = Change.__table__
+    while limit > 0:
+        rows = db.session.execute(select(table).where(table.c.seq > seq).order_by(table.c.seq)
+                                  .limit(min(batch_size, limit))).fetchall()
+        for row in rows:
+            yield row
+        if len(rows) < min(batch_size, limit):
+            return
+        seq = rows[-1].seq
+        limit -= len(rows)
+
+
+def serialize(row):
+    return {
+        'seq': row.seq,
+        'entity': row.entity,
+        'id': row.entity_id,
+        'operation': row.operation,
+        'fields': json.loads(row.fields) if row.fields else None,
+        'changed_at': row.changed_at.isoformat() + 'Z',
+    }
+
+
+def _merge(rows):
+    """
+    Fold the changes of one entity, oldest first, into the operation and
+    fields a mirror needs to catch up from before the first of them
+    """
+    operation, fields = None, None
+    for row in rows:
+        values = json.loads(row.fields) if row.fields else {}
+        if row.operation == DELETE:
+            operation, fields = DELETE, None
+        elif row.operation == CREATE or operation == DELETE:
+            # the entity (re)appears, fields it had before do not matter
+            operation, fields = CREATE, values
+        else:
+            operation, fields = operation or UPDATE, dict(fields or {}, **values)
+    return operation, fields
+
+
+def compact(retention_days=None, compact_after_days=None):
+    """
+    Drop the changes older than the retention period and fold the older
+    changes of every entity into its newest one, so a mirror that is days
+    behind replays one change per entity. Returns the number of rows removed.
+    """
+    config = current_app.config
+    retention_days = retention_days if retention_days is not None else config.get('CHANGES_RETENTION_DAYS', 90)
+    compact_after_days = compact_after_days if compact_after_days is not None \
+        else config.get('CHANGES_COMPACT_AFTER_DAYS', 7)
+    table = Change.__table__
+    now = datetime.utcnow()
+    removed = 0
+
+    dropped = db.session.execute(select(func.max(table.c.seq))
+                                 .where(table.c.changed_at < now - timedelta(days=retention_days))).scalar()
+    if dropped is not None:
+        removed += db.session.execute(table.delete().where(table.c.seq <= dropped)).rowcount
+        state = db.session.get(ChangeLogHorizon, 1) or ChangeLogHorizon(id=1, seq=0)
+        state.seq = max(state.seq or 0, dropped)
+        db.session.add(state)
+
+    last = db.session.execute(select(func.max(table.c.seq))
+                              .where(table.c.changed_at < now - timedelta(days=compact_after_days))).scalar()
+    if last is not None:
+        repeated = db.session.execute(select(table.c.entity, table.c.entity_id).where(table.c.seq <= last)
+                                      .group_by(table.c.entity, table.c.entity_id)
+                                      .having(func.count() > 1)).fetchall()
+        for chunk in chunked(repeated):
+            groups = {(entity, entity_id): [] for entity, entity_id in chunk}
+            ids = sorted({entity_id for _, entity_id in chunk})
+            for row in db.session.execute(select(table).where(table.c.seq <= last)
+                                          .where(table.c.entity_id.in_(ids)).order_by(table.c.seq)):
+                if (row.entity, row.entity_id) in groups:
+                    groups[(row.entity, row.entity_id)].append(row)
+            for rows in groups.values():
+                operation, fields = _merge(rows)
+                db.session.execute(table.update().where(table.c.seq == rows[-1].seq).values(
+                    operation=operation, fields=json.dumps(fields, sort_keys=True) if fields is not None else None))
+                older = [row.seq for row in rows[:-1]]
+                removed += db.session.execute(table.delete().where(table.c.seq.in_(older))).rowcount
+    db.session.commit()
+    return removed
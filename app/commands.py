@@ -0,0 +1,246 @@
+import click
+from flask.cli import AppGroup
+
+search_cli = AppGroup('search', help='Manage the project full-text search index.')
+cache_cli = AppGroup('cache', help='Inspect and clear the rendered-page cache.')
+catalog_cli = AppGroup('catalog', help='Bulk import and export the project catalog.')
+facets_cli = AppGroup('facets', help='Manage the project facet counts.')
+related_cli = AppGroup('related', help='Manage the related projects index.')
+summaries_cli = AppGroup('summaries', help='Maintain the project summaries the project lists render from.')
+assets_cli = AppGroup('assets', help='Build the fingerprinted static files.')
+changes_cli = AppGroup('changes', help='Maintain the catalog change log.')
+templates_cli = AppGroup('templates', help='Compile and warm up the Jinja templates.')
+snapshot_cli = AppGroup('snapshot', help='Write the public pages as static files.')
+
+
+@search_cli.command('rebuild')
+def rebuild_search_index():
+    """
+    Rebuild the project search index from the database
+    """
+    from . import search
+
+    count = search.rebuild()
+    click.echo('Indexed {} projects.'.format(count))
+
+
+@facets_cli.command('rebuild')
+def rebuild_facets():
+    """
+    Recount the project facets from the database
+    """
+    from . import facets
+
+    count = facets.rebuild()
+    click.echo('Counted {} facet values.'.format(count))
+
+
+@related_cli.command('rebuild')
+def rebuild_related():
+    """
+    Recompute the related projects of the whole catalog
+    """
+    from . import related
+
+    count = related.rebuild()
+    click.echo('Stored {} related project pairs.'.format(count))
+
+
+@summaries_cli.command('rebuild')
+def rebuild_summaries():
+    """
+    Recompute the summary of every project from the catalog
+    """
+    from . import summaries
+
+    count = summaries.rebuild()
+    click.echo('Summarized {} projects.'.format(count))
+
+
+@summaries_cli.command('check')
+@click.option('--repair', is_flag=True, help='Recompute the summaries found inconsistent.')
+def check_summaries(repair):
+    """
+    Compare the project summaries with the catalog, fails if they differ
+    """
+    from . import summaries
+
+    problems = summaries.check()
+    for kind, ids in sorted(problems.items()):
+        if ids:
+            click.echo('{} {}: {}'.format(len(ids), kind, ' '.join(str(id) for id in ids[:20])
+                                          + (' ...' if len(ids) > 20 else '')))
+    total = sum(len(ids) for ids in problems.values())
+    if not total:
+        click.echo('The project summaries are consistent.')
+    elif repair:
+        summaries.repair(problems)
+        click.echo('Repaired {} project summaries.'.format(total))
+    else:
+        raise click.ClickException('{} project summaries are inconsistent, run with --repair.'.format(total))
+
+
+@assets_cli.command('build')
+def build_assets():
+    """
+    Write content-hashed, precompressed copies of the static files
+    """
+    from flask import current_app
+    from . import assets
+
+    files, variants = assets.build(current_app)
+    click.echo('Built {} files and {} compressed variants into {}.'.format(
+        files, variants, current_app.config['ASSETS_BUILD_FOLDER']))
+
+
+@changes_cli.command('compact')
+@click.option('--retention-days', type=int, help='Drop older changes, CHANGES_RETENTION_DAYS by default.')
+@click.option('--compact-after-days', type=int,
+              help='Fold older changes per entity, CHANGES_COMPACT_AFTER_DAYS by default.')
+def compact_changes(retention_days, compact_after_days):
+    """
+    Drop expired changes and fold the older changes of each entity into one
+    """
+    from . import changes
+
+    removed = changes.compact(retention_days, compact_after_days)
+    click.echo('Removed {} changes, mirrors behind sequence {} must resync.'.format(removed, changes.horizon()))
+
+
+@templates_cli.command('compile')
+def compile_templates():
+    """
+    Compile every template into the bytecode cache, fails on syntax errors
+    """
+    from flask import current_app
+    from .templating import precompile
+
+    if current_app.jinja_env.bytecode_cache is None:
+        raise click.ClickException('JINJA_BYTECODE_CACHE is disabled.')
+    compiled, failed = precompile(current_app)
+    for name, error in failed:
+        click.echo('{}:{}: {}'.format(name, error.lineno, error.message), err=True)
+    click.echo('Compiled {} templates into {}.'.format(
+        len(compiled), current_app.config['JINJA_BYTECODE_CACHE_FOLDER']))
+    if failed:
+        raise click.ClickException('{} templates failed to compile.'.format(len(failed)))
+
+
+@templates_cli.command('warmup')
+def warmup_templates():
+    """
+    Render the WARMUP_URLS pages once and report the ones that fail
+    """
+    from flask import current_app
+    from .templating import warmup
+
+    rendered = warmup(current_app)
+    click.echo('Rendered {} of {} pages.'.format(rendered, len(current_app.config.get('WARMUP_URLS', ()))))
+
+
+@snapshot_cli.command('build')
+@click.option('--output', '-o', type=click.Path(file_okay=False),
+              help='Folder to write to, SNAPSHOT_FOLDER by default.')
+@click.option('--base-url', help='Absolute URL of the site for the sitemap, SNAPSHOT_BASE_URL by default.')
+@click.option('--processes', type=int, help='Rendering processes, SNAPSHOT_PROCESSES by default.')
+@click.option('--full', is_flag=True, help='Render every page, not only those changed since the last build.')
+def build_snapshot(output, base_url, processes, full):
+    """
+    Render the homepage, the project list, every project page and every
+    profile to static HTML with a sitemap, only the pages changed since the
+    last build unless --full
+    """
+    import os
+    from flask import current_app
+    from .snapshot import build
+
+    output = output or current_app.config.get('SNAPSHOT_FOLDER') or os.path.join(current_app.instance_path, 'snapshot')
+    base_url = base_url or current_app.config.get('SNAPSHOT_BASE_URL')
+    if not base_url:
+        raise click.ClickException('Set SNAPSHOT_BASE_URL or pass --base-url, the sitemap needs absolute URLs.')
+
+    def progress(done, total, elapsed):
+        click.echo('{:>10} of {} pages  {:>8.0f} pages/s'.format(done, total, done / elapsed if elapsed else 0),
+                   err=True)
+
+    counts = build(current_app._get_current_object(), output, base_url, full=full, processes=processes,
+                   progress=progress)
+    click.echo('Rendered {rendered} pages and removed {removed} into {output}.'.format(output=output, **counts))
+    if counts['failed']:
+        raise click.ClickException('{} pages failed to render, they are retried on the next build.'.format(
+            counts['failed']))
+
+
+@cache_cli.command('stats')
+def cache_stats():
+    """
+    Print the page cache hit rate and size
+    """
+    from .cache import page_cache
+
+    for name, value in sorted(page_cache.stats().items()):
+        click.echo('{}: {}'.format(name, value))
+
+
+@cache_cli.command('clear')
+def clear_cache():
+    """
+    Drop every cached page
+    """
+    from .cache import page_cache
+
+    page_cache.clear()
+    click.echo('Page cache cleared.')
+
+
+@catalog_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'format', type=click.Choice(['csv', 'jsonl']),
+              help='Input format, guessed from the file extension by default.')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows written per transaction.')
+def import_catalog(path, format, batch_size):
+    """
+    Upsert projects, and the categories, individuals and organizations
+    they reference, from a CSV or JSON lines file
+    """
+    from .importer import import_projects, read_rows
+
+    format = format or ('csv' if path.endswith('.csv') else 'jsonl')
+
+    def progress(total, elapsed):
+        click.echo('{:>10} rows  {:>8.0f} rows/s'.format(total, total / elapsed if elapsed else 0), err=True)
+
+    with open(path, encoding='utf-8', newline='') as stream:
+        total = import_projects(read_rows(stream, format), batch_size=batch_size, progress=progress)
+    click.echo('Imported {} projects.'.format(total))
+
+
+@catalog_cli.command('export')
+@click.option('--format', 'format', type=click.Choice(['csv', 'ndjson']), default='csv', show_default=True)
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8', lazy=True), default='-',
+              help='File to write to, standard output by default.')
+def export_catalog(format, output):
+    """
+    Stream every project with its categories, team and investors
+    """
+    from . import export
+
+    encode = export.FORMATS[format][0]
+    for chunk in encode(export.iter_projects()):
+        output.write(chunk)
+
+
+def register_commands(app):
+    """
+    Attach the CLI command groups to the application
+    """
+    app.cli.add_command(search_cli)
+    app.cli.add_command(cache_cli)
+    app.cli.add_command(catalog_cli)
+    app.cli.add_command(facets_cli)
+    app.cli.add_command(related_cli)
+    app.cli.add_command(summaries_cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(templates_cli)
+    app.cli.add_command(changes_cli)
+    app.cli.add_command(snapshot_cli)
@@ -0,0 +1,131 @@
+import hashlib
+import zlib
+
+from flask import request
+
+from .cache import MemoryCache
+
+
+def _brotli():
+    """
+    The brotli module, None when the optional package is not installed
+    """
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+class Compression(object):
+    """
+    Compresses text responses with brotli or gzip, whichever the client
+    accepts, brotli first. Streamed responses are compressed as they are
+    sent and flushed to the client every COMPRESS_FLUSH_SIZE bytes of
+    input. The compressed bodies of cacheable responses, pages from the
+    page cache or with an ETag, are kept so a page that did not change is
+    not compressed again on every hit.
+    """
+
+    def __init__(self, app=None):
+        self.bodies = MemoryCache()
+        self.brotli = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['compression'] = self
+        if not app.config.get('COMPRESS_ENABLED', True):
+            return
+        self.mimetypes = frozenset(app.config.get('COMPRESS_MIMETYPES', ()))
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+        self.level = app.config.get('COMPRESS_LEVEL', 6)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 4)
+        self.flush_size = app.config.get('COMPRESS_FLUSH_SIZE', 32 * 1024)
+        self.bodies.max_entries = app.config.get('COMPRESS_CACHE_SIZE', 256)
+        self.bodies.ttl = app.config.get('PAGE_CACHE_TTL', 300)
+        self.brotli = _brotli()
+        app.after_request(self.compress_response)
+
+    def _encoding(self):
+        accepted = request.accept_encodings
+        if self.brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def _compressor(self, encoding):
+        """
+        (compress, flush, finish) functions of a new streaming compressor
+        """
+        if encoding == 'br':
+            compressor = self.brotli.Compressor(quality=self.brotli_quality)
+            return compressor.process, compressor.flush, compressor.finish
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+    def compress(self, encoding, data):
+        compress, _, finish = self._compressor(encoding)
+        return compress(data) + finish()
+
+    def _cached(self, encoding, data):
+        key = (encoding, hashlib.blake2b(data, digest_size=16).digest())
+        compressed = self.bodies.get(key)
+        if compressed is None:
+            compressed = self.compress(encoding, data)
+            self.bodies.set(key, compressed)
+        return compressed
+
+    def _stream(self, encoding, chunks):
+        compress, flush, finish = self._compressor(encoding)
+        pending = 0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                data = compress(chunk)
+                pending += len(chunk)
+                # a flush per chunk ends the compressed block and pads it
+                # after every row of a few hundred bytes
+                if pending >= self.flush_size:
+                    data += flush()
+                    pending = 0
+                if data:
+                    yield data
+            yield finish()
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    def compress_response(self, response):
+        if not 200 <= response.status_code < 300 or response.status_code in (204, 206) \
+                or response.direct_passthrough or 'Content-Encoding' in response.headers \
+                or response.mimetype not in self.mimetypes:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self._encoding()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._stream(encoding, response.response)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            if request.method == 'GET' and ('X-Cache' in response.headers or 'ETag' in response.headers):
+                response.set_data(self._cached(encoding, data))
+            else:
+                response.set_data(self.compress(encoding, data))
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # the compressed bytes differ from the ones the strong ETag names
+            response.set_etag(etag, weak=True)
+        return response
+
+
+compression = Compression()
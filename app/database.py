@@ -0,0 +1,114 @@
+from functools import wraps
+
+from flask import _app_ctx_stack, g, has_request_context
+from flask_sqlalchemy import SignallingSession, SQLAlchemy, get_state
+from greenlet import getcurrent
+from sqlalchemy import event, orm
+from sqlalchemy.pool import QueuePool
+
+# Keep IN lists well below the SQLite bound-parameter limit
+CHUNK_SIZE = 500
+
+
+def chunked(items, size=CHUNK_SIZE):
+    """
+    Split `items` into lists of at most `size`, for statements with IN lists
+    """
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def read_only(view):
+    """
+    Mark a view as read-only so its queries may be sent to the read replica
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_replica = True
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def session_scope():
+    """
+    Key of db.session: the application context, which every request pushes
+    and whose teardown removes the session, so a request keeps one session
+    whatever thread or greenlet runs it. Without an application context it
+    is the current greenlet, as in Flask-SQLAlchemy.
+    """
+    context = _app_ctx_stack.top
+    return context if context is not None else getcurrent()
+
+
+class RoutingSession(SignallingSession):
+    """
+    Session that sends the queries of read-only views to the replica bind
+    and everything else, including any flush, to the primary database
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        replica = self.app.config.get('DATABASE_READ_REPLICA')
+        if replica and has_request_context() and g.get('use_replica') and not self._flushing \
+                and not (self.new or self.dirty or self.deleted):
+            return get_state(self.app).db.get_engine(self.app, bind=replica)
+        return SignallingSession.get_bind(self, mapper, clause)
+
+
+class Database(SQLAlchemy):
+    """
+    SQLAlchemy extension with a production engine profile and read/write routing
+    """
+
+    def create_scoped_session(self, options=None):
+        options = dict(options or {})
+        options.setdefault('scopefunc', session_scope)
+        return SQLAlchemy.create_scoped_session(self, options)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        sa_url, options = SQLAlchemy.apply_driver_hacks(self, app, sa_url, options)
+        if app.config.get('DATABASE_PROFILE') != 'production':
+            return sa_url, options
+
+        if sa_url.drivername.startswith('sqlite'):
+            if sa_url.database in (None, '', ':memory:'):
+                return sa_url, options
+            # keep connections open so the pragmas are only applied once per connection
+            options['poolclass'] = QueuePool
+            options.setdefault('connect_args', {})
+            options['connect_args'].setdefault('check_same_thread', False)
+            options['connect_args'].setdefault('timeout', app.config.get('SQLITE_BUSY_TIMEOUT', 5000) / 1000.0)
+        else:
+            options.setdefault('pool_pre_ping', True)
+            options.setdefault('pool_recycle', app.config.get('DATABASE_POOL_RECYCLE', 1800))
+            options.setdefault('pool_timeout', app.config.get('DATABASE_POOL_TIMEOUT', 30))
+        options.setdefault('pool_size', app.config.get('DATABASE_POOL_SIZE', 10))
+        options.setdefault('max_overflow', app.config.get('DATABASE_MAX_OVERFLOW', 20))
+        return sa_url, options
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = SQLAlchemy.create_engine(self, sa_url, engine_opts)
+        app = self.get_app()
+        if engine.dialect.name == 'sqlite' and app.config.get('DATABASE_PROFILE') == 'production':
+            pragmas = dict(app.config.get('SQLITE_PRAGMAS') or {})
+            pragmas.setdefault('busy_timeout', app.config.get('SQLITE_BUSY_TIMEOUT', 5000))
+            event.listen(engine, 'connect', _pragma_setter(pragmas))
+        instrumentation = app.extensions.get('instrumentation')
+        if instrumentation is not None:
+            instrumentation.instrument(engine)
+        return engine
+
+
+def _pragma_setter(pragmas):
+    def set_pragmas(connection, record):
+        cursor = connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA {} = {}'.format(name, value))
+        cursor.close()
+
+    return set_pragmas
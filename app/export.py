@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+
+from sqlalchemy import bindparam, select
+
+from app import db
+from .importer import RELATIONS, SEPARATOR
+from .models import Project
+
+COLUMNS = ('id', 'name', 'description', 'location', 'url', 'categories', 'individuals', 'organizations')
+
+# Rows fetched per round trip, also bounds the IN lists used for relations
+BATCH_SIZE = 500
+
+
+def _related_names(link_table, link_column, model, ids):
+    """
+    Names linked to each of the given projects, one query per relationship
+    """
+    names = {}
+    statement = select(link_table.c.project_id, model.name) \
+        .join(model, model.id == link_table.c[link_column]) \
+        .where(link_table.c.project_id.in_(bindparam('ids', expanding=True))) \
+        .order_by(link_table.c.project_id, model.name)
+    for project_id, name in db.session.execute(statement, {'ids': ids}):
+        names.setdefault(project_id, []).append(name)
+    return names
+
+
+def iter_projects(batch_size=BATCH_SIZE):
+    """
+    Yield every project as a dict with the names of its categories, team and
+    investors. Projects come from a server-side cursor fetched `batch_size`
+    rows at a time and relations are loaded per batch, so memory use does
+    not depend on the size of the catalog.
+    """
+    table = Project.__table__
+    statement = select(table.c.id, table.c.name, table.c.description, table.c.location, table.c.url) \
+        .order_by(table.c.id).execution_options(stream_results=True, yield_per=batch_size)
+    result = db.session.execute(statement)
+    try:
+        for rows in result.partitions(batch_size):
+            ids = [row.id for row in rows]
+            related = [(column, _related_names(link_table, link_column, model, ids))
+                       for column, model, link_table, link_column in RELATIONS]
+            for row in rows:
+                project = dict(row._mapping)
+                for column, names in related:
+                    project[column] = names.get(row.id, [])
+                yield project
+    finally:
+        result.close()
+
+
+def csv_lines(projects):
+    """
+    Encode projects as CSV, multi-valued columns use the import separator
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    yield buffer.getvalue()
+    for project in projects:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([SEPARATOR.join(project[column]) if isinstance(project[column], list) else project[column]
+                         for column in COLUMNS])
+        yield buffer.getvalue()
+
+
+def ndjson_lines(projects):
+    """
+    Encode projects as newline-delimited JSON
+    """
+    for project in projects:
+        yield json.dumps(project) + '\n'
+
+
+FORMATS = {
+    'csv': (csv_lines, 'text/csv'),
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+}
@@ -0,0 +1,195 @@
+from collections import Counter, namedtuple
+
+from sqlalchemy import Integer, cast, func, literal, select
+
+from app import db
+from .database import chunked
+from .models import FacetCount, Project, Category, Individual, Organization, project_category, \
+    project_individual, project_organization
+
+LOCATION = 'location'
+
+# Facets backed by an association table: query argument, model naming the
+# values, Project relationship, association table and its column
+LINKED = (
+    ('category', Category, 'categories', project_category, 'category_id'),
+    ('investor', Organization, 'organizations', project_organization, 'organization_id'),
+    ('team', Individual, 'individuals', project_individual, 'individual_id'),
+)
+
+FACETS = ('category', LOCATION, 'investor', 'team')
+
+FacetValue = namedtuple('FacetValue', 'value label count selected')
+
+
+def linked(facet):
+    """
+    The LINKED entry of a facet, None for the location facet
+    """
+    for entry in LINKED:
+        if entry[0] == facet:
+            return entry
+    return None
+
+
+def project_values(project):
+    """
+    The (facet, value) pairs a project contributes to the counts
+    """
+    values = set()
+    if project.location:
+        values.add((LOCATION, project.location))
+    for facet, _, relation, _, _ in LINKED:
+        values.update((facet, str(item.id)) for item in getattr(project, relation))
+    return values
+
+
+def adjust(before, after):
+    """
+    Move the counts from the `before` to the `after` values of a project
+    inside the current transaction. Pass an empty set as `before` for a new
+    project and as `after` for a deleted one.
+    """
+    delta = Counter()
+    for key in after - before:
+        delta[key] += 1
+    for key in before - after:
+        delta[key] -= 1
+    apply(delta)
+
+
+def apply(delta):
+    """
+    Add a Counter of (facet, value) changes to the counts inside the current transaction
+    """
+    delta = {key: change for key, change in delta.items() if change}
+    if not delta:
+        return
+
+    table = FacetCount.__table__
+    for (facet, value), change in delta.items():
+        where = (table.c.facet == facet) & (table.c.value == value)
+        updated = db.session.execute(table.update().where(where).values(count=table.c.count + change)).rowcount
+        if not updated and change > 0:
+            db.session.execute(table.insert().values(facet=facet, value=value, count=change))
+    db.session.execute(table.delete().where(table.c.facet.in_({facet for facet, _ in delta}))
+                       .where(table.c.count <= 0))
+
+
+def remove_projects(ids):
+    """
+    Take projects that are about to be deleted out of the counts, with one
+    grouped query per facet and chunk of ids
+    """
+    delta = Counter()
+    for chunk in chunked(ids):
+        for location, count in db.session.execute(
+                select(Project.location, func.count()).where(Project.id.in_(chunk))
+                .where(Project.location.isnot(None)).where(Project.location != '').group_by(Project.location)):
+            delta[(LOCATION, location)] -= count
+        for facet, _, _, link_table, column in LINKED:
+            column = link_table.c[column]
+            for value, count in db.session.execute(
+                    select(column, func.count()).where(link_table.c.project_id.in_(chunk)).group_by(column)):
+                delta[(facet, str(value))] -= count
+    apply(delta)
+
+
+def remove_value(facet, value):
+    """
+    Drop a facet value, e.g. a deleted category, inside the current transaction
+    """
+    table = FacetCount.__table__
+    db.session.execute(table.delete().where((table.c.facet == facet) & (table.c.value == str(value))))
+
+
+def rebuild():
+    """
+    Recount every facet from the catalog, returns the number of facet values
+    """
+    table = FacetCount.__table__
+    db.session.execute(table.delete())
+    db.session.execute(table.insert().from_select(
+        ['facet', 'value', 'count'],
+        select(literal(LOCATION), Project.location, func.count())
+        .where(Project.location.isnot(None)).where(Project.location != '').group_by(Project.location)))
+    for facet, _, _, link_table, column in LINKED:
+        db.session.execute(table.insert().from_select(
+            ['facet', 'value', 'count'],
+            select(literal(facet), cast(link_table.c[column], db.String), func.count())
+            .group_by(link_table.c[column])))
+    db.session.commit()
+    return db.session.query(func.count()).select_from(table).scalar()
+
+
+def project_counts(facet, ids):
+    """
+    Map the given category, investor or team ids to their project counts
+    with one query, ids without projects are left out
+    """
+    table = FacetCount.__table__
+    values = [str(id) for id in ids]
+    if not values:
+        return {}
+    rows = db.session.execute(select(table.c.value, table.c.count)
+                              .where(table.c.facet == facet).where(table.c.value.in_(values)))
+    return {int(value): count for value, count in rows}
+
+
+def selected(args):
+    """
+    The facet filters present in the request arguments, invalid ids are ignored
+    """
+    filters = {}
+    for facet in FACETS:
+        value = (args.get(facet) or '').strip()
+        if value and (facet == LOCATION or value.isdigit()):
+            filters[facet] = value
+    return filters
+
+
+def apply_filters(query, filters, model=Project):
+    """
+    Restrict a query of projects, or of their summaries, to the given facet
+    values, every filter is an index seek on the location column or on the
+    association table
+    """
+    for facet, value in filters.items():
+        if facet == LOCATION:
+            query = query.filter(model.location == value)
+        else:
+            _, _, _, link_table, column = linked(facet)
+            query = query.filter(model.id.in_(
+                select(link_table.c.project_id).where(link_table.c[column] == int(value))))
+    return query
+
+
+def _values(facet, limit, only=None):
+    table = FacetCount.__table__
+    entry = linked(facet)
+    if entry is None:
+        statement = select(table.c.value, table.c.count, table.c.value.label('label'))
+    else:
+        model = entry[1]
+        statement = select(table.c.value, table.c.count, model.name) \
+            .select_from(table.join(model, model.id == cast(table.c.value, Integer)))
+    statement = statement.where(table.c.facet == facet)
+    if only is not None:
+        statement = statement.where(table.c.value == only)
+    return db.session.execute(statement.order_by(table.c.count.desc(), table.c.value).limit(limit)).fetchall()
+
+
+def counts(filters=None, limit=10):
+    """
+    The `limit` most common values of every facet with their project counts,
+    plus the selected value of each facet if it is not among them
+    """
+    filters = filters or {}
+    facets = {}
+    for facet in FACETS:
+        rows = _values(facet, limit)
+        current = filters.get(facet)
+        if current is not None and current not in [row[0] for row in rows]:
+            rows += _values(facet, 1, only=current)
+        facets[facet] = [FacetValue(value, label, count, value == current) for value, count, label in rows]
+    return facets
@@ -1,80 +1,108 @@
-from flask import abort, render_template
-from flask_login import current_user, login_required
-
-from ..models import Project
-from ..admin.forms import IndividualForm, OrganizationForm
-
-from . import home
-
-
-@home.route('/')
-def homepage():
-    """
-    Render the homepage template on the / route
-    """
-    return render_template('home/index.html', title="Welcome")
-
-
-@home.route('/projects')
-def projects():
-    """
-    Render the list of projects template on the /projects route
-    """
-    projects = Project.query.all()
-    return render_template('home/projects/projects.html', projects=projects, title='Projects')
-
-
-@home.route('/projects/<int:id>', methods=['GET', 'POST'])
-def project(id):
-    """
-    View a project
-    """
-    project = Project.query.get_or_404(id)
-
-    return render_template('home/projects/project.html', project=project, title="Project")
-
-
-@home.route('/individuals/<int:id>', methods=['GET', 'POST'])
-def individual(id):
-    """
-    View an individual
-    """
-    individual = Project.query.get_or_404(id)
-    form = IndividualForm(obj=individual)
-    form.name.data = individual.name
-    form.description.data = individual.description
-
-    return render_template('home/individuals/individual.html', form=form, title="Individual")
-
-
-@home.route('/organizations/<int:id>', methods=['GET', 'POST'])
-def organization(id):
-    """
-    View an organization
-    """
-    organization = Project.query.get_or_404(id)
-    form = OrganizationForm(obj=organization)
-    form.name.data = organization.name
-    form.description.data = organization.description
-
-    return render_template('home/organizations/organization.html', form=form, title="Organization")
-
-
-@home.route('/dashboard')
-@login_required
-def dashboard():
-    """
-    Render the dashboard template on the /dashboard route
-    """
-    return render_template('home/dashboard.html', title="Dashboard")
-
-
-# add admin dashboard view
-@home.route('/admin/dashboard')
-@login_required
-def admin_dashboard():
-    # prevent non-admins from accessing the page
-    if not current_user.is_admin:
-        abort(403)
-
+from flask import abort, render_template, request
+from flask_login import current_user, login_required
+from sqlalchemy.orm import selectinload
+
+from ..models import Individual, Organization, Project, ProjectSummary
+from ..pagination import page_size, paginate_request
+from .. import facets, related, search
+from ..cache import PROJECT_LIST_TAG, page_cache, project_tag
+from ..database import read_only
+
+from . import home
+
+
+@home.route('/')
+def homepage():
+    """
+    Render the homepage template on the / route
+    """
+    return render_template('home/index.html', title="Welcome")
+
+
+@home.route('/projects')
+@page_cache.cached(tags=lambda: [PROJECT_LIST_TAG])
+@read_only
+def projects():
+    """
+    Render the list of projects template on the /projects route, filtered
+    by the ?category=, ?location=, ?investor= and ?team= facets
+    """
+    filters = facets.selected(request.args)
+    query = facets.apply_filters(ProjectSummary.query, filters, ProjectSummary)
+    page = paginate_request(query, ProjectSummary, key=ProjectSummary.name)
+    return render_template('home/projects/projects.html', projects=page.items, page=page,
+                           facets=facets.counts(filters), filters=filters, title='Projects')
+
+
+@home.route('/projects/search')
+@read_only
+def search_projects():
+    """
+    Render the ranked full-text search results on the /projects/search route
+    """
+    query = request.args.get('q', '').strip()
+    projects = search.search(query, limit=page_size(request.args.get('limit', type=int))) if query else []
+    return render_template('home/projects/search.html', projects=projects, query=query, title='Search')
+
+
+@home.route('/projects/<int:id>', methods=['GET', 'POST'])
+@page_cache.cached(tags=lambda id: [project_tag(id)])
+@read_only
+def project(id):
+    """
+    View a project
+    """
+    project = Project.with_relations().get_or_404(id)
+
+    return render_template('home/projects/project.html', project=project,
+                           related=related.related_projects(project.id), title="Project")
+
+
+@home.route('/individuals/<int:id>')
+@page_cache.cached(tags=lambda id: [PROJECT_LIST_TAG])
+@read_only
+def individual(id):
+    """
+    View an individual and a page of the projects they work on
+    """
+    individual = Individual.query.get_or_404(id)
+    page = paginate_request(individual.projects.options(selectinload(Project.categories)), Project,
+                            key=Project.name)
+
+    return render_template('home/individuals/individual.html', individual=individual, projects=page.items,
+                           page=page, title="Individual")
+
+
+@home.route('/organizations/<int:id>')
+@page_cache.cached(tags=lambda id: [PROJECT_LIST_TAG])
+@read_only
+def organization(id):
+    """
+    View an organization and a page of its portfolio
+    """
+    organization = Organization.query.get_or_404(id)
+    page = paginate_request(organization.projects.options(selectinload(Project.categories)), Project,
+                            key=Project.name)
+
+    return render_template('home/organizations/organization.html', organization=organization,
+                           projects=page.items, page=page, title="Organization")
+
+
+@home.route('/dashboard')
+@login_required
+def dashboard():
+    """
+    Render the dashboard template on the /dashboard route
+    """
+    return render_template('home/dashboard.html', title="Dashboard")
+
+
+# add admin dashboard view
+@home.route('/admin/dashboard')
+@login_required
+def admin_dashboard():
+    # prevent non-admins from accessing the page
+    if not current_user.is_admin:
+        abort(403)
+
     return render_template('home/admin_dashboard.html', title="Dashboard")
\ No newline at end of file
@@ -0,0 +1,150 @@
+import csv
+import json
+import time
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import bindparam, select
+
+from app import db
+from . import changes, facets, related, search, summaries
+from .cache import page_cache
+from .database import chunked
+from .models import Project, Category, Individual, Organization, project_category, project_individual, \
+    project_organization
+
+# Related models by import column, with the association table linking them to projects
+RELATIONS = (
+    ('categories', Category, project_category, 'category_id'),
+    ('individuals', Individual, project_individual, 'individual_id'),
+    ('organizations', Organization, project_organization, 'organization_id'),
+)
+
+# Separator of the names in the multi-valued CSV columns
+SEPARATOR = ';'
+
+
+def read_rows(stream, format):
+    """
+    Lazily yield project rows from a CSV or JSON lines stream
+    """
+    if format == 'csv':
+        for row in csv.DictReader(stream):
+            yield row
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _names(value):
+    """
+    Normalize a multi-valued column, given as a list or a separated string
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(SEPARATOR)
+    return list(dict.fromkeys(name.strip() for name in value if name and name.strip()))
+
+
+def _ids_by_name(table, names):
+    """
+    Map names to ids with indexed lookups on the unique name column
+    """
+    ids = {}
+    statement = select(table.c.id, table.c.name).where(table.c.name.in_(bindparam('names', expanding=True)))
+    for chunk in chunked(names):
+        ids.update((name, id) for id, name in db.session.execute(statement, {'names': chunk}))
+    return ids
+
+
+def _upsert_names(model, names, now):
+    """
+    Insert the names that do not exist yet, return the ids of all of them
+    """
+    table = model.__table__
+    ids = _ids_by_name(table, names)
+    missing = [name for name in names if name not in ids]
+    if missing:
+        db.session.execute(table.insert(), [{'name': name, 'version': 1, 'updated_at': now} for name in missing])
+        ids.update(_ids_by_name(table, missing))
+        entity = changes.ENTITIES[model][0]
+        changes.write([changes.entry(entity, ids[name], changes.CREATE, {'name': name}, now) for name in missing])
+    return ids
+
+
+def import_batch(rows):
+    """
+    Upsert one batch of projects and their links in a single transaction,
+    returns the number of projects written. A row replaces the fields and
+    links of an existing project with the same name.
+    """
+    now = datetime.utcnow()
+    projects = {}
+    for row in rows:
+        name = (row.get('name') or '').strip()
+        if name:
+            projects[name] = row
+    if not projects:
+        return 0
+
+    table = Project.__table__
+    existing = _ids_by_name(table, projects)
+    fields = ('description', 'location', 'url')
+
+    updates = [dict(((field, projects[name].get(field)) for field in fields), b_id=id, updated_at=now)
+               for name, id in existing.items()]
+    if updates:
+        db.session.execute(table.update().where(table.c.id == bindparam('b_id'))
+                           .values(version=table.c.version + 1), updates)
+    inserts = [dict(((field, row.get(field)) for field in fields), name=name, version=1, updated_at=now)
+               for name, row in projects.items() if name not in existing]
+    if inserts:
+        db.session.execute(table.insert(), inserts)
+    ids = dict(existing)
+    ids.update(_ids_by_name(table, [row['name'] for row in inserts]))
+    logged = {name: dict(((field, row.get(field)) for field in fields), name=name) for name, row in projects.items()}
+
+    for column, model, link_table, link_column in RELATIONS:
+        names = {name: _names(row.get(column)) for name, row in projects.items()}
+        related = _upsert_names(model, {item for items in names.values() for item in items}, now)
+        for name, items in names.items():
+            logged[name][column] = sorted(related[item] for item in items)
+        for chunk in chunked(existing.values()):
+            db.session.execute(link_table.delete().where(link_table.c.project_id.in_(chunk)))
+        links = [{'project_id': ids[name], link_column: related[item]}
+                 for name, items in names.items() for item in items]
+        if links:
+            db.session.execute(link_table.insert(), links)
+
+    changes.write([changes.entry('project', ids[name], changes.UPDATE if name in existing else changes.CREATE,
+                                 values, now) for name, values in logged.items()])
+    for chunk in chunked(ids.values()):
+        search.index_projects(chunk)
+    summaries.refresh(ids.values())
+    db.session.commit()
+    return len(projects)
+
+
+def import_projects(rows, batch_size=5000, progress=None):
+    """
+    Stream `rows` into the catalog in batches of `batch_size`, so memory use
+    stays flat however large the input is. `progress` is called after every
+    batch with the number of rows written so far and the elapsed time.
+    The facet counts and related projects are recomputed once at the end.
+    """
+    rows = iter(rows)
+    total = 0
+    started = time.monotonic()
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        total += import_batch(batch)
+        if progress is not None:
+            progress(total, time.monotonic() - started)
+    facets.rebuild()
+    related.rebuild()
+    page_cache.clear()
+    return total
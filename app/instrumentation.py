@@ -0,0 +1,180 @@
+import threading
+import time
+
+from flask import g, has_request_context, request
+from flask.signals import before_render_template, signals_available, template_rendered
+from sqlalchemy import event
+
+# Upper bounds, in milliseconds, of the response time histogram buckets
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+
+# WSGI environ key of the requests left out of the metrics, e.g. the
+# warmup requests made before a worker accepts traffic
+UNRECORDED = 'app.instrumentation.unrecorded'
+
+
+class RequestMetrics(object):
+    """
+    Timings collected while handling one request
+    """
+
+    __slots__ = ('started', 'queries', 'query_time', 'slowest', 'render_time', 'render_started')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self.slowest = []
+        self.render_time = 0.0
+        self.render_started = []
+
+    def add_query(self, statement, duration, keep):
+        self.queries += 1
+        self.query_time += duration
+        if len(self.slowest) < keep or duration > self.slowest[-1][0]:
+            self.slowest.append((duration, statement))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[keep:]
+
+
+class EndpointStats(object):
+    """
+    Aggregated timings of one endpoint since the process started
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.query_count = 0
+        self.query_time = 0.0
+        self.render_time = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.slowest = []
+
+    def add(self, metrics, total, keep):
+        self.count += 1
+        self.total_time += total
+        self.query_count += metrics.queries
+        self.query_time += metrics.query_time
+        self.render_time += metrics.render_time
+        milliseconds = total * 1000
+        for index, bound in enumerate(BUCKETS):
+            if milliseconds <= bound:
+                self.buckets[index] += 1
+                break
+        if metrics.slowest:
+            self.slowest = sorted(self.slowest + metrics.slowest, key=lambda item: item[0], reverse=True)[:keep]
+
+    def percentile(self, fraction):
+        """
+        Upper bound of the bucket holding the given percentile, in milliseconds
+        """
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return BUCKETS[-1]
+
+    def histogram(self):
+        return [(bound, count) for bound, count in zip(BUCKETS, self.buckets)]
+
+
+class Instrumentation(object):
+    """
+    Records SQL and template timings for every request, reports them in a
+    Server-Timing header and keeps per-endpoint histograms for /admin/metrics.
+    The hooks only read a clock and update counters so they can stay on in
+    production.
+    """
+
+    def __init__(self, app=None):
+        self.endpoints = {}
+        self.keep = 5
+        self.enabled = False
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['instrumentation'] = self
+        self.enabled = app.config.get('INSTRUMENTATION_ENABLED', True)
+        if not self.enabled:
+            return
+        self.keep = app.config.get('INSTRUMENTATION_SLOW_QUERIES', self.keep)
+        self.server_timing = app.config.get('SERVER_TIMING_HEADER', True)
+        if signals_available:
+            before_render_template.connect(_before_render, app)
+            template_rendered.connect(_after_render, app)
+        else:
+            app.logger.warning('blinker is not installed, template render times are not recorded.')
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def instrument(self, engine):
+        """
+        Time the statements of `engine`, called for every engine the app
+        creates. The hooks belong to the engine rather than to the Engine
+        class, so they go away with the app, e.g. when serve.py reloads.
+        """
+        if self.enabled and not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    def _start(self):
+        if not request.environ.get(UNRECORDED):
+            g.metrics = RequestMetrics()
+
+    def _finish(self, response):
+        metrics = g.pop('metrics', None)
+        if metrics is None:
+            return response
+        total = time.perf_counter() - metrics.started
+        if self.server_timing:
+            response.headers['Server-Timing'] = \
+                'db;dur={:.2f};desc="{} queries", render;dur={:.2f}, total;dur={:.2f}'.format(
+                    metrics.query_time * 1000, metrics.queries, metrics.render_time * 1000, total * 1000)
+        endpoint = request.endpoint or '<unmatched>'
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats()
+            stats.add(metrics, total, self.keep)
+        return response
+
+    def snapshot(self):
+        """
+        Endpoint statistics sorted by total time spent, slowest first
+        """
+        with self._lock:
+            return sorted(self.endpoints.items(), key=lambda item: item[1].total_time, reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self.endpoints.clear()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and has_request_context() and 'metrics' in g:
+        context.instrumentation_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'instrumentation_started', None)
+    if started is not None and has_request_context() and 'metrics' in g:
+        g.metrics.add_query(statement, time.perf_counter() - started, instrumentation.keep)
+
+
+def _before_render(sender, template, context, **extra):
+    if 'metrics' in g:
+        g.metrics.render_started.append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    if 'metrics' in g and g.metrics.render_started:
+        g.metrics.render_time += time.perf_counter() - g.metrics.render_started.pop()
+
+
+instrumentation = Instrumentation()
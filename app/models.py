@@ -1,137 +1,330 @@
-from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
-
-from app import db, login_manager
-
-
-class User(UserMixin, db.Model):
-    """
-    Create an User table
-    """
-
-    # Ensures table will be named in plural and not in singular
-    # as is the name of the model
-    __tablename__ = 'users'
-
-    id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(60), index=True, unique=True)
-    username = db.Column(db.String(60), index=True, unique=True)
-    password_hash = db.Column(db.String(128))
-    role_id = db.Column(db.Integer, db.ForeignKey('roles.id'))
-    is_admin = db.Column(db.Boolean, default=False)
-
-    @property
-    def password(self):
-        """
-        Prevent pasword from being accessed
-        """
-        raise AttributeError('password is not a readable attribute.')
-
-    @password.setter
-    def password(self, password):
-        """
-        Set password to a hashed password
-        """
-        self.password_hash = generate_password_hash(password)
-
-    def verify_password(self, password):
-        """
-        Check if hashed password matches actual password
-        """
-        return check_password_hash(self.password_hash, password)
-
-    def __repr__(self):
-        return '<User: {}>'.format(self.username)
-
-
-# Set up user_loader
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
-
-
-class Role(db.Model):
-    """
-    Create a Role table
-    """
-
-    __tablename__ = 'roles'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(60), unique=True)
-    description = db.Column(db.String(200))
-    users = db.relationship('User', backref='role', lazy='dynamic')
-
-    def __repr__(self):
-        return '<Role: {}>'.format(self.name)
-
-
-project_category = db.Table('project_category',
-                            db.Column('project_id', db.Integer, db.ForeignKey('projects.id'), primary_key=True),
-                            db.Column('category_id', db.Integer, db.ForeignKey('categories.id'), primary_key=True)
-                            )
-
-project_individual = db.Table('project_individual',
-                              db.Column('project_id', db.Integer, db.ForeignKey('projects.id'), primary_key=True),
-                              db.Column('individual_id', db.Integer, db.ForeignKey('individuals.id'), primary_key=True)
-                              )
-
-project_organization = db.Table('project_organization',
-                                db.Column('project_id', db.Integer, db.ForeignKey('projects.id'), primary_key=True),
-                                db.Column('organization_id', db.Integer, db.ForeignKey('organizations.id'),
-                                          primary_key=True)
-                                )
-
-
-class Project(db.Model):
-    """
-    Create a Project table
-    """
-
-    __tablename__ = 'projects'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(60), unique=True)
-    description = db.Column(db.String(200))
-    location = db.Column(db.String(100))
-    url = db.Column(db.String(100))
-    categories = db.relationship('Category', secondary=project_category, lazy='dynamic')
-    individuals = db.relationship('Individual', secondary=project_individual, lazy='dynamic')
-    organizations = db.relationship('Organization', secondary=project_organization, lazy='dynamic')
-
-    def __repr__(self):
-        return '<Project: {}>'.format(self.name)
-
-
-class Category(db.Model):
-    __tablename__ = 'categories'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(60), unique=True)
-    description = db.Column(db.String(200))
-    projects = db.relationship('Project', secondary=project_category, lazy='dynamic')
-
-    def __repr__(self):
-        return '{}'.format(self.name)
-
-
-class Individual(db.Model):
-    __tablename__ = 'individuals'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(60), unique=True)
-    description = db.Column(db.String(200))
-
-    def __repr__(self):
-        return '{}'.format(self.name)
-
-
-class Organization(db.Model):
-    __tablename__ = 'organizations'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(60), unique=True)
-    description = db.Column(db.String(200))
-
-    def __repr__(self):
-        return '{}'.format(self.name)
+from datetime import datetime
+
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, selectinload
+
+from app import db, login_manager
+from .cache import MemoryCache
+from .passwords import password_hasher
+
+# Snapshots of recently seen users, so authenticated requests do not have
+# to load the user row. Sized and timed from the config in create_app.
+identity_cache = MemoryCache(max_entries=4096, ttl=60)
+
+
+class User(UserMixin, db.Model):
+    """
+    Create an User table
+    """
+
+    # Ensures table will be named in plural and not in singular
+    # as is the name of the model
+    __tablename__ = 'users'
+
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(60), index=True, unique=True)
+    username = db.Column(db.String(60), index=True, unique=True)
+    password_hash = db.Column(db.String(128))
+    role_id = db.Column(db.Integer, db.ForeignKey('roles.id'))
+    is_admin = db.Column(db.Boolean, default=False)
+
+    @property
+    def password(self):
+        """
+        Prevent pasword from being accessed
+        """
+        raise AttributeError('password is not a readable attribute.')
+
+    @password.setter
+    def password(self, password):
+        """
+        Set password to a hashed password
+        """
+        self.password_hash = password_hasher.hash(password)
+
+    def verify_password(self, password):
+        """
+        Check if hashed password matches actual password
+        """
+        return password_hasher.verify(self.password_hash, password)
+
+    def __repr__(self):
+        return '<User: {}>'.format(self.username)
+
+
+class RoleSnapshot(object):
+    """
+    Detached copy of a user's role
+    """
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+
+class UserSnapshot(UserMixin):
+    """
+    Lightweight, detached copy of the logged-in user kept in the identity cache
+    """
+
+    def __init__(self, id, username, is_admin, role=None):
+        self.id = id
+        self.username = username
+        self.is_admin = is_admin
+        self.role = role
+
+    @classmethod
+    def from_user(cls, user):
+        role = RoleSnapshot(user.role.id, user.role.name) if user.role else None
+        return cls(user.id, user.username, bool(user.is_admin), role)
+
+    def __repr__(self):
+        return '<User: {}>'.format(self.username)
+
+
+def user_key(id):
+    """
+    Identity cache key of the user with the given id
+    """
+    return 'user:{}'.format(id)
+
+
+def role_tag(id):
+    """
+    Identity cache tag of every user holding the role with the given id
+    """
+    return 'role:{}'.format(id)
+
+
+# Set up user_loader
+@login_manager.user_loader
+def load_user(user_id):
+    key = user_key(int(user_id))
+    snapshot = identity_cache.get(key)
+    if snapshot is None:
+        user = User.query.options(joinedload(User.role)).get(int(user_id))
+        if user is None:
+            return None
+        snapshot = UserSnapshot.from_user(user)
+        identity_cache.set(key, snapshot, tags=[role_tag(user.role_id)] if user.role_id else ())
+    return snapshot
+
+
+class Role(db.Model):
+    """
+    Create a Role table
+    """
+
+    __tablename__ = 'roles'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(60), unique=True)
+    description = db.Column(db.String(200))
+    users = db.relationship('User', backref='role', lazy='dynamic')
+
+    def __repr__(self):
+        return '<Role: {}>'.format(self.name)
+
+
+class VersionedMixin(object):
+    """
+    Row version and modification time, bumped whenever the row or one of
+    its relationships changes, used to derive HTTP cache validators
+    """
+
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+@event.listens_for(db.session, 'before_flush')
+def bump_versions(session, flush_context, instances):
+    """
+    Bump the version of every changed versioned row before it is written
+    """
+    now = datetime.utcnow()
+    for instance in session.dirty:
+        if isinstance(instance, VersionedMixin) and session.is_modified(instance):
+            instance.version = (instance.version or 0) + 1
+            instance.updated_at = now
+
+
+project_category = db.Table('project_category',
+                            db.Column('project_id', db.Integer, db.ForeignKey('projects.id'), primary_key=True),
+                            db.Column('category_id', db.Integer, db.ForeignKey('categories.id'), primary_key=True)
+                            )
+
+project_individual = db.Table('project_individual',
+                              db.Column('project_id', db.Integer, db.ForeignKey('projects.id'), primary_key=True),
+                              db.Column('individual_id', db.Integer, db.ForeignKey('individuals.id'), primary_key=True)
+                              )
+
+project_organization = db.Table('project_organization',
+                                db.Column('project_id', db.Integer, db.ForeignKey('projects.id'), primary_key=True),
+                                db.Column('organization_id', db.Integer, db.ForeignKey('organizations.id'),
+                                          primary_key=True)
+                                )
+
+
+# The association primary keys lead with project_id, these serve the lookups
+# from the other side, e.g. the projects of a category
+db.Index('ix_project_category_category_id', project_category.c.category_id)
+db.Index('ix_project_individual_individual_id', project_individual.c.individual_id)
+db.Index('ix_project_organization_organization_id', project_organization.c.organization_id)
+
+
+class Project(VersionedMixin, db.Model):
+    """
+    Create a Project table
+    """
+
+    __tablename__ = 'projects'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(60), unique=True)
+    description = db.Column(db.String(200))
+    location = db.Column(db.String(100), index=True)
+    url = db.Column(db.String(100))
+    categories = db.relationship('Category', secondary=project_category, back_populates='projects')
+    individuals = db.relationship('Individual', secondary=project_individual, back_populates='projects')
+    organizations = db.relationship('Organization', secondary=project_organization, back_populates='projects')
+
+    @classmethod
+    def with_relations(cls, *relations):
+        """
+        Query projects with the given relationships (all of them by default)
+        batch-loaded, so a page of projects costs one extra query per
+        relationship instead of one per project
+        """
+        relations = relations or ('categories', 'individuals', 'organizations')
+        return cls.query.options(*[selectinload(getattr(cls, name)) for name in relations])
+
+    def __repr__(self):
+        return '<Project: {}>'.format(self.name)
+
+
+class Category(VersionedMixin, db.Model):
+    __tablename__ = 'categories'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(60), unique=True)
+    description = db.Column(db.String(200))
+    projects = db.relationship('Project', secondary=project_category, back_populates='categories', lazy='dynamic')
+
+    def __repr__(self):
+        return '{}'.format(self.name)
+
+
+class Individual(VersionedMixin, db.Model):
+    __tablename__ = 'individuals'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(60), unique=True)
+    description = db.Column(db.String(200))
+    projects = db.relationship('Project', secondary=project_individual, back_populates='individuals',
+                               lazy='dynamic')
+
+    def __repr__(self):
+        return '{}'.format(self.name)
+
+
+class Organization(VersionedMixin, db.Model):
+    __tablename__ = 'organizations'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(60), unique=True)
+    description = db.Column(db.String(200))
+    projects = db.relationship('Project', secondary=project_organization, back_populates='organizations',
+                               lazy='dynamic')
+
+    def __repr__(self):
+        return '{}'.format(self.name)
+
+
+class FacetCount(db.Model):
+    """
+    Number of projects per facet value, kept up to date by the admin views
+    so the project list does not have to group the association tables
+    """
+
+    __tablename__ = 'facet_counts'
+    __table_args__ = (db.Index('ix_facet_counts_facet_count', 'facet', 'count'),)
+
+    facet = db.Column(db.String(20), primary_key=True)
+    value = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return '<FacetCount: {}={} ({})>'.format(self.facet, self.value, self.count)
+
+
+class ProjectSummary(db.Model):
+    """
+    What the project lists show of a project, with its category names
+    joined, kept up to date by the admin views so a page of either list
+    is one indexed scan of this table
+    """
+
+    __tablename__ = 'project_summary'
+    __table_args__ = (db.Index('ix_project_summary_name_id', 'name', 'id'),)
+
+    id = db.Column(db.Integer, db.ForeignKey('projects.id'), primary_key=True)
+    name = db.Column(db.String(60))
+    description = db.Column(db.String(200))
+    location = db.Column(db.String(100), index=True)
+    categories = db.Column(db.Text, nullable=False, default='')
+
+    def __repr__(self):
+        return '<ProjectSummary: {}>'.format(self.name)
+
+
+class RelatedProject(db.Model):
+    """
+    Precomputed similarity between two projects, only the best few
+    matches of every project are stored
+    """
+
+    __tablename__ = 'related_projects'
+    __table_args__ = (db.Index('ix_related_projects_project_score', 'project_id', 'score'),)
+
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), primary_key=True)
+    related_id = db.Column(db.Integer, db.ForeignKey('projects.id'), primary_key=True, index=True)
+    score = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return '<RelatedProject: {} -> {} ({:.3f})>'.format(self.project_id, self.related_id, self.score)
+
+
+class Change(db.Model):
+    """
+    Append-only log of the creates, updates and deletes of catalog rows,
+    written in the transaction that makes the change, so mirrors can sync
+    from the sequence number they last saw. Writers take turns (see
+    changes._serialize), so sequence numbers become visible in order.
+    """
+
+    __tablename__ = 'changes'
+    # AUTOINCREMENT keeps sequence numbers from being reused after compaction on SQLite
+    __table_args__ = (db.Index('ix_changes_entity', 'entity', 'entity_id'), {'sqlite_autoincrement': True})
+
+    seq = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    operation = db.Column(db.String(10), nullable=False)
+    fields = db.Column(db.Text)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return '<Change: {} {} {} {}>'.format(self.seq, self.operation, self.entity, self.entity_id)
+
+
+class ChangeLogHorizon(db.Model):
+    """
+    Highest sequence number dropped from the change log, a mirror that
+    synced up to an older one has missed changes and must resync
+    """
+
+    __tablename__ = 'change_log_horizon'
+
+    id = db.Column(db.Integer, primary_key=True)
+    seq = db.Column(db.Integer, nullable=False, default=0)
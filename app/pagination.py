@@ -0,0 +1,150 @@
+import base64
+import json
+
+from flask import current_app, request
+from sqlalchemy import and_, or_
+
+from app import db
+
+
+class KeysetPage(object):
+    """
+    A single page of rows fetched with keyset (cursor) pagination
+    """
+
+    def __init__(self, items, limit, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.limit = limit
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def page_size(limit=None):
+    """
+    Clamp the requested page size to the configured bounds
+    """
+    default = current_app.config.get('PAGE_SIZE', 50)
+    maximum = current_app.config.get('MAX_PAGE_SIZE', 200)
+    if not limit or limit < 1:
+        return default
+    return min(limit, maximum)
+
+
+def encode_cursor(value, id):
+    """
+    The cursor of the row with sort key `value` and primary key `id`, an
+    opaque URL-safe token carrying both so the page after or before the
+    row can be found without it
+    """
+    data = json.dumps([value, id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def row_cursor(row, model, key=None):
+    """
+    The cursor pointing at `row` in a listing of `model` ordered by `key`,
+    the bare id when the listing is ordered by primary key
+    """
+    if key is None or key is model.id:
+        return row.id
+    return encode_cursor(getattr(row, key.key), row.id)
+
+
+def _position(model, key, cursor):
+    """
+    The (sort key, id) a cursor points at, None when it is not valid
+    """
+    cursor = str(cursor)
+    if cursor.isdigit():
+        if key is model.id:
+            return int(cursor), int(cursor)
+        # a bare id, from before the cursors carried the sort key
+        row = db.session.query(key).filter(model.id == int(cursor)).first()
+        return (row[0], int(cursor)) if row is not None else None
+    if key is model.id:
+        return None
+    try:
+        value, id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        return None
+    return (value, id) if isinstance(id, int) else None
+
+
+def _beyond(model, key, position, forward):
+    """
+    Filter for the rows after, or before, `position` in the order of
+    `key` and the primary key. NULL sort keys come first on the databases
+    that sort them first and last on the others, as their indexes do.
+    """
+    value, id = position
+    if key is model.id:
+        return model.id > id if forward else model.id < id
+    nulls_first = db.engine.dialect.name in ('sqlite', 'mysql', 'mssql')
+    if value is None:
+        among_nulls = and_(key.is_(None), model.id > id if forward else model.id < id)
+        return or_(among_nulls, key.isnot(None)) if nulls_first == forward else among_nulls
+    if forward:
+        beyond = or_(key > value, and_(key == value, model.id > id))
+    else:
+        beyond = or_(key < value, and_(key == value, model.id < id))
+    return or_(beyond, key.is_(None)) if nulls_first != forward else beyond
+
+
+def paginate(query, model, key=None, limit=None, after=None, before=None):
+    """
+    Return one page of `query` ordered by `key` (with the primary key as
+    tie-breaker) that starts after, or ends before, the row a cursor points
+    at. The cursor carries the row's sort key, so the page is found even
+    when that row was deleted or renamed since.
+
+    Only `limit + 1` rows are ever fetched, and the boundary is resolved with
+    an index seek instead of an OFFSET, so the cost of a page does not grow
+    with the size of the table or with how deep the reader has paged.
+    """
+    key = model.id if key is None else key
+    limit = page_size(limit)
+
+    if before is not None:
+        position = _position(model, key, before)
+        if position is not None:
+            query = query.filter(_beyond(model, key, position, forward=False))
+        rows = query.order_by(key.desc(), model.id.desc()).limit(limit + 1).all()
+        has_prev = len(rows) > limit
+        rows = list(reversed(rows[:limit]))
+        has_next = position is not None
+    else:
+        position = _position(model, key, after) if after is not None else None
+        if position is not None:
+            query = query.filter(_beyond(model, key, position, forward=True))
+        rows = query.order_by(key, model.id).limit(limit + 1).all()
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+        has_prev = position is not None
+
+    return KeysetPage(rows, limit,
+                      next_cursor=row_cursor(rows[-1], model, key) if rows and has_next else None,
+                      prev_cursor=row_cursor(rows[0], model, key) if rows and has_prev else None)
+
+
+def paginate_request(query, model, key=None):
+    """
+    Paginate `query` using the ?limit=, ?after= and ?before= request arguments
+    """
+    return paginate(query, model, key=key,
+                    limit=request.args.get('limit', type=int),
+                    after=request.args.get('after') or None,
+                    before=request.args.get('before') or None)
@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasher(object):
+    """
+    Hashes and checks passwords with the cost parameters from the config.
+    With PASSWORD_HASH_WORKERS set, the key derivation runs in a bounded
+    process pool, so a burst of logins queues up there instead of taking
+    the CPU from request workers.
+    """
+
+    def __init__(self, app=None):
+        self.method = 'pbkdf2:sha256:260000'
+        self.salt_length = 16
+        self.workers = 0
+        self._executor = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self.salt_length = app.config.get('PASSWORD_SALT_LENGTH', self.salt_length)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+        self._slots = threading.BoundedSemaphore(
+            app.config.get('PASSWORD_HASH_MAX_PENDING', 4 * self.workers)) if self.workers else None
+        app.extensions['password_hasher'] = self
+
+    def _pool(self):
+        # the pool cannot be shared with forked workers, each process starts
+        # its own on first use. Its processes are spawned, as forking a
+        # threaded server worker copies locks other threads may be holding.
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+        with self._slots:
+            return self._pool().submit(function, *args).result()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """
+        Whether a stored hash was made with other parameters than the current policy
+        """
+        if not password_hash or password_hash.count('$') < 2:
+            return True
+        method, salt, _ = password_hash.split('$', 2)
+        return method != self.method or len(salt) != self.salt_length
+
+
+password_hasher = PasswordHasher()
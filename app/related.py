@@ -0,0 +1,211 @@
+import heapq
+import math
+from array import array
+from collections import defaultdict
+from itertools import groupby, islice
+from operator import itemgetter
+
+from flask import current_app
+from sqlalchemy import bindparam, func, select
+
+from app import db
+from .database import chunked
+from .models import Project, RelatedProject, project_category, project_individual, project_organization
+
+# Association tables the similarity is computed from, with the weight of
+# sharing one of their rows: a shared person says more than a shared category
+FEATURES = (
+    (project_category, 'category_id', 1.0),
+    (project_individual, 'individual_id', 3.0),
+    (project_organization, 'organization_id', 2.0),
+)
+
+# Rows of the similarity matrix multiplied at a time during a rebuild
+BLOCK_SIZE = 1000
+
+# Association rows fetched from the database at a time during a rebuild
+FETCH_SIZE = 10000
+
+
+def _settings():
+    return current_app.config.get('RELATED_PROJECTS', 5), current_app.config.get('RELATED_MAX_SHARED', 1000)
+
+
+def weight(kind_weight, shared):
+    """
+    Score of two projects sharing a row linked to `shared` projects in
+    total, the rarer the link the more it counts
+    """
+    return kind_weight / math.log(1 + shared)
+
+
+def _links(max_shared):
+    """
+    Project ids, feature numbers and weights of every link that counts
+    towards the similarity, in compact arrays. The association rows are
+    streamed in the order of the linked row, so only the projects of one
+    category, person or investor are held as Python objects at a time.
+    """
+    projects, features, weights = array('i'), array('i'), array('d')
+    feature = 0
+    for table, column, kind_weight in FEATURES:
+        column = table.c[column]
+        result = db.session.execute(select(column, table.c.project_id).order_by(column)
+                                    .execution_options(stream_results=True, max_row_buffer=FETCH_SIZE))
+        for _, rows in groupby(result, key=itemgetter(0)):
+            owners = [row[1] for row in islice(rows, max_shared + 1)]
+            if 2 <= len(owners) <= max_shared:
+                projects.extend(owners)
+                features.extend([feature] * len(owners))
+                weights.extend([weight(kind_weight, len(owners))] * len(owners))
+                feature += 1
+    return projects, features, weights
+
+
+def _top_sparse(links, keep):
+    """
+    Best `keep` matches of every project from the product of the sparse
+    project x feature matrix with its transpose, one block of rows at a time
+    """
+    # only rebuilds need them, the web workers never load numpy and scipy
+    import numpy
+    from scipy import sparse
+
+    projects, features, weights = (numpy.frombuffer(values, dtype=values.typecode) for values in links)
+    project_ids, rows = numpy.unique(projects, return_inverse=True)
+    matrix = sparse.csr_matrix((numpy.sqrt(weights), (rows, features)),
+                               shape=(len(project_ids), int(features[-1]) + 1))
+    transposed = matrix.T.tocsr()
+
+    for start in range(0, matrix.shape[0], BLOCK_SIZE):
+        block = (matrix[start:start + BLOCK_SIZE] @ transposed).tocsr()
+        for offset in range(block.shape[0]):
+            row = start + offset
+            begin, end = block.indptr[offset], block.indptr[offset + 1]
+            others, scores = block.indices[begin:end], block.data[begin:end]
+            mask = others != row
+            others, scores = others[mask], scores[mask]
+            if len(scores) > keep:
+                best = numpy.argpartition(-scores, keep)[:keep]
+                others, scores = others[best], scores[best]
+            for other, score in zip(others, scores):
+                yield int(project_ids[row]), int(project_ids[other]), float(score)
+
+
+def rebuild():
+    """
+    Recompute the related projects of the whole catalog. Returns the
+    number of pairs stored.
+    """
+    keep, max_shared = _settings()
+    table = RelatedProject.__table__
+    links = _links(max_shared)
+    db.session.execute(table.delete())
+    rows = []
+    total = 0
+    for project_id, related_id, score in (_top_sparse(links, keep) if links[0] else ()):
+        rows.append({'project_id': project_id, 'related_id': related_id, 'score': score})
+        if len(rows) >= 5000:
+            db.session.execute(table.insert(), rows)
+            total += len(rows)
+            rows = []
+    if rows:
+        db.session.execute(table.insert(), rows)
+        total += len(rows)
+    db.session.commit()
+    return total
+
+
+def _scores(project_id, max_shared):
+    """
+    Similarity of one project with every project it shares a link with
+    """
+    scores = defaultdict(float)
+    for table, column, kind_weight in FEATURES:
+        column = table.c[column]
+        owned = [row[0] for row in db.session.execute(select(column).where(table.c.project_id == project_id))]
+        if not owned:
+            continue
+        shared = db.session.execute(select(column, func.count()).where(column.in_(owned)).group_by(column))
+        weights = {feature: weight(kind_weight, count) for feature, count in shared if 2 <= count <= max_shared}
+        if not weights:
+            continue
+        for other, feature in db.session.execute(select(table.c.project_id, column)
+                                                 .where(column.in_(list(weights)))
+                                                 .where(table.c.project_id != project_id)):
+            scores[other] += weights[feature]
+    return scores
+
+
+def remove(project_id):
+    """
+    Drop a project from the index inside the current transaction, returns
+    the ids of the projects that listed it
+    """
+    return remove_projects([project_id])
+
+
+def remove_projects(ids):
+    """
+    Drop several projects from the index inside the current transaction,
+    returns the ids of the remaining projects that listed one of them
+    """
+    table = RelatedProject.__table__
+    ids = set(ids)
+    affected = set()
+    for chunk in chunked(ids):
+        affected.update(row[0] for row in db.session.execute(select(table.c.project_id)
+                                                             .where(table.c.related_id.in_(chunk))))
+        db.session.execute(table.delete().where(table.c.project_id.in_(chunk) | table.c.related_id.in_(chunk)))
+    return affected - ids
+
+
+def refresh(project_id):
+    """
+    Recompute the matches of one project after an edit and offer it to the
+    projects it now scores with, inside the current transaction. Returns
+    the ids of the projects whose list changed.
+
+    Other lists only gain or lose this project, so one it dropped out of
+    stays a match short until the next rebuild.
+    """
+    keep, max_shared = _settings()
+    db.session.flush()
+    table = RelatedProject.__table__
+    affected = remove(project_id)
+    scores = _scores(project_id, max_shared)
+
+    rows = [{'project_id': project_id, 'related_id': other, 'score': score}
+            for other, score in heapq.nlargest(keep, scores.items(), key=itemgetter(1))]
+    current = defaultdict(list)
+    for chunk in chunked(scores):
+        for owner, related_id, score in db.session.execute(
+                select(table.c.project_id, table.c.related_id, table.c.score).where(table.c.project_id.in_(chunk))):
+            current[owner].append((score, related_id))
+    evicted = []
+    for other, score in scores.items():
+        entries = current[other]
+        if len(entries) >= keep:
+            weakest = min(entries)
+            if score <= weakest[0]:
+                continue
+            evicted.append({'b_project': other, 'b_related': weakest[1]})
+        rows.append({'project_id': other, 'related_id': project_id, 'score': score})
+        affected.add(other)
+
+    if evicted:
+        db.session.execute(table.delete().where(table.c.project_id == bindparam('b_project'))
+                           .where(table.c.related_id == bindparam('b_related')), evicted)
+    if rows:
+        db.session.execute(table.insert(), rows)
+    return affected
+
+
+def related_projects(project_id, limit=None):
+    """
+    The projects most similar to the given one, best match first
+    """
+    limit = limit or _settings()[0]
+    return Project.query.join(RelatedProject, RelatedProject.related_id == Project.id) \
+        .filter(RelatedProject.project_id == project_id) \
+        .order_by(RelatedProject.score.desc(), Project.id).limit(limit).all()
@@ -0,0 +1,137 @@
+import re
+
+from sqlalchemy import DDL, bindparam, event, or_, select, text
+
+from app import db
+from .models import Project, Category, Individual, Organization, project_category, project_individual, \
+    project_organization
+
+# Relevance weights for the indexed columns, in table order
+WEIGHTS = (10.0, 2.0, 3.0, 5.0, 4.0, 4.0)
+
+CREATE_INDEX = """
+CREATE VIRTUAL TABLE IF NOT EXISTS project_search USING fts5(
+    name, description, location, categories, individuals, organizations,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+# Fills the index for the given project ids, linked names are flattened
+# into one column per relationship
+INDEX_PROJECTS = """
+INSERT INTO project_search (rowid, name, description, location, categories, individuals, organizations)
+SELECT p.id, p.name, p.description, p.location,
+       (SELECT group_concat(c.name, ' ') FROM categories c
+        JOIN project_category pc ON pc.category_id = c.id WHERE pc.project_id = p.id),
+       (SELECT group_concat(i.name, ' ') FROM individuals i
+        JOIN project_individual pi ON pi.individual_id = i.id WHERE pi.project_id = p.id),
+       (SELECT group_concat(o.name, ' ') FROM organizations o
+        JOIN project_organization po ON po.organization_id = o.id WHERE po.project_id = p.id)
+FROM projects p
+"""
+
+event.listen(db.Model.metadata, 'after_create', DDL(CREATE_INDEX).execute_if(dialect='sqlite'))
+
+_ready = set()
+
+
+def is_indexed():
+    """
+    Full-text search is backed by FTS5 and only available on SQLite,
+    other databases fall back to substring matching
+    """
+    return db.engine.dialect.name == 'sqlite'
+
+
+def _ensure_index():
+    if db.engine.url not in _ready:
+        db.session.execute(text(CREATE_INDEX))
+        _ready.add(db.engine.url)
+
+
+def index_projects(ids):
+    """
+    (Re)index the given projects inside the current transaction
+    """
+    ids = [id for id in ids if id is not None]
+    if not ids or not is_indexed():
+        return
+    _ensure_index()
+    db.session.flush()
+    remove_projects(ids)
+    db.session.execute(text(INDEX_PROJECTS + ' WHERE p.id IN :ids').bindparams(bindparam('ids', expanding=True)),
+                       {'ids': ids})
+
+
+def remove_projects(ids):
+    """
+    Drop the given projects from the index inside the current transaction
+    """
+    if not ids or not is_indexed():
+        return
+    _ensure_index()
+    db.session.execute(text('DELETE FROM project_search WHERE rowid IN :ids')
+                       .bindparams(bindparam('ids', expanding=True)), {'ids': list(ids)})
+
+
+def linked_project_ids(model, id):
+    """
+    Ids of the projects linked to a category, individual or organization
+    """
+    table, column = {
+        Category: (project_category, project_category.c.category_id),
+        Individual: (project_individual, project_individual.c.individual_id),
+        Organization: (project_organization, project_organization.c.organization_id),
+    }[model]
+    return [row[0] for row in db.session.execute(select(table.c.project_id).where(column == id))]
+
+
+def rebuild():
+    """
+    Rebuild the whole index from the catalog, returns the number of projects indexed
+    """
+    if not is_indexed():
+        return 0
+    _ensure_index()
+    db.session.execute(text('DELETE FROM project_search'))
+    db.session.execute(text(INDEX_PROJECTS))
+    db.session.commit()
+    return db.session.execute(text('SELECT count(*) FROM project_search')).scalar()
+
+
+def match_expression(query):
+    """
+    Turn free text into an FTS5 query: every word must match, the last one as a prefix
+    """
+    words = re.findall(r'\w+', query or '', re.UNICODE)
+    terms = ['"{}"'.format(word) for word in words]
+    if terms:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search(query, limit=50):
+    """
+    Return up to `limit` projects matching `query`, best match first
+    """
+    if not is_indexed():
+        pattern = '%{}%'.format(query.strip())
+        return Project.with_relations('categories').filter(or_(Project.name.ilike(pattern),
+                                                                Project.description.ilike(pattern),
+                                                                Project.location.ilike(pattern))) \
+            .order_by(Project.name).limit(limit).all()
+
+    expression = match_expression(query)
+    if not expression:
+        return []
+    _ensure_index()
+    rank = 'bm25(project_search, {})'.format(', '.join(str(weight) for weight in WEIGHTS))
+    ids = [row[0] for row in db.session.execute(
+        text('SELECT rowid FROM project_search WHERE project_search MATCH :query ORDER BY {} LIMIT :limit'
+             .format(rank)), {'query': expression, 'limit': limit})]
+    if not ids:
+        return []
+    projects = {project.id: project for project in
+                Project.with_relations('categories').filter(Project.id.in_(ids))}
+    return [projects[id] for id in ids if id in projects]
@@ -0,0 +1,382 @@
+import gzip
+import json
+import multiprocessing
+import os
+import time
+from datetime import datetime
+from itertools import groupby, islice
+from operator import itemgetter
+from urllib.parse import parse_qsl, urlsplit
+from xml.sax.saxutils import escape
+
+from flask import url_for
+from sqlalchemy import select
+
+from app import db
+from . import changes, facets
+from .cache import NullCache, page_cache
+from .database import chunked
+from .models import Individual, Organization, Project, ProjectSummary, RelatedProject, project_individual, \
+    project_organization
+from .pagination import page_size, row_cursor
+
+# Every file is named after the URL it answers: / is index.html, /projects
+# is projects.html, /projects/7 is projects/7.html, the list page after the
+# project named Alpha with id 7, /projects?after=WyJBbHBoYSIsN10, is
+# projects/after/WyJBbHBoYSIsN10.html and /individuals/3 is individuals/3.html.
+# With nginx serving the snapshot folder and proxying anything it does not
+# hold to the application:
+#
+#     map $args $snapshot_args {
+#         ''                                         '';
+#         ~^(?<arg>after|before)=(?<cursor>[\w-]+)$   /$arg/$cursor;
+#         default                                    /-;
+#     }
+#     location = / { try_files /index.html @app; }
+#     location / { try_files $uri $uri$snapshot_args.html @app; }
+
+MANIFEST = '.snapshot.json'
+
+# URLs per sitemap file, the limit of the sitemap protocol
+SITEMAP_SIZE = 50000
+
+# Change log entity, endpoint, folder, model and link column of the
+# profile pages. Only their first page is written, the later pages of a
+# large portfolio are left to the application.
+PROFILES = (
+    ('individual', 'home.individual', 'individuals', Individual, project_individual.c.individual_id),
+    ('organization', 'home.organization', 'organizations', Organization, project_organization.c.organization_id),
+)
+
+# The application the pool workers render with, set before they are forked
+_app = None
+_client = None
+
+
+def path_for(url):
+    """
+    The file, relative to the snapshot folder, that answers `url`
+    """
+    parts = urlsplit(url)
+    path = parts.path.strip('/') or 'index'
+    for name, value in parse_qsl(parts.query):
+        path += '/{}/{}'.format(name, value)
+    return path + '.html'
+
+
+def _write(path, content, precompress=False):
+    """
+    Replace a file atomically, with a .gz copy for nginx's gzip_static
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    variants = [(path, content)]
+    if precompress:
+        variants.append((path + '.gz', gzip.compress(content, compresslevel=9, mtime=0)))
+    for target, data in variants:
+        with open(target + '.tmp', 'wb') as output:
+            output.write(data)
+        os.replace(target + '.tmp', target)
+
+
+def _remove(path):
+    for target in (path, path + '.gz'):
+        if os.path.exists(target):
+            os.remove(target)
+
+
+def _start_worker():
+    global _client
+    # render from the database, never from a cached copy older than the build
+    page_cache.backend = NullCache()
+    _client = _app.test_client()
+
+
+def _render(task):
+    """
+    Render one page in a pool worker and write it to its files, returns the
+    URL and None, or the reason it was not written
+    """
+    url, paths = task
+    try:
+        response = _client.get(url)
+        if response.status_code != 200:
+            return url, 'status {}'.format(response.status_code)
+        content = response.get_data()
+        for path in paths:
+            _write(path, content, _app.config.get('SNAPSHOT_PRECOMPRESS', True))
+    except Exception as error:
+        return url, repr(error)
+    return url, None
+
+
+def _read_manifest(folder):
+    try:
+        with open(os.path.join(folder, MANIFEST)) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return None
+
+
+def _list_pages(limit):
+    """
+    (cursor, cursor of the first row of the next page) of every page of the
+    project list, in the order of home.projects. A page is also the one
+    that ends before the first row of the next, so it is written under both
+    URLs.
+    """
+    cursors = [row_cursor(row, ProjectSummary, ProjectSummary.name) for row in db.session.execute(
+        select(ProjectSummary.id, ProjectSummary.name).order_by(ProjectSummary.name, ProjectSummary.id))]
+    pages = []
+    for start in range(0, max(len(cursors), 1), limit):
+        cursor = cursors[start - 1] if start else None
+        pages.append((cursor, cursors[start + limit] if start + limit < len(cursors) else None))
+    return pages
+
+
+def _related():
+    related = {}
+    for project_id, related_id in db.session.execute(select(RelatedProject.project_id, RelatedProject.related_id)
+                                                     .order_by(RelatedProject.project_id,
+                                                               RelatedProject.score.desc())):
+        related.setdefault(project_id, []).append(related_id)
+    return related
+
+
+def _profiles(model, column, limit):
+    """
+    (id, updated_at) of every profile of one kind, and the ids of the first
+    limit + 1 projects each one lists, in the order of its page
+    """
+    profiles = db.session.execute(select(model.id, model.updated_at).order_by(model.id)).fetchall()
+    listed = {id: [] for id, _ in profiles}
+    for id, rows in groupby(db.session.execute(select(column, Project.id)
+                                               .join(Project, Project.id == column.table.c.project_id)
+                                               .order_by(column, Project.name, Project.id)), key=itemgetter(0)):
+        listed[id] = [row[1] for row in islice(rows, limit + 1)]
+    return profiles, listed
+
+
+def _changed(seq, latest):
+    """
+    Ids of the projects whose page shows a row changed after `seq`, and by
+    entity the ids of the categories, people and organizations changed. A
+    deleted one needs no lookup, its delete logged an update of every
+    project it was linked to.
+    """
+    projects = set()
+    linked = {changes.ENTITIES[model][0]: (link_table, link_table.c[column])
+              for _, model, _, link_table, column in facets.LINKED}
+    entities = {entity: set() for entity in linked}
+    renamed = {entity: set() for entity in linked}
+    for row in changes.since(seq, latest - seq):
+        if row.entity == 'project':
+            projects.add(row.entity_id)
+        else:
+            entities[row.entity].add(row.entity_id)
+            if row.operation == changes.UPDATE:
+                renamed[row.entity].add(row.entity_id)
+    for entity, ids in renamed.items():
+        link_table, column = linked[entity]
+        for chunk in chunked(ids):
+            projects.update(row[0] for row in db.session.execute(select(link_table.c.project_id)
+                                                                 .where(column.in_(chunk))))
+    return projects, entities
+
+
+def _existing(folder, directory):
+    """
+    Ids of the pages in a directory of the snapshot folder, e.g. the project pages
+    """
+    try:
+        names = os.listdir(os.path.join(folder, directory))
+    except OSError:
+        return set()
+    return {int(name[:-5]) for name in names if name.endswith('.html') and name[:-5].isdigit()}
+
+
+def _list_files(folder):
+    files = set()
+    for name in ('after', 'before'):
+        directory = os.path.join(folder, 'projects', name)
+        if os.path.isdir(directory):
+            files.update(os.path.join(directory, file) for file in os.listdir(directory) if file.endswith('.html'))
+    return files
+
+
+def _write_sitemaps(folder, base_url, entries, precompress):
+    """
+    Write the sitemap index and one sitemap per SITEMAP_SIZE URLs, returns
+    the number of sitemap files
+    """
+    names = []
+    for start in range(0, len(entries), SITEMAP_SIZE):
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+                 '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+        for url, modified in entries[start:start + SITEMAP_SIZE]:
+            lastmod = '<lastmod>{}</lastmod>'.format(modified.strftime('%Y-%m-%d')) if modified else ''
+            lines.append('<url><loc>{}</loc>{}</url>'.format(escape(base_url + url), lastmod))
+        lines.append('</urlset>')
+        names.append('sitemap-{}.xml'.format(len(names) + 1))
+        _write(os.path.join(folder, names[-1]), '\n'.join(lines).encode('utf-8'), precompress)
+
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    lines.extend('<sitemap><loc>{}/{}</loc></sitemap>'.format(escape(base_url), name) for name in names)
+    lines.append('</sitemapindex>')
+    _write(os.path.join(folder, 'sitemap.xml'), '\n'.join(lines).encode('utf-8'), precompress)
+
+    # sitemaps left over from a larger catalog
+    index = len(names) + 1
+    while os.path.exists(os.path.join(folder, 'sitemap-{}.xml'.format(index))):
+        _remove(os.path.join(folder, 'sitemap-{}.xml'.format(index)))
+        index += 1
+    return len(names)
+
+
+def build(app, folder, base_url, full=False, processes=None, progress=None):
+    """
+    Render the homepage, every page of the project list, every project page
+    and the first page of every individual and organization as an anonymous
+    visitor into `folder`, with a sitemap of them.
+
+    The folder keeps the change log sequence number it was built at, so
+    a later build only renders the project pages that show a row changed
+    since, or whose related projects changed, and the profiles that changed
+    or list a changed project, and removes the pages of deleted rows. The
+    list pages carry the facet counts and are all rendered again once
+    anything changed. `full` renders everything, which is needed after a
+    template or code change.
+
+    Pages are rendered by a pool of `processes` forked workers, SNAPSHOT_PROCESSES
+    or one per CPU by default. `progress` is called with the number of pages
+    rendered so far, the number to render and the elapsed time. Returns the
+    counts of rendered, removed and failed pages.
+    """
+    global _app
+
+    started = time.monotonic()
+    config = app.config
+    precompress = config.get('SNAPSHOT_PRECOMPRESS', True)
+    base_url = base_url.rstrip('/')
+    manifest = _read_manifest(folder)
+    limit = page_size(None)
+
+    with app.test_request_context():
+        seq = changes.latest()
+        pages = _list_pages(limit)
+        projects = db.session.execute(select(Project.id, Project.updated_at).order_by(Project.id)).fetchall()
+        related = _related()
+        ids = {id for id, _ in projects}
+        existing = _existing(folder, 'projects')
+
+        changed = entities = None
+        # manifests without profiles predate them
+        if not full and manifest is not None and manifest.get('page_size') == limit \
+                and 'profiles' in manifest and manifest['seq'] >= changes.horizon():
+            changed, entities = _changed(manifest['seq'], seq)
+        if changed is None:
+            stale, lists_stale = set(ids), True
+        else:
+            lists_stale = seq != manifest['seq'] or manifest.get('lists_pending', False)
+            # pages naming a changed project among their related projects
+            stale = changed | {id for id, listed in related.items() if changed.intersection(listed)}
+            before = manifest.get('related', {})
+            stale.update(id for id, listed in related.items() if before.get(str(id)) != listed)
+            stale.update(int(id) for id in before if int(id) not in related)
+            stale.update(manifest['pending'].get('project', ()))
+            stale.update(ids - existing)
+
+        tasks = [(url_for('home.homepage'), [os.path.join(folder, path_for(url_for('home.homepage')))])]
+        list_files = set()
+        for cursor, next_cursor in pages:
+            url = url_for('home.projects', after=cursor)
+            paths = [os.path.join(folder, path_for(url))]
+            if next_cursor is not None:
+                paths.append(os.path.join(folder, path_for(url_for('home.projects', before=next_cursor))))
+            list_files.update(paths)
+            if lists_stale or not all(os.path.exists(path) for path in paths):
+                tasks.append((url, paths))
+        # the entity and id of every page rendered, for the manifest
+        page_urls = {}
+        for id in sorted(stale & ids):
+            url = url_for('home.project', id=id)
+            page_urls[url] = ('project', id)
+            tasks.append((url, [os.path.join(folder, path_for(url))]))
+        entries = [(url_for('home.homepage'), None), (url_for('home.projects'), None)]
+        entries.extend((url_for('home.project', id=id), modified) for id, modified in projects)
+
+        listings = {}
+        deleted = [('projects', existing - ids)]
+        for entity, endpoint, directory, model, column in PROFILES:
+            profiles, listed = _profiles(model, column, limit)
+            listings[entity] = listed
+            on_disk = _existing(folder, directory)
+            deleted.append((directory, on_disk - set(listed)))
+            if changed is None:
+                outdated = set(listed)
+            else:
+                before = manifest['profiles'].get(entity, {})
+                outdated = entities[entity] | set(manifest['pending'].get(entity, ())) | (set(listed) - on_disk)
+                outdated.update(id for id, shown in listed.items()
+                                if before.get(str(id)) != shown or changed.intersection(shown[:limit]))
+            for id in sorted(outdated & set(listed)):
+                url = url_for(endpoint, id=id)
+                page_urls[url] = (entity, id)
+                tasks.append((url, [os.path.join(folder, path_for(url))]))
+            entries.extend((url_for(endpoint, id=id), modified) for id, modified in profiles)
+
+    removed = 0
+    for directory, gone in deleted:
+        for id in gone:
+            _remove(os.path.join(folder, directory, '{}.html'.format(id)))
+            removed += 1
+    for path in _list_files(folder) - list_files:
+        _remove(path)
+        removed += 1
+
+    # forked workers must open their own database connections
+    with app.app_context():
+        db.session.remove()
+        for bind in [None] + list(config.get('SQLALCHEMY_BINDS') or ()):
+            db.get_engine(app, bind).dispose()
+
+    _app = app
+    processes = processes or config.get('SNAPSHOT_PROCESSES') or os.cpu_count() or 1
+    failed = []
+    done = 0
+    if processes > 1 and len(tasks) > 1:
+        pool = multiprocessing.get_context('fork').Pool(processes, initializer=_start_worker)
+        chunksize = max(1, min(100, len(tasks) // (processes * 4)))
+        results = pool.imap_unordered(_render, tasks, chunksize=chunksize)
+    else:
+        pool = None
+        _start_worker()
+        results = map(_render, tasks)
+    try:
+        for url, error in results:
+            done += 1
+            if error is not None:
+                failed.append(url)
+                app.logger.warning('Snapshot of %s failed: %s', url, error)
+            if progress is not None and (done % 1000 == 0 or done == len(tasks)):
+                progress(done, len(tasks), time.monotonic() - started)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    _write_sitemaps(folder, base_url, entries, precompress)
+    retry = [page_urls[url] for url in failed if url in page_urls]
+    _write(os.path.join(folder, MANIFEST), json.dumps({
+        'seq': seq,
+        'page_size': limit,
+        'built_at': datetime.utcnow().isoformat() + 'Z',
+        'related': {str(id): listed for id, listed in related.items()},
+        # the first projects each profile lists
+        'profiles': {entity: {str(id): shown for id, shown in listed.items()} for entity, listed in listings.items()},
+        # pages to render again next time
+        'pending': {entity: sorted(id for kind, id in retry if kind == entity)
+                    for entity in ['project'] + [profile[0] for profile in PROFILES]},
+        'lists_pending': any(url not in page_urls for url in failed),
+    }).encode('utf-8'))
+    return {'rendered': len(tasks) - len(failed), 'removed': removed, 'failed': len(failed)}
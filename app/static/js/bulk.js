@@ -0,0 +1,15 @@
+/*
+ * "Select all" checkbox of the admin bulk action tables.
+ */
+(function () {
+    var toggles = document.querySelectorAll('input.select-all');
+    for (var i = 0; i < toggles.length; i++) {
+        toggles[i].addEventListener('change', function (event) {
+            var form = event.target.form;
+            var boxes = form.querySelectorAll('input[name="ids"]');
+            for (var j = 0; j < boxes.length; j++) {
+                boxes[j].checked = event.target.checked;
+            }
+        });
+    }
+})();
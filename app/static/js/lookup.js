@@ -0,0 +1,84 @@
+/*
+ * Typeahead for the admin pickers: a select.lookup-select only holds its
+ * selected options, matches are fetched from its data-lookup URL as the
+ * admin types and added to the select when picked.
+ */
+(function () {
+    function debounce(fn, wait) {
+        var timer;
+        return function () {
+            var args = arguments;
+            clearTimeout(timer);
+            timer = setTimeout(function () { fn.apply(null, args); }, wait);
+        };
+    }
+
+    function pick(select, item) {
+        var value = String(item.id);
+        for (var i = 0; i < select.options.length; i++) {
+            if (select.options[i].value === value) {
+                select.options[i].selected = true;
+                return;
+            }
+        }
+        if (!select.multiple) {
+            for (var j = select.options.length - 1; j >= 0; j--) {
+                if (select.options[j].value !== '__None') {
+                    select.remove(j);
+                }
+            }
+        }
+        var option = new Option(item.name, value, true, true);
+        select.add(option);
+    }
+
+    function attach(select) {
+        var input = document.createElement('input');
+        input.type = 'text';
+        input.className = 'form-control lookup-input';
+        input.placeholder = 'Type to search';
+        input.setAttribute('autocomplete', 'off');
+        var results = document.createElement('ul');
+        results.className = 'list-group lookup-results';
+        select.parentNode.insertBefore(input, select);
+        select.parentNode.insertBefore(results, select);
+
+        var search = debounce(function (query) {
+            var request = new XMLHttpRequest();
+            request.open('GET', select.getAttribute('data-lookup') + '?q=' + encodeURIComponent(query));
+            request.onload = function () {
+                if (request.status !== 200 || input.value !== query) {
+                    return;
+                }
+                results.innerHTML = '';
+                JSON.parse(request.responseText).forEach(function (item) {
+                    var entry = document.createElement('li');
+                    entry.className = 'list-group-item';
+                    entry.textContent = item.name;
+                    entry.addEventListener('mousedown', function (event) {
+                        event.preventDefault();
+                        pick(select, item);
+                        results.innerHTML = '';
+                        input.value = '';
+                    });
+                    results.appendChild(entry);
+                });
+            };
+            request.send();
+        }, 200);
+
+        input.addEventListener('input', function () {
+            if (input.value.trim()) {
+                search(input.value);
+            } else {
+                results.innerHTML = '';
+            }
+        });
+        input.addEventListener('blur', function () { results.innerHTML = ''; });
+    }
+
+    var selects = document.querySelectorAll('select.lookup-select');
+    for (var i = 0; i < selects.length; i++) {
+        attach(selects[i]);
+    }
+})();
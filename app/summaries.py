@@ -0,0 +1,101 @@
+from sqlalchemy import func, select
+
+from app import db
+from .database import chunked
+from .models import Category, Project, ProjectSummary, project_category
+
+# How the category names of a project are joined in its summary
+SEPARATOR = ', '
+
+
+def _compute(ids):
+    """
+    The summary rows of the given projects as the catalog has them, with
+    one query for the projects and one for their category names
+    """
+    rows = {}
+    for id, name, description, location in db.session.execute(
+            select(Project.id, Project.name, Project.description, Project.location).where(Project.id.in_(ids))):
+        rows[id] = {'id': id, 'name': name, 'description': description, 'location': location, 'categories': []}
+    for project_id, name in db.session.execute(
+            select(project_category.c.project_id, Category.name)
+            .join(Category, Category.id == project_category.c.category_id)
+            .where(project_category.c.project_id.in_(ids)).order_by(Category.name)):
+        if project_id in rows:
+            rows[project_id]['categories'].append(name)
+    for row in rows.values():
+        row['categories'] = SEPARATOR.join(row['categories'])
+    return rows
+
+
+def refresh(ids):
+    """
+    Recompute the summaries of the given projects inside the current
+    transaction, a project that no longer exists loses its summary
+    """
+    db.session.flush()
+    table = ProjectSummary.__table__
+    for chunk in chunked(dict.fromkeys(ids)):
+        rows = _compute(chunk)
+        db.session.execute(table.delete().where(table.c.id.in_(chunk)))
+        if rows:
+            db.session.execute(table.insert(), list(rows.values()))
+
+
+def remove(ids):
+    """
+    Drop the summaries of projects that are about to be deleted, inside the current transaction
+    """
+    table = ProjectSummary.__table__
+    for chunk in chunked(dict.fromkeys(ids)):
+        db.session.execute(table.delete().where(table.c.id.in_(chunk)))
+
+
+def _project_ids():
+    return [row[0] for row in db.session.execute(select(Project.id).order_by(Project.id))]
+
+
+def rebuild():
+    """
+    Recompute the summary of every project, returns the number of summaries
+    """
+    table = ProjectSummary.__table__
+    db.session.execute(table.delete())
+    for chunk in chunked(_project_ids()):
+        rows = _compute(chunk)
+        if rows:
+            db.session.execute(table.insert(), list(rows.values()))
+    db.session.commit()
+    return db.session.query(func.count()).select_from(table).scalar()
+
+
+def check():
+    """
+    Compare the summaries with the catalog, returns the ids of the projects
+    without a summary, of those whose summary is outdated and of the
+    summaries left behind by deleted projects
+    """
+    table = ProjectSummary.__table__
+    problems = {'missing': [], 'stale': [], 'orphaned': []}
+    for chunk in chunked(_project_ids()):
+        expected = _compute(chunk)
+        stored = {row.id: dict(row._mapping) for row in db.session.execute(select(table)
+                                                                           .where(table.c.id.in_(chunk)))}
+        for id, row in expected.items():
+            if id not in stored:
+                problems['missing'].append(id)
+            elif stored[id] != row:
+                problems['stale'].append(id)
+    problems['orphaned'] = [row[0] for row in db.session.execute(
+        select(table.c.id).outerjoin(Project, Project.id == table.c.id).where(Project.id.is_(None))
+        .order_by(table.c.id))]
+    return problems
+
+
+def repair(problems):
+    """
+    Fix what check() found and commit
+    """
+    refresh(problems['missing'] + problems['stale'])
+    remove(problems['orphaned'])
+    db.session.commit()
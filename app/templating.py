@@ -0,0 +1,57 @@
+import os
+
+from jinja2 import FileSystemBytecodeCache, TemplateSyntaxError
+
+from .instrumentation import UNRECORDED
+
+
+def init_bytecode_cache(app):
+    """
+    Keep the compiled templates on disk so a new worker loads them instead
+    of compiling every template again on first use
+    """
+    if not app.config.get('JINJA_BYTECODE_CACHE', True):
+        return
+    folder = app.config.setdefault('JINJA_BYTECODE_CACHE_FOLDER', os.path.join(app.instance_path, 'jinja'))
+    os.makedirs(folder, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(folder)
+
+
+def precompile(app):
+    """
+    Compile every template of the application and its extensions, which
+    fills the bytecode cache. Returns the names compiled and the
+    (name, error) pairs of the templates that failed to compile.
+    """
+    compiled, failed = [], []
+    for name in app.jinja_env.list_templates():
+        try:
+            app.jinja_env.get_template(name)
+        except TemplateSyntaxError as error:
+            failed.append((name, error))
+        else:
+            compiled.append(name)
+    return compiled, failed
+
+
+def warmup(app):
+    """
+    Render the pages listed in WARMUP_URLS once, before the worker accepts
+    traffic, so their templates are loaded and the database connections
+    opened. They are not counted in /admin/metrics. Returns the number of
+    pages rendered without error.
+    """
+    urls = app.config.get('WARMUP_URLS', ())
+    rendered = 0
+    client = app.test_client()
+    for url in urls:
+        try:
+            response = client.get(url, environ_base={UNRECORDED: True})
+        except Exception:
+            app.logger.exception('Warmup request to %s failed', url)
+            continue
+        if response.status_code < 400:
+            rendered += 1
+        else:
+            app.logger.warning('Warmup request to %s returned %s', url, response.status_code)
+    return rendered
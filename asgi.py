@@ -0,0 +1,12 @@
+"""
+ASGI entry point, served by uvicorn from requirements.txt
+
+    FLASK_CONFIG=production uvicorn asgi:app --workers 4
+"""
+import os
+
+from app import create_app
+from app.asgi import ASGIApp
+
+config_name = os.getenv('FLASK_CONFIG')
+app = ASGIApp(create_app(config_name))
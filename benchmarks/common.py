@@ -0,0 +1,31 @@
+import os
+
+from app import create_app, db
+from app.cache import MemoryCache, NullCache
+
+SIZES = {
+    '1k': 1000,
+    '100k': 100000,
+    '1m': 1000000,
+}
+
+DEFAULT_DATABASE = 'sqlite:///{}'.format(os.path.abspath('bench.sqlite3'))
+
+
+def make_app(database, page_cache=True):
+    """
+    Build the application against the benchmark database
+    """
+    app = create_app(os.getenv('FLASK_CONFIG') or 'production')
+    app.config['SQLALCHEMY_DATABASE_URI'] = database
+    app.config['SQLALCHEMY_ECHO'] = False
+    app.config['WTF_CSRF_ENABLED'] = False
+    cache = app.extensions['page_cache']
+    if not page_cache:
+        cache.backend = NullCache()
+    elif not isinstance(cache.backend, MemoryCache):
+        # the benchmarks run in one process, without a Redis server next to them
+        cache.backend = MemoryCache(app.config.get('PAGE_CACHE_SIZE', 1024), app.config.get('PAGE_CACHE_TTL', 300))
+    with app.app_context():
+        db.create_all()
+    return app
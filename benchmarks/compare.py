@@ -0,0 +1,39 @@
+"""
+Compare two benchmark result files route by route
+
+    python -m benchmarks.compare baseline.json candidate.json
+"""
+import argparse
+import json
+
+
+def change(before, after):
+    if not before:
+        return ''
+    return '{:+.1f}%'.format(100.0 * (after - before) / before)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as baseline, open(args.candidate) as candidate:
+        before, after = json.load(baseline), json.load(candidate)
+
+    print('{:<32} {:>10} {:>10} {:>9} {:>10} {:>10} {:>9} {:>8}'.format(
+        'route', 'p50 ms', 'p50 new', 'change', 'p95 ms', 'p95 new', 'change', 'queries'))
+    for name in sorted(set(before['routes']) & set(after['routes'])):
+        old, new = before['routes'][name], after['routes'][name]
+        print('{:<32} {:>10.2f} {:>10.2f} {:>9} {:>10.2f} {:>10.2f} {:>9} {:>8}'.format(
+            name,
+            old['latency_ms']['p50'], new['latency_ms']['p50'],
+            change(old['latency_ms']['p50'], new['latency_ms']['p50']),
+            old['latency_ms']['p95'], new['latency_ms']['p95'],
+            change(old['latency_ms']['p95'], new['latency_ms']['p95']),
+            '{:.1f}>{:.1f}'.format(old['queries_per_request'], new['queries_per_request'])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+"""
+Compare how many concurrent connections the public read routes sustain in
+WSGI mode, every request on a pool of worker threads, and in ASGI mode,
+the ASYNC_ENDPOINTS views on the event loop over an async engine
+
+    python -m benchmarks.concurrency --database sqlite:////tmp/bench.sqlite3 --db-latency-ms 5
+
+Runs on uvicorn and aiosqlite, pinned in requirements.txt, other databases
+need their async driver.
+Both modes run under the same uvicorn server so only the dispatch differs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from .common import DEFAULT_DATABASE
+from .run import git_revision, percentile
+
+MODES = ('wsgi', 'asgi')
+
+
+def read_routes(database):
+    """
+    URLs of the projects, project and profile pages of the benchmark catalog
+    """
+    from .common import make_app
+    from .run import sample_ids
+
+    ids = sample_ids(make_app(database))
+    return ['/projects', '/projects?after={}'.format(ids['middle_cursor']), '/projects/{}'.format(ids['project']),
+            '/individuals/{}'.format(ids['individual']), '/organizations/{}'.format(ids['organization'])]
+
+
+def add_latency(app, engine, seconds):
+    """
+    Wait `seconds` before every query, as a database across the network
+    would. Queries of the async engine wait on the event loop, the others
+    block their thread.
+    """
+    from sqlalchemy import event
+    from sqlalchemy.util import await_only
+
+    def wait_async(*args):
+        await_only(asyncio.sleep(seconds))
+
+    def wait_sync(*args):
+        time.sleep(seconds)
+
+    from app import db
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', wait_sync)
+    if engine is not None:
+        event.listen(engine.sync_engine, 'before_cursor_execute', wait_async)
+
+
+def serve(args):
+    """
+    Run one mode under uvicorn, the parent process drives the load
+    """
+    import uvicorn
+    from app.asgi import ASGIApp, create_async_engine
+    from .common import make_app
+
+    app = make_app(args.database, page_cache=not args.no_page_cache)
+    app.config['ASGI_THREADS'] = args.threads
+    if args.mode == 'wsgi':
+        app.config['ASYNC_ENDPOINTS'] = ()
+    application = ASGIApp(app)
+
+    if args.db_latency_ms:
+        startup = application.startup
+
+        async def startup_with_latency():
+            await startup()
+            add_latency(app, application.engine, args.db_latency_ms / 1000.0)
+
+        application.startup = startup_with_latency
+    uvicorn.run(application, host='127.0.0.1', port=args.port, log_level='warning', backlog=4096)
+
+
+async def _read_body(reader, status, head):
+    """
+    Read a response body to its end: by Content-Length, chunk by chunk when
+    it is streamed, e.g. the exports and the change feed, or up to the end
+    of the connection. Returns whether the connection can be reused.
+    """
+    headers = {}
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        headers[name.strip().lower()] = value.strip().lower()
+    keep_alive = headers.get(b'connection') != b'close'
+    if status < 200 or status in (204, 304):
+        return keep_alive
+    if b'chunked' in headers.get(b'transfer-encoding', b''):
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';', 1)[0], 16)
+            if not size:
+                break
+            await reader.readexactly(size + 2)
+        # trailers, up to an empty line
+        while await reader.readuntil(b'\r\n') != b'\r\n':
+            pass
+    elif b'content-length' in headers:
+        await reader.readexactly(int(headers[b'content-length']))
+    else:
+        while await reader.read(65536):
+            pass
+        return False
+    return keep_alive
+
+
+async def _request(reader, writer, path):
+    """
+    Send a GET and read the whole response, returns the status and whether
+    the connection can be reused
+    """
+    writer.write('GET {} HTTP/1.1\r\nHost: localhost\r\n\r\n'.format(path).encode('latin-1'))
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    return status, await _read_body(reader, status, head)
+
+
+async def _connection(port, paths, offset, deadline, latencies, errors):
+    writer = None
+    index = offset
+    try:
+        while time.perf_counter() < deadline:
+            if writer is None:
+                try:
+                    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                except OSError:
+                    errors.append('connect')
+                    return
+            begin = time.perf_counter()
+            status, keep_alive = await _request(reader, writer, paths[index % len(paths)])
+            index += 1
+            if status >= 400:
+                errors.append(status)
+            else:
+                latencies.append(time.perf_counter() - begin)
+            if not keep_alive:
+                writer.close()
+                writer = None
+    except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as error:
+        errors.append(type(error).__name__)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def _load(port, paths, connections, duration):
+    latencies, errors = [], []
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*[_connection(port, paths, index, deadline, latencies, errors)
+                           for index in range(connections)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'connections': connections,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'throughput_rps': len(latencies) / elapsed,
+        'latency_ms': {
+            'p50': 1000 * (percentile(latencies, 0.50) or 0),
+            'p99': 1000 * (percentile(latencies, 0.99) or 0),
+        },
+    }
+
+
+def _wait_for_port(port, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('Server exited with status {}'.format(process.returncode))
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('Server did not start on port {}'.format(port))
+
+
+def run_mode(args, mode, paths):
+    command = [sys.executable, '-m', 'benchmarks.concurrency', '--serve', '--mode', mode,
+               '--database', args.database, '--port', str(args.port), '--threads', str(args.threads),
+               '--db-latency-ms', str(args.db_latency_ms)]
+    if args.no_page_cache:
+        command.append('--no-page-cache')
+    process = subprocess.Popen(command, env=dict(os.environ, PYTHONWARNINGS='ignore'))
+    try:
+        _wait_for_port(args.port, process)
+        asyncio.run(_load(args.port, paths, 1, 1))  # warm up
+        results = []
+        for connections in args.connections:
+            result = asyncio.run(_load(args.port, paths, connections, args.duration))
+            sys.stderr.write('{:<5} {:>5} conns  {:>8.1f} req/s  p50 {:>8.2f}ms  p99 {:>8.2f}ms  {:>5} errors\n'
+                             .format(mode, connections, result['throughput_rps'], result['latency_ms']['p50'],
+                                     result['latency_ms']['p99'], result['errors']))
+            results.append(result)
+        return results
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', default=DEFAULT_DATABASE)
+    parser.add_argument('--mode', choices=MODES, help='Only measure one mode.')
+    parser.add_argument('--connections', default='1,16,64,256',
+                        help='Comma-separated numbers of concurrent keep-alive connections.')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per connection count.')
+    parser.add_argument('--threads', type=int, default=8, help='Worker threads of the WSGI pool.')
+    parser.add_argument('--db-latency-ms', type=float, default=0.0,
+                        help='Simulated network round trip added to every query.')
+    parser.add_argument('--no-page-cache', action='store_true', help='Measure with the page cache disabled.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--output', default='bench_concurrency.json')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        return serve(args)
+
+    args.connections = [int(count) for count in args.connections.split(',')]
+    paths = read_routes(args.database)
+    results = {mode: run_mode(args, mode, paths) for mode in ([args.mode] if args.mode else MODES)}
+
+    report = {
+        'meta': {
+            'date': datetime.utcnow().isoformat() + 'Z',
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': args.database,
+            'threads': args.threads,
+            'db_latency_ms': args.db_latency_ms,
+            'page_cache': not args.no_page_cache,
+            'duration': args.duration,
+        },
+        'modes': results,
+    }
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+    sys.stderr.write('Results written to {}\n'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,370 @@
+"""
+Drive every route through the Flask test client and record latency, throughput,
+query count and memory per route
+
+    python -m benchmarks.run --database sqlite:////tmp/bench.sqlite3 --output results.json
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import event, func
+
+from app import db, related
+from app.models import Category, Individual, Organization, Project, ProjectSummary, Role, User
+from app.pagination import row_cursor
+from .common import DEFAULT_DATABASE, make_app
+from .seed import ADMIN, MEMBER
+
+# Names of the rows the write routes create, removed again by clean_up()
+PREFIX = 'bench-'
+
+# Routes after which the related projects are rebuilt
+RELATED_WRITES = ('admin.edit_project (submit)', 'admin.delete_project')
+
+_unique = itertools.count()
+
+
+def rss_bytes():
+    """
+    Current resident set size, falls back to the peak on platforms without /proc
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError):
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a sorted list
+    """
+    if not values:
+        return None
+    return values[max(0, int(math.ceil(fraction * len(values))) - 1)]
+
+
+def routes(app, ids):
+    """
+    (name, user, method, url or callable) for every route of the home, auth,
+    api and admin blueprints. A callable is given the client and returns
+    (url, data), it sets up what the request needs, e.g. a row to delete,
+    before the clock starts. Edits submit the values a row already has, so
+    they do the full work without changing the catalog.
+    """
+    project, category = ids['project'], ids['category']
+    individual, organization, user = ids['individual'], ids['organization'], ids['user']
+    middle, role = ids['middle'], ids['role']
+
+    def login(client):
+        return '/login', {'email': MEMBER['email'], 'password': MEMBER['password']}
+
+    def logout(client):
+        client.post('/login', data={'email': MEMBER['email'], 'password': MEMBER['password']})
+        return '/logout', None
+
+    def register(client):
+        return '/register', user_form()
+
+    def add_user(client):
+        return '/admin/users/add', dict(user_form(), role=str(role))
+
+    def assign_user(client):
+        return '/admin/users/assign/{}'.format(user), {'role': str(role)}
+
+    def bulk_users(action):
+        def build(client):
+            return '/admin/users/bulk', {'ids': [str(user)], 'role': str(role), action: action.title()}
+        return build
+
+    def edit_project(client):
+        return '/admin/projects/edit/{}'.format(project), ids['project_form']
+
+    def bulk_preview(client):
+        return '/admin/projects/bulk', {'ids': [str(project), str(middle)], 'action': 'category',
+                                        'category': str(category), 'preview': 'Preview'}
+
+    def add(kind):
+        def build(client):
+            return '/admin/{}/add'.format(kind), {'name': unique_name(kind), 'description': 'Benchmark'}
+        return build
+
+    def edit(kind, id):
+        def build(client):
+            return '/admin/{}/edit/{}'.format(kind, id), ids['forms'][kind]
+        return build
+
+    def delete(kind, model):
+        def build(client):
+            return '/admin/{}/delete/{}'.format(kind, create(app, client, kind, model, ids)), None
+        return build
+
+    return [
+        ('home.homepage', None, 'GET', '/'),
+        ('home.projects', None, 'GET', '/projects'),
+        ('home.projects (deep page)', None, 'GET', '/projects?after={}'.format(ids['middle_cursor'])),
+        ('home.projects (faceted)', None, 'GET', '/projects?category={}'.format(category)),
+        ('home.project', None, 'GET', '/projects/{}'.format(project)),
+        ('home.search_projects', None, 'GET', '/projects/search?q=lightning+wallet'),
+        ('home.individual', None, 'GET', '/individuals/{}'.format(individual)),
+        ('home.organization', None, 'GET', '/organizations/{}'.format(organization)),
+        ('home.dashboard', MEMBER, 'GET', '/dashboard'),
+        ('home.admin_dashboard', ADMIN, 'GET', '/admin/dashboard'),
+        ('auth.register', None, 'GET', '/register'),
+        ('auth.register (submit)', None, 'POST', register),
+        ('auth.login', None, 'GET', '/login'),
+        ('auth.login (submit)', None, 'POST', login),
+        ('api.list_projects', None, 'GET', '/api/v1/projects'),
+        ('api.get_project', None, 'GET', '/api/v1/projects/{}'.format(project)),
+        ('api.list_categories', None, 'GET', '/api/v1/categories'),
+        ('api.get_organization', None, 'GET', '/api/v1/organizations/{}'.format(organization)),
+        ('api.list_changes', None, 'GET', '/api/v1/changes?since=0&limit=1000'),
+        ('admin.list_projects', ADMIN, 'GET', '/admin/projects'),
+        ('admin.list_categories', ADMIN, 'GET', '/admin/categories'),
+        ('admin.list_individuals', ADMIN, 'GET', '/admin/individuals'),
+        ('admin.list_organizations', ADMIN, 'GET', '/admin/organizations'),
+        ('admin.list_roles', ADMIN, 'GET', '/admin/roles'),
+        ('admin.list_users', ADMIN, 'GET', '/admin/users'),
+        ('admin.export_projects (csv)', ADMIN, 'GET', '/admin/projects/export.csv'),
+        ('admin.export_projects (ndjson)', ADMIN, 'GET', '/admin/projects/export.ndjson'),
+        ('admin.add_project (form)', ADMIN, 'GET', '/admin/projects/add'),
+        ('admin.edit_project (form)', ADMIN, 'GET', '/admin/projects/edit/{}'.format(project)),
+        ('admin.edit_project (submit)', ADMIN, 'POST', edit_project),
+        ('admin.delete_project', ADMIN, 'POST', delete('projects', Project)),
+        ('admin.bulk_projects (preview)', ADMIN, 'POST', bulk_preview),
+        ('admin.add_category (submit)', ADMIN, 'POST', add('categories')),
+        ('admin.edit_category (submit)', ADMIN, 'POST', edit('categories', category)),
+        ('admin.delete_category', ADMIN, 'POST', delete('categories', Category)),
+        ('admin.add_individual (submit)', ADMIN, 'POST', add('individuals')),
+        ('admin.edit_individual (submit)', ADMIN, 'POST', edit('individuals', individual)),
+        ('admin.delete_individual', ADMIN, 'POST', delete('individuals', Individual)),
+        ('admin.add_organization (submit)', ADMIN, 'POST', add('organizations')),
+        ('admin.edit_organization (submit)', ADMIN, 'POST', edit('organizations', organization)),
+        ('admin.delete_organization', ADMIN, 'POST', delete('organizations', Organization)),
+        ('admin.add_role (submit)', ADMIN, 'POST', add('roles')),
+        ('admin.edit_role (submit)', ADMIN, 'POST', edit('roles', role)),
+        ('admin.delete_role', ADMIN, 'POST', delete('roles', Role)),
+        ('admin.add_user (form)', ADMIN, 'GET', '/admin/users/add'),
+        ('admin.add_user (submit)', ADMIN, 'POST', add_user),
+        ('admin.edit_user (form)', ADMIN, 'GET', '/admin/users/edit/{}'.format(user)),
+        ('admin.assign_user (submit)', ADMIN, 'POST', assign_user),
+        ('admin.bulk_users (preview)', ADMIN, 'POST', bulk_users('preview')),
+        ('admin.bulk_users (submit)', ADMIN, 'POST', bulk_users('submit')),
+        ('admin.lookup', ADMIN, 'GET', '/admin/lookup/individuals?q=person+1'),
+        ('admin.cache_stats', ADMIN, 'GET', '/admin/cache'),
+        ('admin.metrics', ADMIN, 'GET', '/admin/metrics'),
+        # last, every request logs the member's client out
+        ('auth.logout', MEMBER, 'GET', logout),
+    ]
+
+
+def unique_name(kind):
+    return '{}{}-{}'.format(PREFIX, kind, next(_unique))
+
+
+def user_form():
+    name = unique_name('user')
+    return {'email': '{}@example.com'.format(name), 'username': name,
+            'password': 'benchmark', 'confirm_password': 'benchmark'}
+
+
+def create(app, client, kind, model, ids):
+    """
+    Add a throwaway row through the admin views, a project linked like a
+    seeded one, returns its id
+    """
+    name = unique_name(kind)
+    data = {'name': name, 'description': 'Benchmark'}
+    if model is Project:
+        data.update(location='Berlin', url='', categories=[str(ids['category'])],
+                    individuals=[str(ids['individual'])], organizations=[str(ids['organization'])])
+    client.post('/admin/{}/add'.format(kind), data=data)
+    with app.app_context():
+        return db.session.query(model.id).filter_by(name=name).scalar()
+
+
+def clean_up(app, client, ids, rebuild_related=False):
+    """
+    Delete the rows the write routes left behind and put back what the
+    edits changed, run before and after the routes so the catalog is the
+    same for every run. Rows go through the admin views, which keep the
+    search index, summaries and facets in step, users are deleted directly
+    as there is no view for it. Project writes leave related lists a match
+    short, `rebuild_related` recomputes them.
+    """
+    pattern = PREFIX + '%'
+    with app.app_context():
+        User.query.filter(User.email.like(pattern)).delete(synchronize_session=False)
+        User.query.filter_by(id=ids['user']).update({'role_id': ids['member_role']})
+        for model, (id, description) in ids['descriptions'].items():
+            model.query.filter_by(id=id).update({'description': description})
+        db.session.commit()
+        leftovers = [(kind, [row[0] for row in db.session.query(model.id).filter(model.name.like(pattern))])
+                     for kind, model in (('projects', Project), ('categories', Category),
+                                         ('individuals', Individual), ('organizations', Organization),
+                                         ('roles', Role))]
+    for kind, leftover in leftovers:
+        for id in leftover:
+            client.post('/admin/{}/delete/{}'.format(kind, id))
+    if rebuild_related:
+        with app.app_context():
+            related.rebuild()
+
+
+def sample_ids(app):
+    with app.app_context():
+        project = Project.query.order_by(Project.id).first()
+        count = db.session.query(func.count(Project.id)).scalar()
+        member = User.query.filter_by(email=MEMBER['email']).first()
+        role = member.role or Role.query.order_by(Role.id).first()
+        category = Category.query.order_by(Category.id).first()
+        individual = Individual.query.order_by(Individual.id).first()
+        organization = Organization.query.order_by(Organization.id).first()
+        return {
+            'project': project.id,
+            'project_form': {
+                'name': project.name, 'description': project.description, 'location': project.location or '',
+                'url': project.url or '', 'categories': [str(row.id) for row in project.categories],
+                'individuals': [str(row.id) for row in project.individuals],
+                'organizations': [str(row.id) for row in project.organizations],
+            },
+            'middle': db.session.query(Project.id).order_by(Project.id).offset(count // 2).limit(1).scalar(),
+            'middle_cursor': row_cursor(ProjectSummary.query.order_by(ProjectSummary.name, ProjectSummary.id)
+                                        .offset(count // 2).first(), ProjectSummary, ProjectSummary.name),
+            'category': category.id,
+            'individual': individual.id,
+            'organization': organization.id,
+            'user': member.id,
+            'role': role.id,
+            'member_role': member.role_id,
+            # the edit forms require a description, which imported rows lack
+            'forms': {kind: {'name': row.name, 'description': row.description or 'Benchmark'}
+                      for kind, row in (('categories', category), ('individuals', individual),
+                                        ('organizations', organization), ('roles', role))},
+            'descriptions': {model: (row.id, row.description)
+                             for model, row in ((Category, category), (Individual, individual),
+                                                (Organization, organization), (Role, role))},
+            'projects': count,
+        }
+
+
+def measure(app, client, method, target, requests, warmup, queries):
+    def call():
+        url, data = target(client) if callable(target) else (target, None)
+        before = len(queries)
+        begin = time.perf_counter()
+        response = client.open(url, method=method, data=data)
+        response.get_data()
+        latency = time.perf_counter() - begin
+        if response.status_code >= 400:
+            raise RuntimeError('{} {} returned {}'.format(method, url, response.status_code))
+        response.close()
+        return latency, len(queries) - before
+
+    for _ in range(warmup):
+        call()
+
+    latencies = []
+    count = 0
+    peak = rss_bytes()
+    for _ in range(requests):
+        latency, statements = call()
+        latencies.append(latency)
+        count += statements
+        peak = max(peak, rss_bytes())
+    elapsed = sum(latencies)
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'throughput_rps': requests / elapsed if elapsed else None,
+        'latency_ms': {
+            'mean': 1000 * sum(latencies) / len(latencies),
+            'p50': 1000 * percentile(latencies, 0.50),
+            'p95': 1000 * percentile(latencies, 0.95),
+            'p99': 1000 * percentile(latencies, 0.99),
+        },
+        'queries_per_request': float(count) / requests,
+        'peak_rss_mb': peak / 1048576.0,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', default=DEFAULT_DATABASE)
+    parser.add_argument('--requests', type=int, default=50, help='Timed requests per route.')
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per route.')
+    parser.add_argument('--no-page-cache', action='store_true', help='Measure with the page cache disabled.')
+    parser.add_argument('--routes', help='Only run routes whose name contains this text.')
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args(argv)
+
+    app = make_app(args.database, page_cache=not args.no_page_cache)
+    ids = sample_ids(app)
+    queries = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *_: queries.append(None))
+
+    clients = {}
+
+    def client_for(user):
+        key = user['email'] if user else None
+        if key not in clients:
+            clients[key] = app.test_client()
+            if user:
+                clients[key].post('/login', data={'email': user['email'], 'password': user['password']})
+        return clients[key]
+
+    results = {}
+    run = []
+    clean_up(app, client_for(ADMIN), ids)
+    try:
+        for name, user, method, target in routes(app, ids):
+            if args.routes and args.routes not in name:
+                continue
+            run.append(name)
+            results[name] = measure(app, client_for(user), method, target, args.requests, args.warmup, queries)
+            latency = results[name]['latency_ms']
+            sys.stderr.write('{:<36} p50 {:>8.2f}ms  p95 {:>8.2f}ms  p99 {:>8.2f}ms  {:>6.1f} queries\n'.format(
+                name, latency['p50'], latency['p95'], latency['p99'], results[name]['queries_per_request']))
+    finally:
+        clean_up(app, client_for(ADMIN), ids, rebuild_related=any(name in run for name in RELATED_WRITES))
+
+    report = {
+        'meta': {
+            'date': datetime.utcnow().isoformat() + 'Z',
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': args.database,
+            'projects': ids['projects'],
+            'page_cache': not args.no_page_cache,
+            'requests_per_route': args.requests,
+        },
+        'routes': results,
+    }
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+    sys.stderr.write('Results written to {}\n'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Generate a synthetic catalog for benchmarking
+
+    python -m benchmarks.seed --size 100k --database sqlite:////tmp/bench.sqlite3
+"""
+import argparse
+import random
+import sys
+
+from app import db
+from app.importer import import_projects
+from app.models import Role, User
+from .common import DEFAULT_DATABASE, SIZES, make_app
+
+WORDS = ('bitcoin lightning wallet node exchange custody mining pool payments privacy mixer layer sidechain '
+         'oracle vault hardware multisig explorer faucet merchant escrow lending savings remittance tipping '
+         'identity channel relay miner hashrate ledger protocol client library index market').split()
+
+CITIES = ('Berlin', 'Lisbon', 'Austin', 'Zurich', 'Tokyo', 'Toronto', 'Prague', 'Singapore', 'Buenos Aires',
+          'Nairobi', 'San Salvador', 'London', 'Tallinn', 'Seoul', 'Lagos', 'Sydney', 'Denver', 'Oslo')
+
+ADMIN = {'email': 'admin@example.com', 'username': 'admin', 'password': 'benchmark'}
+MEMBER = {'email': 'member@example.com', 'username': 'member', 'password': 'benchmark'}
+
+
+def generate(count, seed=0):
+    """
+    Yield `count` project rows whose relation sizes follow a long tail:
+    a few dozen categories, a person per three projects and an investor
+    per twenty, with popular investors backing many projects
+    """
+    rng = random.Random(seed)
+    categories = ['{} {}'.format(a, b).title() for a, b in zip(WORDS, reversed(WORDS))]
+    people = max(1, count // 3)
+    investors = max(1, count // 20)
+    for i in range(count):
+        words = rng.sample(WORDS, 3)
+        yield {
+            'name': '{} {} {}'.format(words[0], words[1], i).title(),
+            'description': 'A {} for {} {} on {}.'.format(*rng.sample(WORDS, 4)),
+            'location': rng.choice(CITIES),
+            'url': 'https://example.com/projects/{}'.format(i),
+            'categories': rng.sample(categories, rng.randint(1, 3)),
+            'individuals': ['Person {}'.format(rng.randrange(people)) for _ in range(rng.randint(1, 5))],
+            'organizations': ['Fund {}'.format(int(rng.paretovariate(1.2)) % investors)
+                              for _ in range(rng.randint(0, 4))],
+        }
+
+
+def seed_users():
+    if not User.query.filter_by(email=ADMIN['email']).first():
+        db.session.add(User(is_admin=True, **ADMIN))
+    if not User.query.filter_by(email=MEMBER['email']).first():
+        role = Role.query.filter_by(name='Member').first() or Role(name='Member', description='Benchmark user')
+        db.session.add(User(role=role, **MEMBER))
+    db.session.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', choices=sorted(SIZES), default='1k')
+    parser.add_argument('--database', default=DEFAULT_DATABASE)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    app = make_app(args.database)
+    with app.app_context():
+        seed_users()
+
+        def progress(total, elapsed):
+            sys.stderr.write('\r{:>10} rows  {:>8.0f} rows/s'.format(total, total / elapsed if elapsed else 0))
+
+        total = import_projects(generate(SIZES[args.size], args.seed), batch_size=args.batch_size,
+                                progress=progress)
+        sys.stderr.write('\nSeeded {} projects into {}\n'.format(total, args.database))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,160 @@
-class Config(object):
-    """
-    Common configurations
-    """
-
-    # Put any configurations here that are common across all environments
-
-
-class DevelopmentConfig(Config):
-    """
-    Development configurations
-    """
-
-    DEBUG = True
-    SQLALCHEMY_ECHO = True
-
-
-class ProductionConfig(Config):
-    """
-    Production configurations
-    """
-
-    DEBUG = False
-
-app_config = {
-    'development': DevelopmentConfig,
-    'production': ProductionConfig
+class Config(object):
+    """
+    Common configurations
+    """
+
+    # Put any configurations here that are common across all environments
+
+    # Default and maximum number of rows rendered per page in list views
+    PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+
+    # Cache of rendered public pages: 'memory', 'redis', 'null' or the
+    # import path of a custom backend class
+    PAGE_CACHE_TYPE = 'memory'
+    PAGE_CACHE_SIZE = 1024
+    PAGE_CACHE_TTL = 300
+    PAGE_CACHE_REDIS_URL = 'redis://localhost:6379/0'
+
+    # Per-process cache of logged-in users, entries expire after the TTL in
+    # seconds so changes made through another worker are picked up
+    IDENTITY_CACHE_SIZE = 4096
+    IDENTITY_CACHE_TTL = 60
+
+    # Password hashing policy, stored hashes made with other parameters are
+    # upgraded on the next successful login
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:260000'
+    PASSWORD_SALT_LENGTH = 16
+
+    # Per-request SQL and template timings, reported in a Server-Timing
+    # header and aggregated per endpoint at /admin/metrics
+    INSTRUMENTATION_ENABLED = True
+    INSTRUMENTATION_SLOW_QUERIES = 5
+    SERVER_TIMING_HEADER = True
+
+    # Related projects kept per project, and the number of projects above
+    # which a shared category, person or investor is too common to count
+    RELATED_PROJECTS = 5
+    RELATED_MAX_SHARED = 1000
+
+    # Serve the content-hashed build of the static files made by
+    # 'flask assets build' when one exists
+    ASSETS_FINGERPRINT = True
+
+    # Compress text responses of at least COMPRESS_MIN_SIZE bytes with
+    # brotli, when installed, or gzip. Compressed bodies of cached pages are
+    # kept for COMPRESS_CACHE_SIZE distinct pages. Streamed responses are
+    # flushed to the client every COMPRESS_FLUSH_SIZE bytes of input
+    COMPRESS_ENABLED = True
+    COMPRESS_MIMETYPES = ('text/html', 'text/css', 'text/plain', 'text/csv', 'application/json',
+                          'application/x-ndjson', 'application/javascript')
+    COMPRESS_MIN_SIZE = 500
+    COMPRESS_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 4
+    COMPRESS_CACHE_SIZE = 256
+    COMPRESS_FLUSH_SIZE = 32 * 1024
+
+    # Compiled templates are kept in JINJA_BYTECODE_CACHE_FOLDER, by default
+    # instance/jinja, and 'flask templates compile' fills it at build time
+    JINJA_BYTECODE_CACHE = True
+
+    # Pages rendered before a server process starts serving when
+    # WARMUP_ON_START is set, see run.py
+    WARMUP_ON_START = False
+    WARMUP_URLS = ('/', '/projects', '/login', '/api/v1/projects')
+
+    # ASGI mode (uvicorn asgi:app, with aiosqlite for SQLite, both pinned;
+    # other databases need their async driver): views run on the event loop
+    # over an async engine, other requests in a pool of ASGI_THREADS threads.
+    # The async URL is derived from SQLALCHEMY_DATABASE_URI unless
+    # ASYNC_DATABASE_URI is set
+    ASYNC_ENDPOINTS = ('home.projects', 'home.project', 'home.individual', 'home.organization')
+    ASYNC_DATABASE_URI = None
+    ASGI_THREADS = 8
+
+    # Change log served at /api/v1/changes: rows returned per request by
+    # default and at most, days after which the changes of an entity are
+    # folded into one, and days after which they are dropped
+    CHANGES_PAGE_SIZE = 1000
+    CHANGES_MAX_PAGE_SIZE = 10000
+    CHANGES_COMPACT_AFTER_DAYS = 7
+    CHANGES_RETENTION_DAYS = 90
+
+    # Static copy of the public pages written by 'flask snapshot build' for
+    # nginx or a CDN to serve: the folder (instance/snapshot by default),
+    # the absolute URL the sitemap points at and the rendering processes,
+    # one per CPU by default. Pages get a .gz copy for gzip_static
+    SNAPSHOT_FOLDER = None
+    SNAPSHOT_BASE_URL = None
+    SNAPSHOT_PROCESSES = None
+    SNAPSHOT_PRECOMPRESS = True
+
+    # Production server started by serve.py, SERVER_WORKERS defaults to
+    # twice the number of CPUs plus one
+    SERVER_BIND = '127.0.0.1:8000'
+    SERVER_WORKERS = None
+    SERVER_THREADS = 4
+    SERVER_TIMEOUT = 30
+    SERVER_GRACEFUL_TIMEOUT = 30
+    SERVER_KEEPALIVE = 5
+    SERVER_MAX_REQUESTS = 0
+    SERVER_MAX_REQUESTS_JITTER = 0
+
+
+class DevelopmentConfig(Config):
+    """
+    Development configurations
+    """
+
+    DEBUG = True
+    SQLALCHEMY_ECHO = True
+    PAGE_CACHE_TYPE = 'null'
+    ASSETS_FINGERPRINT = False
+
+
+class ProductionConfig(Config):
+    """
+    Production configurations
+    """
+
+    DEBUG = False
+
+    # Serve Bootstrap from the fingerprinted build instead of the CDN
+    BOOTSTRAP_SERVE_LOCAL = True
+
+    # Render the hot pages once in every server process before it takes requests
+    WARMUP_ON_START = True
+
+    # Processes running the key derivation, and how many hashes may wait
+    # for a free process. Elsewhere hashing stays in the request thread
+    PASSWORD_HASH_WORKERS = 2
+    PASSWORD_HASH_MAX_PENDING = 8
+
+    # One page cache for all the workers, so a write invalidates the cached
+    # pages everywhere; serve.py refuses 'memory' with several workers
+    PAGE_CACHE_TYPE = 'redis'
+
+    # Engine profile: WAL and pragmas for SQLite, sized pools for server
+    # databases (see app/database.py)
+    DATABASE_PROFILE = 'production'
+    DATABASE_POOL_SIZE = 10
+    DATABASE_MAX_OVERFLOW = 20
+    DATABASE_POOL_RECYCLE = 1800
+    DATABASE_POOL_TIMEOUT = 30
+    SQLITE_BUSY_TIMEOUT = 5000
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    }
+
+    # Bind key in SQLALCHEMY_BINDS of a read replica used by read-only views,
+    # e.g. SQLALCHEMY_BINDS = {'replica': 'postgresql://replica/projects'}
+    DATABASE_READ_REPLICA = None
+
+app_config = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig
 }
\ No newline at end of file
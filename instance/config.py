@@ -1,2 +1,2 @@
-SQLALCHEMY_DATABASE_URI = 'sqlite:///projects.sqlite3'
+SQLALCHEMY_DATABASE_URI = 'sqlite:///projects.sqlite3'
 SECRET_KEY = "JDNJK6978HHKDJ"
\ No newline at end of file
@@ -1,10 +1,13 @@
-import os
-
-from app import create_app
-
-config_name = os.getenv('FLASK_CONFIG')
-app = create_app(config_name)
-
-
-if __name__ == '__main__':
-    app.run()
+import os
+
+from app import create_app
+from app.templating import warmup
+
+config_name = os.getenv('FLASK_CONFIG')
+app = create_app(config_name)
+
+
+if __name__ == '__main__':
+    if app.config.get('WARMUP_ON_START'):
+        warmup(app)
+    app.run()
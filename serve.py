@@ -0,0 +1,155 @@
+"""
+Production server: gunicorn with the application preloaded in the master
+
+    FLASK_CONFIG=production python serve.py [--bind 0.0.0.0:8000] [--workers 4] [--threads 4]
+
+It runs on gunicorn, which requirements.txt pins: pip install -r requirements.txt
+
+The master builds the app, compiles the templates and renders the warmup
+pages before it binds, then forks the workers. They share that memory
+copy-on-write and each opens its own database connection before it
+accepts requests. Send SIGHUP to the master to reload the code without
+downtime: it builds the new app, starts new workers from it and stops the
+old ones once they finish their requests. If the new code fails to load,
+the old workers keep serving.
+"""
+import argparse
+import importlib
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    sys.exit('serve.py needs gunicorn, install the requirements with: pip install -r requirements.txt')
+
+logger = logging.getLogger('gunicorn.error')
+
+
+def _create_app(config_name, fresh=False):
+    """
+    Build the application, re-importing its code when `fresh` is set
+    """
+    if fresh:
+        for name in list(sys.modules):
+            if name in ('app', 'config') or name.startswith('app.'):
+                del sys.modules[name]
+    return importlib.import_module('app').create_app(config_name)
+
+
+def _engines(app):
+    """
+    The engines of the default database and of every bind
+    """
+    db = app.extensions['sqlalchemy'].db
+    with app.app_context():
+        return [db.get_engine(app, bind) for bind in [None] + list(app.config.get('SQLALCHEMY_BINDS') or ())]
+
+
+class Server(BaseApplication):
+    """
+    gunicorn application serving the Flask app with the SERVER_* settings
+    of its config, overridden by the command line options
+    """
+
+    def __init__(self, config_name, options):
+        self.config_name = config_name
+        self.options = options
+        self.launched = time.time()
+        self.application = _create_app(config_name)
+        BaseApplication.__init__(self)
+
+    def load_config(self):
+        config = self.application.config
+        threads = self.options.get('threads') or config.get('SERVER_THREADS', 1)
+        settings = {
+            'bind': config.get('SERVER_BIND', '127.0.0.1:8000'),
+            'workers': config.get('SERVER_WORKERS') or multiprocessing.cpu_count() * 2 + 1,
+            'threads': threads,
+            'worker_class': 'gthread' if threads > 1 else 'sync',
+            'timeout': config.get('SERVER_TIMEOUT', 30),
+            'graceful_timeout': config.get('SERVER_GRACEFUL_TIMEOUT', 30),
+            'keepalive': config.get('SERVER_KEEPALIVE', 5),
+            'max_requests': config.get('SERVER_MAX_REQUESTS', 0),
+            'max_requests_jitter': config.get('SERVER_MAX_REQUESTS_JITTER', 0),
+            'preload_app': True,
+            'when_ready': self.when_ready,
+            'post_fork': self.post_fork,
+            'post_worker_init': self.post_worker_init,
+            'post_request': self.post_request,
+        }
+        settings.update((key, value) for key, value in self.options.items() if value is not None)
+        if settings['workers'] > 1 and config.get('PAGE_CACHE_TYPE', 'memory') == 'memory':
+            # a write would only drop the cached pages of the worker that served it
+            raise RuntimeError('PAGE_CACHE_TYPE = \'memory\' keeps a cache per worker, use \'redis\' with '
+                               '{} workers or run a single one.'.format(settings['workers']))
+        for key, value in settings.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        """
+        Warm the app up in the master, before the listening socket exists
+        """
+        from app.templating import precompile, warmup
+
+        started = time.time()
+        app = self.application
+        if app.jinja_env.bytecode_cache is not None:
+            precompile(app)
+        if app.config.get('WARMUP_ON_START'):
+            warmup(app)
+        # a pooled connection must never be shared by the master and a worker
+        for engine in _engines(app):
+            engine.dispose()
+        logger.info('Application loaded and warmed up in %.2fs', time.time() - started)
+        return app
+
+    def reload(self):
+        try:
+            application = _create_app(self.config_name, fresh=True)
+        except Exception:
+            logger.exception('Reload failed, the current workers keep serving')
+            return
+        self.launched = time.time()
+        self.application = application
+        self.callable = None
+        BaseApplication.reload(self)
+
+    def when_ready(self, server):
+        logger.info('Ready to accept connections %.2fs after launch', time.time() - self.launched)
+
+    def post_fork(self, server, worker):
+        for engine in _engines(self.application):
+            engine.dispose()
+
+    def post_worker_init(self, worker):
+        # open this worker's own database connections before it accepts requests
+        for engine in _engines(self.application):
+            engine.connect().close()
+        worker.first_request_served = False
+
+    def post_request(self, worker, request, environ, response):
+        if not getattr(worker, 'first_request_served', True):
+            worker.first_request_served = True
+            logger.info('Worker %s served its first request %.2fs after launch',
+                        worker.pid, time.time() - self.launched)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0],
+                                     epilog='Runs on gunicorn, pinned in requirements.txt.')
+    parser.add_argument('--bind', help='Address to listen on, SERVER_BIND by default.')
+    parser.add_argument('--workers', type=int, help='Worker processes, SERVER_WORKERS by default.')
+    parser.add_argument('--threads', type=int, help='Threads per worker, SERVER_THREADS by default.')
+    parser.add_argument('--pidfile', help='File to write the master process id to, for reloads.')
+    args = parser.parse_args(argv)
+
+    options = {'bind': args.bind, 'workers': args.workers, 'threads': args.threads, 'pidfile': args.pidfile}
+    Server(os.getenv('FLASK_CONFIG'), options).run()
+
+
+if __name__ == '__main__':
+    main()
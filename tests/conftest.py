@@ -0,0 +1,51 @@
+import pytest
+
+from app import create_app, db
+from app.importer import import_projects
+from app.models import User
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app('development')
+    app.config.update(TESTING=True, SQLALCHEMY_ECHO=False, WTF_CSRF_ENABLED=False,
+                      SQLALCHEMY_DATABASE_URI='sqlite:///{}'.format(tmp_path / 'test.sqlite3'))
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(email='admin@example.com', username='admin', is_admin=True))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    with app.app_context():
+        admin_id = User.query.filter_by(username='admin').one().id
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin_id)
+    return client
+
+
+@pytest.fixture
+def seed(app):
+    def seed(start, count, links):
+        """
+        Import `count` projects, each linked to `links` categories, individuals and organizations
+        """
+
+        def rows():
+            for index in range(start, start + count):
+                yield {
+                    'name': 'Project {:03d}'.format(index),
+                    'description': 'Project number {}'.format(index),
+                    'location': 'City {}'.format(index % 3),
+                    'categories': ['Category {}'.format((index + n) % 7) for n in range(links)],
+                    'individuals': ['Person {}'.format((index + n) % 11) for n in range(links)],
+                    'organizations': ['Organization {}'.format((index + n) % 5) for n in range(links)],
+                }
+
+        with app.app_context():
+            import_projects(rows())
+
+    return seed
@@ -0,0 +1,29 @@
+import pytest
+
+from app import db, related
+from app.models import Project
+
+
+def add(client, name):
+    return client.post('/admin/projects/add', data={'name': name, 'description': 'A project'})
+
+
+def test_add_project_with_a_taken_name(app, client):
+    assert add(client, 'Project one').status_code == 302
+    response = add(client, 'Project one')
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        assert ('message', 'Error: project name already exists.') in session['_flashes']
+    with app.app_context():
+        assert Project.query.filter_by(name='Project one').count() == 1
+
+
+def test_add_project_does_not_hide_read_model_errors(app, client, monkeypatch):
+    def refresh(id):
+        raise RuntimeError('related projects are unavailable')
+
+    monkeypatch.setattr(related, 'refresh', refresh)
+    with pytest.raises(RuntimeError):
+        add(client, 'Project one')
+    with app.app_context():
+        assert db.session.query(Project.id).count() == 0
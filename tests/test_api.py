@@ -0,0 +1,81 @@
+from sqlalchemy import event
+
+from app import db
+from app.models import Category, Project
+
+
+def poll(client, url, etag):
+    return client.get(url, headers={'If-None-Match': etag})
+
+
+def rename(app, model, name):
+    with app.app_context():
+        item = model.query.filter_by(name=name).one()
+        item.name = name + ' renamed'
+        db.session.commit()
+
+
+def test_unchanged_page_is_not_modified(client, seed):
+    seed(0, 10, links=2)
+    response = client.get('/api/v1/projects?limit=3')
+    assert response.status_code == 200
+
+    again = poll(client, '/api/v1/projects?limit=3', response.headers['ETag'])
+    assert again.status_code == 304
+    assert again.headers['ETag'] == response.headers['ETag']
+
+
+def test_page_etag_follows_its_own_rows(app, client, seed):
+    seed(0, 10, links=2)
+    url = '/api/v1/projects?limit=3'
+    etag = client.get(url).headers['ETag']
+
+    # projects past the page and categories linked to none of its rows are ignored
+    rename(app, Project, 'Project 009')
+    rename(app, Category, 'Category 6')
+    assert poll(client, url, etag).status_code == 304
+
+    rename(app, Category, 'Category 1')
+    response = poll(client, url, etag)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    rename(app, Project, 'Project 002')
+    assert poll(client, url, etag).status_code == 200
+
+
+def test_page_etag_changes_when_a_row_joins_the_page(app, client, seed):
+    seed(0, 3, links=1)
+    url = '/api/v1/categories'
+    etag = client.get(url).headers['ETag']
+
+    with app.app_context():
+        db.session.add(Category(name='Category new'))
+        db.session.commit()
+    assert poll(client, url, etag).status_code == 200
+
+
+def test_poll_cost_does_not_grow_with_the_table(app, client, seed):
+    def statements(url):
+        etag = client.get(url).headers['ETag']
+        executed = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            executed.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            assert poll(client, url, etag).status_code == 304
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+        return executed
+
+    seed(0, 5, links=2)
+    few = statements('/api/v1/projects?limit=3')
+
+    seed(5, 60, links=3)
+    many = statements('/api/v1/projects?limit=3')
+    assert len(many) == len(few)
+    assert not any('count(' in statement.lower() for statement in many)
@@ -0,0 +1,93 @@
+import asyncio
+from urllib.parse import urlencode
+
+from sqlalchemy import event
+
+from app import db
+from app.asgi import ASGIApp
+from app.models import Category, Project, User
+
+
+async def call(asgi, method, path, body=b'', headers=()):
+    """
+    Send one HTTP request through the ASGI app, returns the status, headers and body
+    """
+    messages = []
+    received = []
+
+    async def receive():
+        if received:
+            return {'type': 'http.disconnect'}
+        received.append(True)
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'root_path': '',
+             'scheme': 'http', 'http_version': '1.1', 'server': ('localhost', 80), 'client': ('127.0.0.1', 5000),
+             'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]}
+    await asgi(scope, receive, send)
+    start = messages[0]
+    return start['status'], dict(start['headers']), b''.join(message.get('body', b'') for message in messages[1:])
+
+
+def add_projects(app, *names):
+    with app.app_context():
+        category = Category(name='Wallets')
+        projects = [Project(name=name, description='About {}'.format(name), categories=[category]) for name in names]
+        db.session.add_all(projects)
+        db.session.commit()
+        return [project.id for project in projects]
+
+
+def run(asgi, scenario):
+    async def main():
+        await asgi.startup()
+        try:
+            return await scenario()
+        finally:
+            await asgi.shutdown()
+
+    return asyncio.run(main())
+
+
+def test_get_runs_on_the_event_loop_with_a_session_per_request(app):
+    ids = add_projects(app, 'Alpha Wallet', 'Beta Wallet', 'Gamma Wallet')
+    asgi = ASGIApp(app)
+    statements = {'sync': 0, 'async': 0}
+
+    def counter(kind):
+        def count(*args):
+            statements[kind] += 1
+        return count
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', counter('sync'))
+
+    async def scenario():
+        assert asgi.is_async({'path': '/projects/{}'.format(ids[0]), 'root_path': ''})
+        event.listen(asgi.engine.sync_engine, 'before_cursor_execute', counter('async'))
+        return await asyncio.gather(*(call(asgi, 'GET', '/projects/{}'.format(id)) for id in ids))
+
+    responses = run(asgi, scenario)
+    assert statements['sync'] == 0 and statements['async'] > 0
+    for (status, _, body), name in zip(responses, ('Alpha Wallet', 'Beta Wallet', 'Gamma Wallet')):
+        assert status == 200
+        assert name.encode() in body
+    # every request removed its session when its context was torn down
+    assert not db.session.registry.registry
+
+
+def test_post_runs_in_the_thread_pool(app):
+    asgi = ASGIApp(app)
+    form = urlencode({'email': 'new@example.com', 'username': 'new', 'password': 'secret',
+                      'confirm_password': 'secret'}).encode()
+
+    status, headers, _ = run(asgi, lambda: call(asgi, 'POST', '/register', form, [
+        ('content-type', 'application/x-www-form-urlencoded'), ('content-length', str(len(form)))]))
+
+    assert status == 302
+    assert headers[b'location'].endswith(b'/login')
+    with app.app_context():
+        assert User.query.filter_by(email='new@example.com').one().username == 'new'
@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy import text
+
+from app import db, facets, related, search, summaries
+from app.models import Category, FacetCount, Organization, Project, ProjectSummary, RelatedProject
+
+
+def read_models(app):
+    """
+    The rows of every table maintained from the catalog
+    """
+    with app.app_context():
+        return {
+            'facets': sorted(db.session.query(FacetCount.facet, FacetCount.value, FacetCount.count)),
+            'summaries': sorted(tuple(row) for row in db.session.execute(db.select(ProjectSummary.__table__))),
+            'search': sorted(tuple(row) for row in db.session.execute(text('SELECT rowid, * FROM project_search'))),
+            'related': sorted(db.session.query(RelatedProject.project_id, RelatedProject.related_id)),
+        }
+
+
+def rebuilt(app):
+    with app.app_context():
+        facets.rebuild()
+        summaries.rebuild()
+        search.rebuild()
+        related.rebuild()
+    return read_models(app)
+
+
+def ids(app, model, *names):
+    with app.app_context():
+        return [model.query.filter_by(name=name).one().id for name in names]
+
+
+@pytest.fixture
+def catalog(app, seed):
+    # long enough lists that deleting projects never leaves one short
+    app.config['RELATED_PROJECTS'] = 50
+    seed(0, 15, links=2)
+    with app.app_context():
+        search.rebuild()
+
+
+def bulk(client, data, projects):
+    data = dict(data, ids=projects, submit='Apply')
+    return client.post('/admin/projects/bulk', data=data)
+
+
+def test_bulk_delete_matches_a_rebuild(app, client, catalog):
+    projects = ids(app, Project, 'Project 001', 'Project 004', 'Project 010')
+    response = bulk(client, {'action': 'delete'}, projects)
+    assert response.status_code == 302
+
+    state = read_models(app)
+    assert not any(row[0] in projects for row in state['summaries'])
+    assert state == rebuilt(app)
+
+
+@pytest.mark.parametrize('action, model, name', [('category', Category, 'Category 3'),
+                                                  ('investor', Organization, 'Organization 2')])
+def test_bulk_link_matches_a_rebuild(app, client, catalog, action, model, name):
+    value, = ids(app, model, name)
+    field = 'category' if action == 'category' else 'organization'
+    projects = ids(app, Project, 'Project 000', 'Project 002', 'Project 003')
+    response = bulk(client, {'action': action, field: value}, projects)
+    assert response.status_code == 302
+
+    state, expected = read_models(app), rebuilt(app)
+    # the related projects pick new links up on the next rebuild only
+    del state['related'], expected['related']
+    assert state == expected
+
+
+def test_bulk_preview_changes_nothing(app, client, catalog):
+    before = read_models(app)
+    category, = ids(app, Category, 'Category 3')
+    projects = ids(app, Project, 'Project 000', 'Project 001')
+    for data in {'action': 'delete'}, {'action': 'category', 'category': category}:
+        response = client.post('/admin/projects/bulk', data=dict(data, ids=projects, preview='Preview'))
+        assert response.status_code == 200
+    assert read_models(app) == before
+    with app.app_context():
+        assert Project.query.count() == 15
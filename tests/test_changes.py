@@ -0,0 +1,134 @@
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from app import changes, db
+from app.models import Category, Change, ChangeLogHorizon
+
+Row = namedtuple('Row', 'operation fields')
+
+
+def row(operation, **fields):
+    return Row(operation, json.dumps(fields) if fields else None)
+
+
+def test_merge_folds_updates_into_the_create():
+    assert changes._merge([row('create', name='A', description='x'), row('update', name='B')]) == \
+        ('create', {'name': 'B', 'description': 'x'})
+
+
+def test_merge_keeps_an_update_of_an_older_row():
+    assert changes._merge([row('update', name='A'), row('update', description='y')]) == \
+        ('update', {'name': 'A', 'description': 'y'})
+
+
+def test_merge_ends_with_a_delete():
+    assert changes._merge([row('create', name='A'), row('update', name='B'), row('delete')]) == ('delete', None)
+
+
+def test_merge_recreates_after_a_delete():
+    assert changes._merge([row('update', name='A'), row('delete'), row('update', name='C')]) == \
+        ('create', {'name': 'C'})
+
+
+def log(app, name, days_ago):
+    """
+    Create a category and rename it twice, with the changes dated `days_ago`, returns its id
+    """
+    with app.app_context():
+        category = Category(name=name)
+        db.session.add(category)
+        db.session.commit()
+        for name in (name + ' 2', name + ' 3'):
+            category.name = name
+            db.session.commit()
+        db.session.execute(Change.__table__.update().where(Change.entity_id == category.id)
+                           .values(changed_at=datetime.utcnow() - timedelta(days=days_ago)))
+        db.session.commit()
+        return category.id
+
+
+def logged(app):
+    with app.app_context():
+        return [(row.entity_id, row.operation, json.loads(row.fields) if row.fields else None)
+                for row in changes.since(0, 100)]
+
+
+def test_the_horizon_row_is_created_with_the_table(app):
+    with app.app_context():
+        assert db.session.get(ChangeLogHorizon, 1).seq == 0
+
+
+def test_compact_folds_the_older_changes_of_an_entity(app):
+    old, recent = log(app, 'Old', days_ago=10), log(app, 'Recent', days_ago=1)
+
+    with app.app_context():
+        assert changes.compact(retention_days=90, compact_after_days=7) == 2
+        assert changes.horizon() == 0
+
+    assert logged(app) == [
+        (old, 'create', {'name': 'Old 3', 'description': None}),
+        (recent, 'create', {'name': 'Recent', 'description': None}),
+        (recent, 'update', {'name': 'Recent 2'}),
+        (recent, 'update', {'name': 'Recent 3'}),
+    ]
+
+
+def test_compact_drops_changes_past_the_retention(app):
+    log(app, 'Old', days_ago=100)
+    recent = log(app, 'Recent', days_ago=1)
+
+    with app.app_context():
+        assert changes.compact(retention_days=90, compact_after_days=7) == 3
+        assert changes.horizon() == 3
+        assert changes.latest() == 6
+
+    assert [entity_id for entity_id, _, _ in logged(app)] == [recent] * 3
+
+
+def test_a_mirror_behind_the_horizon_must_resync(app, client):
+    log(app, 'Old', days_ago=100)
+    log(app, 'Recent', days_ago=1)
+    with app.app_context():
+        changes.compact(retention_days=90, compact_after_days=7)
+
+    response = client.get('/api/v1/changes?since=2')
+    assert response.status_code == 410
+    assert (response.json['horizon'], response.json['latest']) == (3, 6)
+
+    response = client.get('/api/v1/changes?since=3')
+    assert response.status_code == 200
+    assert [change['seq'] for change in response.json['changes']] == [4, 5, 6]
+    assert (response.json['next'], response.json['more']) == (6, False)
+
+
+class RecordingSession(object):
+    """
+    Stands in for a session on another database, records the statements
+    """
+
+    def __init__(self, dialect):
+        self.dialect = dialect
+        self.statements = []
+
+    def get_bind(self, mapper=None, clause=None):
+        return self
+
+    def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=self.dialect)))
+        return self
+
+    def first(self):
+        return (1,)
+
+
+def test_writers_take_turns_on_the_horizon_row():
+    from sqlalchemy.dialects import postgresql, sqlite
+
+    session = RecordingSession(postgresql.dialect())
+    changes._serialize(session)
+    assert len(session.statements) == 1 and session.statements[0].endswith('FOR UPDATE')
+
+    session = RecordingSession(sqlite.dialect())
+    changes._serialize(session)
+    assert session.statements == []
@@ -0,0 +1,38 @@
+import gzip
+import zlib
+
+from app.compression import compression
+
+
+def rows(count):
+    return ['{{"id": {0}, "name": "Project {0}"}}\n'.format(index) for index in range(count)]
+
+
+def test_stream_flushes_every_flush_size_bytes(app):
+    chunks = rows(5000)
+    body = ''.join(chunks).encode('utf-8')
+    pieces = list(compression._stream('gzip', iter(chunks)))
+
+    assert gzip.decompress(b''.join(pieces)) == body
+    # one piece per flush and the end of the stream, not one per row
+    assert len(pieces) <= len(body) // compression.flush_size + 2
+    assert len(b''.join(pieces)) < len(compression.compress('gzip', body)) * 1.1
+
+
+def test_stream_sends_what_it_has_once_flush_size_is_reached(app, monkeypatch):
+    monkeypatch.setattr(compression, 'flush_size', 1000)
+    sent = []
+
+    def produce():
+        for row in rows(1000):
+            sent.append(row)
+            yield row
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    received = b''
+    for piece in compression._stream('gzip', produce()):
+        received += decompressor.decompress(piece)
+        if received:
+            break
+    assert received == ''.join(sent).encode('utf-8')
+    assert 1000 <= len(received) < 1000 + len(sent[-1])
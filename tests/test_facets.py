@@ -0,0 +1,55 @@
+from collections import Counter
+
+from app import db, facets
+from app.models import Category, FacetCount, Individual, Organization, Project
+
+
+def stored(app):
+    with app.app_context():
+        return sorted(db.session.query(FacetCount.facet, FacetCount.value, FacetCount.count))
+
+
+def rebuilt(app):
+    with app.app_context():
+        facets.rebuild()
+    return stored(app)
+
+
+def ids(app, model, *names):
+    with app.app_context():
+        return [model.query.filter_by(name=name).one().id for name in names]
+
+
+def test_admin_edits_keep_the_counts_of_a_rebuild(app, client, seed):
+    seed(0, 12, links=2)
+    category, other = ids(app, Category, 'Category 1', 'Category 6')
+    person, = ids(app, Individual, 'Person 3')
+    organization, = ids(app, Organization, 'Organization 4')
+    first, second, third = ids(app, Project, 'Project 000', 'Project 001', 'Project 002')
+
+    responses = [
+        client.post('/admin/projects/add', data={
+            'name': 'Project new', 'description': 'A project', 'location': 'City 9',
+            'categories': [category, other], 'individuals': [person], 'organizations': [organization]}),
+        client.post('/admin/projects/edit/{}'.format(first), data={
+            'name': 'Project 000', 'description': 'Moved', 'location': 'City 1', 'categories': [other]}),
+        client.post('/admin/projects/delete/{}'.format(second)),
+        client.post('/admin/categories/delete/{}'.format(category)),
+        client.post('/admin/projects/bulk', data={'ids': [third], 'action': 'investor',
+                                                  'organization': organization, 'submit': 'Apply'}),
+    ]
+    assert [response.status_code for response in responses] == [302] * 5
+
+    counts = stored(app)
+    assert ('location', 'City 9', 1) in counts
+    assert not any(facet == 'category' and value == str(category) for facet, value, _ in counts)
+    assert counts == rebuilt(app)
+
+
+def test_apply_adds_new_values_and_drops_empty_ones(app):
+    with app.app_context():
+        facets.apply(Counter({('location', 'City 1'): 2, ('location', 'City 2'): 1}))
+        facets.adjust({('location', 'City 2')}, {('location', 'City 1'), ('category', '5')})
+        facets.apply(Counter({('category', '7'): -1, ('team', '3'): 0}))
+        db.session.commit()
+    assert stored(app) == [('category', '5', 1), ('location', 'City 1', 3)]
@@ -0,0 +1,14 @@
+from app.instrumentation import instrumentation
+from app.templating import warmup
+
+
+def test_warmup_requests_are_not_recorded(app):
+    app.config['WARMUP_URLS'] = ['/', '/projects']
+    instrumentation.reset()
+
+    assert warmup(app) == 2
+    assert instrumentation.snapshot() == []
+
+    response = app.test_client().get('/projects')
+    assert 'Server-Timing' in response.headers
+    assert [endpoint for endpoint, _ in instrumentation.snapshot()] == ['home.projects']
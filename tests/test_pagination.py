@@ -0,0 +1,80 @@
+import pytest
+
+from app import db, summaries
+from app.models import Project
+from app.pagination import encode_cursor, paginate
+
+
+@pytest.fixture
+def projects(app):
+    # a few unnamed projects, which sort before the named ones on SQLite
+    names = ['Project {:02d}'.format(index) for index in range(10)] + [None, None, None]
+    with app.app_context():
+        db.session.add_all(Project(name=name) for name in names[::2] + names[1::2])
+        db.session.commit()
+        return [project.id for project in Project.query.order_by(Project.name, Project.id)]
+
+
+def page(app, after=None, before=None, limit=4):
+    with app.test_request_context():
+        result = paginate(Project.query, Project, key=Project.name, limit=limit, after=after, before=before)
+        return [project.id for project in result.items], result.next_cursor, result.prev_cursor
+
+
+def test_walks_every_row_forward_and_back(app, projects):
+    seen, cursor = [], None
+    while True:
+        ids, cursor, prev_cursor = page(app, after=cursor)
+        seen += ids
+        if cursor is None:
+            break
+    assert seen == projects
+
+    # back from the last page
+    seen, cursor = ids, prev_cursor
+    while cursor is not None:
+        ids, _, cursor = page(app, before=cursor)
+        seen = ids + seen
+    assert seen == projects
+
+
+def test_cursor_survives_the_deletion_of_its_row(app, projects):
+    first, cursor, _ = page(app)
+    second = page(app, after=cursor)[0]
+    with app.app_context():
+        db.session.delete(Project.query.get(first[-1]))
+        db.session.commit()
+    assert page(app, after=cursor)[0] == second
+
+
+def test_cursor_survives_a_rename_of_its_row(app, projects):
+    first, cursor, _ = page(app)
+    second = page(app, after=cursor)[0]
+    with app.app_context():
+        Project.query.get(first[-1]).name = 'Project 99'
+        db.session.commit()
+    assert page(app, after=cursor)[0] == second
+
+
+def test_cursor_on_a_null_key_continues_among_the_nulls(app, projects):
+    ids, cursor, _ = page(app, limit=2)
+    assert ids == projects[:2]
+    assert page(app, after=cursor, limit=2)[0] == projects[2:4]
+    assert page(app, before=page(app, after=cursor, limit=2)[2], limit=2)[0] == projects[:2]
+
+
+def test_bare_ids_and_malformed_cursors(app, projects):
+    assert page(app, after=projects[3])[0] == projects[4:8]
+    assert page(app, after='not-a-cursor')[0] == projects[:4]
+    assert page(app, after=encode_cursor('Project 00', 'x'))[0] == projects[:4]
+
+
+def test_list_view_pages_with_cursors(app, client, projects):
+    app.config['PAGE_SIZE'] = 4
+    with app.app_context():
+        summaries.rebuild()
+    response = client.get('/projects?after={}'.format(encode_cursor('Project 03', projects[6])))
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert 'Project 04' in body and 'Project 03' not in body
+    assert '?after={}'.format(encode_cursor('Project 07', projects[10])) in body
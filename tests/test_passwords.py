@@ -0,0 +1,32 @@
+import pytest
+
+from app.passwords import password_hasher
+
+
+@pytest.fixture
+def hasher(app):
+    saved = dict(vars(password_hasher))
+    app.config.update(PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')
+    yield app
+    if password_hasher._executor is not None:
+        password_hasher._executor.shutdown()
+    vars(password_hasher).update(saved)
+
+
+def test_hashes_in_the_request_thread_without_workers(hasher):
+    password_hasher.init_app(hasher)
+    password_hash = password_hasher.hash('secret')
+
+    assert password_hasher.verify(password_hash, 'secret')
+    assert password_hasher._executor is None
+
+
+def test_pool_is_spawned_on_first_use(hasher):
+    hasher.config.update(PASSWORD_HASH_WORKERS=1)
+    password_hasher.init_app(hasher)
+    assert password_hasher._executor is None
+
+    password_hash = password_hasher.hash('secret')
+    assert password_hasher.verify(password_hash, 'secret')
+    assert not password_hasher.verify(password_hash, 'guess')
+    assert password_hasher._executor._mp_context.get_start_method() == 'spawn'
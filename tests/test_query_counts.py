@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.models import Project
+
+
+def count_queries(app, client, url):
+    """
+    Number of statements sent to the database while rendering `url`
+    """
+    # a first request fills the per-process caches, e.g. of the logged-in user
+    client.get(url)
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    assert response.status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize('url', ['/projects', '/admin/projects'])
+def test_project_lists_use_a_fixed_number_of_queries(app, client, seed, url):
+    seed(0, 3, links=1)
+    few = count_queries(app, client, url)
+
+    seed(3, 40, links=4)
+    assert count_queries(app, client, url) == few
+
+
+def test_project_page_uses_a_fixed_number_of_queries(app, client, seed):
+    # the last project shares nothing, the others have related projects too
+    seed(0, 20, links=5)
+    with app.app_context():
+        db.session.add(Project(name='Project alone'))
+        db.session.commit()
+        ids = [project.id for project in Project.query.order_by(Project.id)]
+
+    assert count_queries(app, client, '/projects/{}'.format(ids[-1])) == \
+        count_queries(app, client, '/projects/{}'.format(ids[0]))
@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+from collections import Counter
+
+import pytest
+
+from app import db, related
+from app.models import Category, Individual, Organization, Project, RelatedProject
+
+
+def stored(app):
+    with app.app_context():
+        return {(row.project_id, row.related_id): row.score for row in RelatedProject.query}
+
+
+def rebuilt(app):
+    with app.app_context():
+        related.rebuild()
+    return stored(app)
+
+
+def ids(app, model, *names):
+    with app.app_context():
+        return [model.query.filter_by(name=name).one().id for name in names]
+
+
+def involving(pairs, id):
+    return {pair: score for pair, score in pairs.items() if id in pair}
+
+
+@pytest.fixture
+def catalog(app, seed):
+    # long enough lists that a refresh never has to evict a match
+    app.config['RELATED_PROJECTS'] = 50
+    seed(0, 15, links=3)
+
+
+def test_refresh_of_a_new_project_matches_a_rebuild(app, client, catalog):
+    category, = ids(app, Category, 'Category 2')
+    person, = ids(app, Individual, 'Person 4')
+    organization, = ids(app, Organization, 'Organization 0')
+    response = client.post('/admin/projects/add', data={
+        'name': 'Project new', 'description': 'A project', 'categories': [category],
+        'individuals': [person], 'organizations': [organization]})
+    assert response.status_code == 302
+    new, = ids(app, Project, 'Project new')
+
+    pairs = stored(app)
+    expected = rebuilt(app)
+    assert involving(pairs, new) == pytest.approx(involving(expected, new))
+    assert set(pairs) == set(expected)
+
+
+def test_refresh_of_an_edited_project_matches_a_rebuild(app, client, catalog):
+    first, = ids(app, Project, 'Project 000')
+    organization, = ids(app, Organization, 'Organization 3')
+    response = client.post('/admin/projects/edit/{}'.format(first), data={
+        'name': 'Project 000', 'description': 'Moved', 'organizations': [organization]})
+    assert response.status_code == 302
+
+    pairs = stored(app)
+    expected = rebuilt(app)
+    assert involving(pairs, first)
+    assert involving(pairs, first) == pytest.approx(involving(expected, first))
+    assert set(pairs) == set(expected)
+
+
+def test_delete_removes_the_project_from_every_list(app, client, catalog):
+    first, = ids(app, Project, 'Project 000')
+    assert client.post('/admin/projects/delete/{}'.format(first)).status_code == 302
+
+    pairs = stored(app)
+    assert not involving(pairs, first)
+    assert set(pairs) == set(rebuilt(app))
+
+
+def test_refresh_evicts_the_weakest_match_of_a_full_list(app, catalog):
+    app.config['RELATED_PROJECTS'] = 1
+    with app.app_context():
+        related.rebuild()
+        # a copy of the links of a project is its best match, and it has the copy as its own
+        model = Project.query.filter_by(name='Project 005').one()
+        project = Project(name='Project new', description='A project', categories=list(model.categories),
+                          individuals=list(model.individuals), organizations=list(model.organizations))
+        db.session.add(project)
+        db.session.flush()
+        related.refresh(project.id)
+        db.session.commit()
+        new, copied = project.id, model.id
+
+    pairs = stored(app)
+    assert max(Counter(project_id for project_id, _ in pairs).values()) == 1
+    assert set(involving(pairs, new)) == {(new, copied), (copied, new)}
+    expected = rebuilt(app)
+    for pair in (new, copied), (copied, new):
+        assert pairs[pair] == pytest.approx(expected[pair])
+
+
+def test_the_app_imports_without_numpy_and_scipy():
+    # only a rebuild needs them, the web workers must start without
+    code = ("import sys; sys.modules['numpy'] = sys.modules['scipy'] = None; "
+            "from app import create_app, related; create_app('development')")
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
@@ -0,0 +1,82 @@
+import json
+import os
+
+import pytest
+
+from app import snapshot
+from app.models import Category, Individual, Project
+
+
+def files(folder):
+    """
+    The content of every file of a snapshot but its manifest, by path
+    """
+    found = {}
+    for root, _, names in os.walk(folder):
+        for name in names:
+            path = os.path.join(root, name)
+            if name != snapshot.MANIFEST:
+                with open(path, 'rb') as source:
+                    found[os.path.relpath(path, folder)] = source.read()
+    return found
+
+
+def build(app, folder, full=False):
+    with app.app_context():
+        return snapshot.build(app, str(folder), 'https://example.com', full=full, processes=1)
+
+
+def ids(app, model, *names):
+    with app.app_context():
+        return [model.query.filter_by(name=name).one().id for name in names]
+
+
+@pytest.fixture
+def catalog(app, seed):
+    app.config.update(SNAPSHOT_PRECOMPRESS=False, PAGE_SIZE=4)
+    seed(0, 10, links=2)
+
+
+def test_incremental_build_matches_a_full_build(app, client, catalog, tmp_path):
+    category, = ids(app, Category, 'Category 3')
+    person, = ids(app, Individual, 'Person 5')
+    first, second = ids(app, Project, 'Project 000', 'Project 001')
+    full = build(app, tmp_path / 'incremental')
+
+    responses = [
+        client.post('/admin/projects/add', data={'name': 'Project new', 'description': 'A project',
+                                                 'categories': [category], 'individuals': [person]}),
+        client.post('/admin/projects/edit/{}'.format(first), data={
+            'name': 'Project zero', 'description': 'Renamed', 'categories': [category]}),
+        client.post('/admin/projects/delete/{}'.format(second)),
+        client.post('/admin/categories/edit/{}'.format(category), data={
+            'name': 'Category three', 'description': 'Renamed'}),
+        client.post('/admin/individuals/edit/{}'.format(person), data={
+            'name': 'Person five', 'description': 'Renamed'}),
+    ]
+    assert [response.status_code for response in responses] == [302] * 5
+
+    incremental = build(app, tmp_path / 'incremental')
+    assert 0 < incremental['rendered'] < full['rendered']
+    assert incremental['removed'] and not incremental['failed']
+    build(app, tmp_path / 'full', full=True)
+    assert files(tmp_path / 'incremental') == files(tmp_path / 'full')
+
+
+def test_unchanged_catalog_only_renders_the_homepage(app, catalog, tmp_path):
+    build(app, tmp_path)
+    assert build(app, tmp_path) == {'rendered': 1, 'removed': 0, 'failed': 0}
+
+
+def test_manifest_records_the_profiles_and_pending_pages(app, catalog, tmp_path):
+    full = build(app, tmp_path)
+    path = tmp_path / snapshot.MANIFEST
+    manifest = json.loads(path.read_text())
+    assert set(manifest['profiles']) == {'individual', 'organization'}
+    assert manifest['pending'] == {'project': [], 'individual': [], 'organization': []}
+    assert not manifest['lists_pending']
+
+    # a manifest written before the profile pages were added
+    del manifest['profiles']
+    path.write_text(json.dumps(manifest))
+    assert build(app, tmp_path)['rendered'] == full['rendered']
@@ -0,0 +1,64 @@
+from app import db, summaries
+from app.models import Category, Project, ProjectSummary
+
+
+def stored(app):
+    with app.app_context():
+        return [dict(row._mapping) for row in db.session.execute(
+            db.select(ProjectSummary.__table__).order_by(ProjectSummary.id))]
+
+
+def rebuilt(app):
+    with app.app_context():
+        summaries.rebuild()
+    return stored(app)
+
+
+def ids(app, model, *names):
+    with app.app_context():
+        return [model.query.filter_by(name=name).one().id for name in names]
+
+
+def test_admin_edits_keep_the_summaries_of_a_rebuild(app, client, seed):
+    seed(0, 12, links=2)
+    category, other = ids(app, Category, 'Category 1', 'Category 6')
+    first, second, third = ids(app, Project, 'Project 000', 'Project 001', 'Project 002')
+
+    responses = [
+        client.post('/admin/projects/add', data={
+            'name': 'Project new', 'description': 'A project', 'location': 'City 9',
+            'categories': [category, other]}),
+        client.post('/admin/projects/edit/{}'.format(first), data={
+            'name': 'Project zero', 'description': 'Renamed', 'location': 'City 1', 'categories': [other]}),
+        client.post('/admin/projects/delete/{}'.format(second)),
+        client.post('/admin/categories/edit/{}'.format(category), data={
+            'name': 'Category one', 'description': 'Renamed'}),
+        client.post('/admin/categories/delete/{}'.format(other)),
+        client.post('/admin/projects/bulk', data={'ids': [third], 'action': 'category',
+                                                  'category': category, 'submit': 'Apply'}),
+    ]
+    assert [response.status_code for response in responses] == [302] * 6
+
+    with app.app_context():
+        assert summaries.check() == {'missing': [], 'stale': [], 'orphaned': []}
+    rows = stored(app)
+    assert {'id': first, 'name': 'Project zero', 'description': 'Renamed', 'location': 'City 1',
+            'categories': ''} in rows
+    assert rows == rebuilt(app)
+
+
+def test_check_finds_and_repair_fixes_every_kind_of_drift(app, seed):
+    seed(0, 5, links=1)
+    expected = stored(app)
+    table = ProjectSummary.__table__
+    with app.app_context():
+        first, second = [row[0] for row in db.session.query(Project.id).order_by(Project.id).limit(2)]
+        db.session.execute(table.delete().where(table.c.id == first))
+        db.session.execute(table.update().where(table.c.id == second).values(categories='Outdated'))
+        db.session.execute(table.insert().values(id=999, name='Project gone', categories=''))
+        db.session.commit()
+
+        problems = summaries.check()
+        assert problems == {'missing': [first], 'stale': [second], 'orphaned': [999]}
+        summaries.repair(problems)
+    assert stored(app) == expected